@@ -2,20 +2,66 @@ from __future__ import annotations
 
 import argparse
 import json
-import os
 import pathlib
 import sys
+from typing import TYPE_CHECKING
 
-from PySide6 import QtGui, QtWidgets
+# Only what the Qt-free commands (validate, stats, compile) need is imported
+# here; Qt, numpy and the GUI are imported by the commands that use them.
+from .cli import map_stats, validate_map
+from .control.protocol import DEFAULT_CONTROL_PORT
+from .sounds.compiled import MapValidationError, compile_map, log_issues
+from .utils import get_default_logger, load_map, start_log_queue
 
-from .gui.app import MainWindow
-from .sounds import types
-from .utils import get_default_logger
+if TYPE_CHECKING:
+    from typing import Optional
+
+    from .sounds import types
+    from .sounds.bundle import Bundle
 
 logger = get_default_logger(__name__)
 
+
+def open_map(
+    data_path: pathlib.Path, bundle: Optional[str] = None
+) -> types.ObjectMap | Bundle:
+    """
+    Opens the map's bundle, compiling it if needed, or map.json if the bundle
+    can't be written.
+    """
+    from .sounds.bundle import BundleError, load_bundle
+
+    try:
+        return load_bundle(data_path, bundle)
+    except (OSError, BundleError) as e:
+        logger.error("Could not compile the bundle, starting from map.json: %s", e)
+        return load_map(data_path / "map.json")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="run",
+        choices=(
+            "run",
+            "validate",
+            "stats",
+            "compile",
+            "warm-cache",
+            "analyze",
+            "engine",
+        ),
+        help="`validate` checks map.json and that its asset files exist. `stats` "
+        "counts the map's scenes, objects and assets. `warm-cache` decodes every "
+        "sound into the PCM cache and exits. "
+        "`analyze` measures the loudness and silence of every new sound. "
+        "`compile` writes the map and an index of its assets to a bundle, which "
+        "`run` then starts from. `engine` runs the sound engine without a window, "
+        "for `run --engine-process`. `validate`, `stats` and `compile` (unless "
+        "embedding) do not load Qt.",
+    )
     parser.add_argument(
         "--data_map",
         "-dm",
@@ -23,20 +69,240 @@ if __name__ == "__main__":
         type=lambda s: str(pathlib.Path(s).resolve()),
         default=".cache",
     )
+    parser.add_argument(
+        "--timing-report",
+        action="store",
+        default=None,
+        help="Write a per-asset load timing breakdown (JSON) to this path.",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store",
+        default=None,
+        help="Collect cue latency metrics and write them to this path on exit "
+        "(JSON if it ends in .json, a text table otherwise).",
+    )
+    parser.add_argument(
+        "--bundle",
+        action="store",
+        default=None,
+        help="The bundle to write (`compile`) or start from (`run`). Defaults to "
+        "map.bundle in the map's cache folder.",
+    )
+    parser.add_argument(
+        "--no-bundle",
+        action="store_true",
+        help="Start from map.json instead of a (re)compiled bundle.",
+    )
+    parser.add_argument(
+        "--embed-pcm",
+        action="store_true",
+        help="`compile`: decode every sound to the mixer's format and embed it.",
+    )
+    parser.add_argument(
+        "--embed-art",
+        action="store",
+        type=int,
+        default=0,
+        metavar="SIZE",
+        help="`compile`: embed every image shrunk to fit SIZE x SIZE pixels.",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="`stats`: print JSON instead of a table."
+    )
+    parser.add_argument(
+        "--no-file-check",
+        action="store_true",
+        help="`validate`: do not check that the asset files exist.",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store",
+        default=None,
+        metavar="PATH",
+        help="Record every input and event of the engine to this binary trace; "
+        "see `python -m sound_r.bench --replay`.",
+    )
+    parser.add_argument(
+        "--log-queue",
+        action="store_true",
+        help="Write logs from a background thread instead of the caller's.",
+    )
+    parser.add_argument(
+        "--control",
+        nargs="?",
+        type=int,
+        const=DEFAULT_CONTROL_PORT,
+        default=None,
+        metavar="PORT",
+        help="Let local clients step and trigger cues over TCP on this port "
+        f"(default {DEFAULT_CONTROL_PORT}); see `python -m sound_r.control`.",
+    )
+    parser.add_argument(
+        "--engine-process",
+        action="store_true",
+        help="Run the sound engine in its own process, so the window never delays "
+        "it. `--control` then serves from that process.",
+    )
     known_args, _ = parser.parse_known_args()
+    if known_args.log_queue:
+        start_log_queue()
     DATA_FOLDER = known_args.data_map
     DATA_PATH = pathlib.Path(DATA_FOLDER)
     MAP_PATH = DATA_PATH / "map.json"
-    with MAP_PATH.open() as f:
-        OBJECT_MAP: types.ObjectMap = json.load(f)
-        OBJECT_MAP["root"] = MAP_PATH.parent
+
+    if known_args.command == "validate":
+        issues = validate_map(MAP_PATH, check_files=not known_args.no_file_check)
+        sys.exit(1 if issues else 0)
+
+    if known_args.command == "stats":
+        try:
+            stats = map_stats(compile_map(load_map(MAP_PATH)))
+        except MapValidationError as e:
+            log_issues(e.issues)
+            sys.exit(1)
+        print(
+            json.dumps(stats.as_dict(), indent=2)
+            if known_args.json
+            else stats.format_table()
+        )
+        sys.exit(0)
+
+    if known_args.command == "compile":
+        from .sounds.bundle import write_bundle
+
+        if known_args.embed_pcm or known_args.embed_art:
+            from PySide6 import QtCore
+
+            # Decoding needs an application object but no GUI.
+            app = QtCore.QCoreApplication(sys.argv)
+        write_bundle(
+            MAP_PATH,
+            known_args.bundle,
+            embed_pcm=known_args.embed_pcm,
+            art_max=known_args.embed_art,
+        )
+        sys.exit(0)
+
+    if known_args.command in ("warm-cache", "analyze") or known_args.no_bundle:
+        OBJECT_MAP: types.ObjectMap | Bundle = load_map(MAP_PATH)
+
+    if known_args.command == "warm-cache":
+        from PySide6 import QtCore
+
+        from .sounds.pcm_cache import warm_cache
+
+        # QAudioDecoder needs an application object but no GUI.
+        app = QtCore.QCoreApplication(sys.argv)
+        warm_cache(compile_map(OBJECT_MAP))
+        sys.exit(0)
+
+    if known_args.command == "analyze":
+        from .sounds.analysis import analyze_map
+
+        _, analysis_stats = analyze_map(compile_map(OBJECT_MAP))
+        sys.exit(1 if analysis_stats.failed else 0)
+
+    from .metrics import metrics
+
+    if known_args.command == "engine":
+        from PySide6 import QtCore
+
+        from .control.host import READY_PREFIX, EngineHost
+        from .sounds.sound_engine import SoundEngine
+
+        app = QtCore.QCoreApplication(sys.argv)
+        if not known_args.no_bundle:
+            OBJECT_MAP = open_map(DATA_PATH, known_args.bundle)
+        if known_args.metrics:
+            metrics.enable()
+            app.aboutToQuit.connect(lambda: metrics.dump(known_args.metrics))
+        engine = SoundEngine(data_map=OBJECT_MAP, starting_id="start")
+        if known_args.trace:
+            from .trace import TraceRecorder
+
+            recorder = TraceRecorder.open(known_args.trace)
+            recorder.attach(engine)
+            app.aboutToQuit.connect(recorder.close)
+        host = EngineHost(engine, port=known_args.control or 0)
+        try:
+            port = host.start()
+        except OSError as e:
+            logger.error("Could not start the engine host: %s", e)
+            sys.exit(1)
+        app.aboutToQuit.connect(host.stop)
+        # The parent process waits for this line; logs go to stderr.
+        print(f"{READY_PREFIX} {port}", flush=True)
+        sys.exit(app.exec())
+
+    from PySide6 import QtGui, QtWidgets
+
+    from .gui.app import MainWindow
 
     app = QtWidgets.QApplication(sys.argv)
+    if not known_args.no_bundle:
+        OBJECT_MAP = open_map(DATA_PATH, known_args.bundle)
+    if known_args.metrics:
+        metrics.enable()
+        app.aboutToQuit.connect(lambda: metrics.dump(known_args.metrics))
     icon = QtGui.QIcon(
         str(pathlib.Path(__file__).parent / "gui" / "assets" / "d20.png")
     )
     app.setWindowIcon(icon)
 
-    window = MainWindow(OBJECT_MAP)
+    if known_args.engine_process:
+        from .gui.remote import RemoteEngine
+
+        # The engine process records its own trace and metrics; the window's
+        # metrics add the round trips to it.
+        engine_metrics = None
+        if known_args.metrics:
+            path = pathlib.Path(known_args.metrics)
+            engine_metrics = path.with_stem(f"{path.stem}.engine")
+        engine_args = [
+            f"--{name}={value}"
+            for name, value in (
+                ("bundle", known_args.bundle),
+                ("trace", known_args.trace),
+                ("metrics", engine_metrics),
+            )
+            if value
+        ]
+        if known_args.no_bundle:
+            engine_args.append("--no-bundle")
+        if known_args.log_queue:
+            engine_args.append("--log-queue")
+        remote = RemoteEngine(
+            OBJECT_MAP, engine_args=tuple(engine_args), port=known_args.control
+        )
+        app.aboutToQuit.connect(remote.close)
+        window = MainWindow(
+            OBJECT_MAP, timing_report=known_args.timing_report, engine=remote
+        )
+        window.start()
+        sys.exit(app.exec())
+
+    window = MainWindow(OBJECT_MAP, timing_report=known_args.timing_report)
+    if known_args.trace:
+        from .trace import TraceRecorder
+
+        recorder = TraceRecorder.open(known_args.trace)
+        recorder.attach(window.sound_engine)
+        app.aboutToQuit.connect(recorder.close)
     window.start()
+    control_port = known_args.control or window.sound_engine.scene_map.options.get(
+        "controlPort"
+    )
+    if control_port:
+        from .control.server import ControlServer
+
+        control = ControlServer(
+            window.sound_engine, port=control_port, step=window.step, parent=window
+        )
+        try:
+            control.start()
+        except OSError as e:
+            logger.error("Could not start the control server: %s", e)
+        else:
+            app.aboutToQuit.connect(control.stop)
     sys.exit(app.exec())
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import sys
+
+from ..utils import get_default_logger, start_log_queue
+from .automation import DEFAULT_RAMPS, run_automation_bench
+from .buses import DEFAULT_MAX_VOICES, DEFAULT_TRIGGERED, run_bus_bench
+from .ipc import run_ipc_bench
+from .layers import DEFAULT_LAYER_COUNTS, run_layer_bench
+from .replay import ReplayResult, run_replay
+from .scheduler import DEFAULT_PENDING, run_scheduler_bench
+from .startup import DEFAULT_STARTUP_REPEAT, StartupResult, run_startup_bench
+from .suite import DEFAULT_TOLERANCE, BenchResult, compare, format_comparison, run_bench
+from .synth import SynthSpec
+
+logger = get_default_logger(__name__)
+
+if __name__ == "__main__":
+    defaults = SynthSpec()
+    parser = argparse.ArgumentParser(
+        prog="python -m sound_r.bench",
+        description="Benchmarks the headless engine on a synthetic map.",
+    )
+    parser.add_argument("--scenes", type=int, default=defaults.scenes)
+    parser.add_argument("--sounds", type=int, default=defaults.sounds)
+    parser.add_argument("--art", type=int, default=defaults.art)
+    parser.add_argument(
+        "--objects", type=int, default=defaults.objects_per_scene, dest="objects"
+    )
+    parser.add_argument("--cue-depth", type=int, default=defaults.cue_depth)
+    parser.add_argument("--sound-ms", type=int, default=defaults.sound_ms)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument(
+        "--root",
+        type=pathlib.Path,
+        default=None,
+        help="Write the synthetic map here instead of a temporary folder.",
+    )
+    parser.add_argument("--save", type=pathlib.Path, help="Store the result here.")
+    parser.add_argument(
+        "--baseline", type=pathlib.Path, help="Compare against a stored result."
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--json", action="store_true", help="Print JSON.")
+    parser.add_argument(
+        "--log-queue",
+        action="store_true",
+        help="Write logs from a background thread instead of the caller's.",
+    )
+    parser.add_argument(
+        "--scheduler",
+        nargs="*",
+        type=int,
+        metavar="PENDING",
+        help="Measure the cue scheduler's lateness with these numbers of other "
+        f"events pending (default {' '.join(map(str, DEFAULT_PENDING))}) instead.",
+    )
+    parser.add_argument(
+        "--layers",
+        nargs="*",
+        type=int,
+        metavar="COUNT",
+        help="Measure step latency with these numbers of layers playing at once "
+        f"(default {' '.join(map(str, DEFAULT_LAYER_COUNTS))}) instead.",
+    )
+    parser.add_argument(
+        "--automation",
+        nargs="*",
+        type=int,
+        metavar="RAMPS",
+        help="Measure the CPU taken by these numbers of fades running at once "
+        f"(default {' '.join(map(str, DEFAULT_RAMPS))}) instead.",
+    )
+    parser.add_argument(
+        "--buses",
+        nargs="*",
+        type=int,
+        metavar="SOUNDS",
+        help="Measure the mixing cost of these numbers of sounds triggered on one "
+        f"bus (default {' '.join(map(str, DEFAULT_TRIGGERED))}), with and without "
+        "a voice limit, instead.",
+    )
+    parser.add_argument("--max-voices", type=int, default=DEFAULT_MAX_VOICES)
+    parser.add_argument(
+        "--ipc",
+        action="store_true",
+        help="Measure what running the engine in its own process adds to each "
+        "step, against an engine in this process, instead.",
+    )
+    parser.add_argument(
+        "--replay",
+        nargs=2,
+        type=pathlib.Path,
+        metavar=("TRACE", "MAP"),
+        help="Replay a trace recorded with `python -m sound_r --trace` on the map "
+        "folder it was recorded with, and compare its events with the recording, "
+        "instead. Works with --save and --baseline.",
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="--replay: wait between inputs as recorded instead of running ahead.",
+    )
+    parser.add_argument(
+        "--startup",
+        nargs="?",
+        type=int,
+        const=DEFAULT_STARTUP_REPEAT,
+        default=None,
+        metavar="REPEAT",
+        help="Measure the start-up time of each entry point in a fresh interpreter "
+        f"(median of {DEFAULT_STARTUP_REPEAT} runs by default) instead. Works with "
+        "--save and --baseline.",
+    )
+    args, _ = parser.parse_known_args()
+    if args.log_queue:
+        start_log_queue()
+
+    if args.scheduler is not None:
+        scheduler_result = run_scheduler_bench(args.scheduler or DEFAULT_PENDING)
+        print(
+            json.dumps(scheduler_result.as_dict(), indent=2)
+            if args.json
+            else scheduler_result.format_table()
+        )
+        sys.exit(0)
+
+    if args.automation is not None:
+        automation_result = run_automation_bench(args.automation or DEFAULT_RAMPS)
+        print(
+            json.dumps(automation_result.as_dict(), indent=2)
+            if args.json
+            else automation_result.format_table()
+        )
+        sys.exit(0)
+
+    spec = SynthSpec(
+        scenes=args.scenes,
+        sounds=args.sounds,
+        art=args.art,
+        objects_per_scene=args.objects,
+        cue_depth=args.cue_depth,
+        sound_ms=args.sound_ms,
+        seed=args.seed,
+    )
+    if args.layers is not None:
+        layer_result = run_layer_bench(
+            spec, args.layers or DEFAULT_LAYER_COUNTS, root=args.root, steps=args.steps
+        )
+        print(
+            json.dumps(layer_result.as_dict(), indent=2)
+            if args.json
+            else layer_result.format_table()
+        )
+        sys.exit(0)
+    if args.buses is not None:
+        bus_result = run_bus_bench(
+            spec, args.buses or DEFAULT_TRIGGERED, args.max_voices, root=args.root
+        )
+        print(
+            json.dumps(bus_result.as_dict(), indent=2)
+            if args.json
+            else bus_result.format_table()
+        )
+        sys.exit(0)
+    if args.ipc:
+        ipc_result = run_ipc_bench(spec, root=args.root, steps=args.steps)
+        print(
+            json.dumps(ipc_result.as_dict(), indent=2)
+            if args.json
+            else ipc_result.format_table()
+        )
+        sys.exit(0)
+    if args.replay is not None:
+        result_type = ReplayResult
+        result = run_replay(*args.replay, realtime=args.realtime)
+    elif args.startup is not None:
+        result_type = StartupResult
+        result = run_startup_bench(spec, root=args.root, repeat=args.startup)
+    else:
+        result_type = BenchResult
+        result = run_bench(spec, root=args.root, steps=args.steps)
+    print(
+        json.dumps(result.as_dict(), indent=2) if args.json else result.format_table()
+    )
+    if args.save:
+        result.save(args.save)
+        logger.info("Saved benchmark result to %s", args.save)
+    if args.baseline:
+        comparisons = compare(result, result_type.load(args.baseline), args.tolerance)
+        print(format_comparison(comparisons))
+        sys.exit(1 if any(c.regressed for c in comparisons) else 0)
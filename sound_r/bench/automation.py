@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..headless import ensure_app
+from ..sounds.automation import Automation
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Iterable
+
+logger = get_default_logger(__name__)
+
+DEFAULT_RAMPS = (10, 100, 1_000)
+
+
+@dataclass
+class AutomationRun:
+    ramps: int
+    automation_cpu: float = 0.0  # CPU seconds per wall second
+    animation_cpu: float = 0.0  # the same, with one animation per ramp
+    ticks: int = 0
+    tick_us: float = 0.0  # per tick of the automation, all ramps included
+
+
+@dataclass
+class AutomationBenchResult:
+    duration_ms: int
+    runs: list[AutomationRun] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [
+            f"{'ramps':>7}{'automation cpu':>16}{'animations cpu':>16}"
+            f"{'ticks':>7}{'tick µs':>10}"
+        ]
+        for run in self.runs:
+            lines.append(
+                f"{run.ramps:>7}{run.automation_cpu:>16.3f}{run.animation_cpu:>16.3f}"
+                f"{run.ticks:>7}{run.tick_us:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+def _noop(_value: float):
+    pass
+
+
+def _cpu_while_running(duration_ms: int) -> float:
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(duration_ms, loop.quit)
+    start, cpu = time.perf_counter(), time.process_time()
+    loop.exec()
+    return (time.process_time() - cpu) / (time.perf_counter() - start)
+
+
+def _measure(ramps: int, duration_ms: int) -> AutomationRun:
+    run = AutomationRun(ramps)
+
+    automation = Automation()
+    for i in range(ramps):
+        automation.ramp(i, 0.0, 1.0, duration_ms * 2, _noop)
+    run.automation_cpu = _cpu_while_running(duration_ms)
+    run.ticks = automation.stats.ticks
+    start = time.perf_counter()
+    automation.tick()
+    run.tick_us = (time.perf_counter() - start) * 1e6
+    for i in range(ramps):
+        automation.cancel(i)
+    automation.deleteLater()
+
+    animations = []
+    for _ in range(ramps):
+        animation = QtCore.QVariantAnimation()
+        animation.setStartValue(0.0)
+        animation.setEndValue(1.0)
+        animation.setDuration(duration_ms * 2)
+        animation.valueChanged.connect(_noop)
+        animation.start()
+        animations.append(animation)
+    run.animation_cpu = _cpu_while_running(duration_ms)
+    for animation in animations:
+        animation.stop()
+        animation.deleteLater()
+    return run
+
+
+def run_automation_bench(
+    ramps: Iterable[int] = DEFAULT_RAMPS, duration_ms: int = 1_000
+) -> AutomationBenchResult:
+    """
+    Measures the CPU taken by many fades at once, all run by one `Automation`,
+    against the same number of Qt animations, one per fade as players used to
+    have.
+
+    PARAMETERS
+    ----------
+    ramps
+        The numbers of simultaneous fades to try.
+    duration_ms
+        How long each measurement lasts.
+    """
+    ensure_app()
+    result = AutomationBenchResult(duration_ms=duration_ms)
+    for count in ramps:
+        result.runs.append(_measure(count, duration_ms))
+        logger.debug("Measured %d ramps", count)
+    return result
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import random
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field, replace
+from typing import TYPE_CHECKING
+
+from ..headless import HeadlessEngine, ensure_app
+from ..utils import get_default_logger
+from .suite import percentiles
+from .synth import SynthSpec, synth_map
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import Iterable, Optional
+
+logger = get_default_logger(__name__)
+
+DEFAULT_TRIGGERED = (8, 32, 128)
+DEFAULT_MAX_VOICES = 8
+BUS = "sfx"
+_SCENE = "voices"
+
+
+@dataclass
+class BusRun:
+    triggered: int
+    max_voices: Optional[int]
+    render_ms: dict[str, float] = field(default_factory=dict)  # per block
+    voices: int = 0  # mixed at the end of the run
+    peak_players: int = 0
+    steals: int = 0
+    rejected: int = 0
+
+
+@dataclass
+class BusBenchResult:
+    spec: dict
+    blocks: int
+    runs: list[BusRun] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [
+            f"{'triggered':>10}{'limit':>7}{'render p50':>12}{'p99':>9}"
+            f"{'voices':>8}{'players':>9}{'steals':>8}{'rejected':>10}"
+        ]
+        for run in self.runs:
+            limit = "-" if run.max_voices is None else run.max_voices
+            lines.append(
+                f"{run.triggered:>10}{limit:>7}{run.render_ms['p50']:>12.3f}"
+                f"{run.render_ms['p99']:>9.3f}{run.voices:>8}{run.peak_players:>9}"
+                f"{run.steals:>8}{run.rejected:>10}"
+            )
+        return "\n".join(lines)
+
+
+def _measure(
+    data_map: dict, triggered: int, max_voices: Optional[int], blocks: int
+) -> BusRun:
+    data_map["globalOptions"]["buses"] = (
+        {} if max_voices is None else {BUS: {"maxVoices": max_voices}}
+    )
+    headless = HeadlessEngine(data_map, _SCENE, validate=False)
+    headless.load_assets()
+    engine = headless.engine
+    for idx in range(triggered):
+        engine.play_sound(_SCENE, idx)
+    headless.process_events()
+    mixer = engine.mixer
+    samples = []
+    for _ in range(blocks):
+        start = time.perf_counter()
+        mixer.render(mixer.block_frames)
+        samples.append((time.perf_counter() - start) * 1000)
+    bus = engine.bus(BUS)
+    run = BusRun(
+        triggered,
+        max_voices,
+        percentiles(samples),
+        voices=len(mixer.voices),
+        peak_players=engine.pool_stats.peak_alive,
+        steals=bus.stats.steals,
+        rejected=bus.stats.rejected,
+    )
+    engine.deleteLater()
+    headless.process_events()
+    return run
+
+
+def run_bus_bench(
+    spec: SynthSpec,
+    triggered: Iterable[int] = DEFAULT_TRIGGERED,
+    max_voices: int = DEFAULT_MAX_VOICES,
+    root: Optional[pathlib.Path] = None,
+    blocks: int = 200,
+) -> BusBenchResult:
+    """
+    Measures the cost of mixing more and more looping sounds triggered on one
+    bus at random priorities, with and without a voice limit.
+
+    Without a limit the render time and the number of players grow with the
+    sounds triggered; with `max_voices` they should stay flat, the sounds
+    over the limit being stolen or rejected.
+    """
+    ensure_app()
+    triggered = sorted(triggered)
+    spec = replace(spec, sounds=max(spec.sounds, triggered[-1]))
+    rng = random.Random(spec.seed)
+    result = BusBenchResult(spec=spec.as_dict(), blocks=blocks)
+    with tempfile.TemporaryDirectory(prefix="sound_r_bench_") as tmp:
+        data_map = synth_map(root or tmp, spec)
+        data_map["scenes"][_SCENE] = [
+            {
+                "type": "sound",
+                "id": f"voice{i}",
+                "payload": f"snd{i}",
+                "loop": True,
+                "bus": BUS,
+                "priority": rng.randrange(4),
+            }
+            for i in range(triggered[-1])
+        ]
+        for count in triggered:
+            for limit in (None, max_voices):
+                result.runs.append(_measure(data_map, count, limit, blocks))
+                logger.debug("Measured %d sounds, limit %s", count, limit)
+    return result
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from ..headless import HeadlessEngine, ensure_app
+from ..utils import get_default_logger
+from .suite import percentiles
+from .synth import SynthSpec, synth_map
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import Optional
+
+logger = get_default_logger(__name__)
+
+# Events are handled after this many steps, as the event loop would.
+_STEPS_PER_TURN = 8
+
+
+@dataclass
+class IpcBenchResult:
+    spec: dict
+    steps: int
+    # How long the engine process took to listen, from launching it.
+    spawn_ms: float = 0.0
+    local_step_ms: dict[str, float] = field(default_factory=dict)
+    remote_step_ms: dict[str, float] = field(default_factory=dict)
+    # The part of each remote step spent outside the engine's handling of it.
+    overhead_ms: dict[str, float] = field(default_factory=dict)
+    events: int = 0  # received by the remote engine
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [f"{'step ms':<16}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+        for name, ms in (
+            ("in process", self.local_step_ms),
+            ("engine process", self.remote_step_ms),
+            ("ipc overhead", self.overhead_ms),
+        ):
+            lines.append(
+                f"{name:<16}{ms['p50']:>9.3f}{ms['p90']:>9.3f}"
+                f"{ms['p99']:>9.3f}{ms['max']:>9.3f}"
+            )
+        lines.append(
+            f"\nengine process listening after {self.spawn_ms:.0f} ms, "
+            f"{self.events} events received"
+        )
+        return "\n".join(lines)
+
+
+def _local_steps(data_map: dict, steps: int) -> list[float]:
+    headless = HeadlessEngine(data_map, validate=False)
+    headless.load_assets()
+    headless.start()
+    engine = headless.engine
+    samples = []
+    for i in range(steps):
+        start = time.perf_counter()
+        engine.step()
+        samples.append((time.perf_counter() - start) * 1000)
+        if i % _STEPS_PER_TURN == _STEPS_PER_TURN - 1:
+            headless.process_events()
+    engine.deleteLater()
+    headless.process_events()
+    return samples
+
+
+def run_ipc_bench(
+    spec: SynthSpec, root: Optional[pathlib.Path] = None, steps: int = 200
+) -> IpcBenchResult:
+    """
+    Measures what running the engine in its own process (`python -m sound_r
+    --engine-process`) adds to a step: the same steps are made on an engine
+    in this process and, through a `RemoteEngine`, on one in a child process,
+    both on the null backend.
+    """
+    from ..gui.remote import RemoteEngine
+
+    app = ensure_app()
+    result = IpcBenchResult(spec=spec.as_dict(), steps=steps)
+    with tempfile.TemporaryDirectory(prefix="sound_r_bench_") as tmp:
+        data_map = synth_map(root or tmp, spec)
+        data_map["globalOptions"]["loopScenes"] = True
+        data_map["globalOptions"]["hotReload"] = False
+        # The engine process reads the map from disk.
+        with (data_map["root"] / "map.json").open("w") as f:
+            json.dump({k: v for k, v in data_map.items() if k != "root"}, f)
+        result.local_step_ms = percentiles(_local_steps(data_map, steps))
+
+        start = time.perf_counter()
+        remote = RemoteEngine(data_map, engine_args=("--no-bundle",))
+        result.spawn_ms = (time.perf_counter() - start) * 1000
+        try:
+            loader = remote.load_assets()
+            ready = []
+            loader.scene_ready.connect(lambda: ready.append(True))
+            while not ready:
+                remote.request("ping")
+                app.processEvents()
+            remote.start()
+            step_ms, overhead_ms = [], []
+            for _ in range(steps):
+                remote.step()
+                step_ms.append(remote.stats.step_ms)
+                overhead_ms.append(remote.stats.step_ipc_ms)
+            result.remote_step_ms = percentiles(step_ms)
+            result.overhead_ms = percentiles(overhead_ms)
+            result.events = remote.stats.events
+        finally:
+            remote.close()
+    return result
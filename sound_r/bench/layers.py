@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from ..headless import HeadlessEngine, ensure_app
+from ..utils import get_default_logger
+from .suite import percentiles
+from .synth import SynthSpec, synth_map
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import Iterable, Optional
+
+    from ..sounds.layers import Layer
+
+logger = get_default_logger(__name__)
+
+DEFAULT_LAYER_COUNTS = (1, 8, 32, 64)
+# Events are handled after this many steps, as the event loop would.
+_STEPS_PER_TURN = 8
+
+
+@dataclass
+class LayerRun:
+    layers: int
+    active_step_ms: dict[str, float] = field(default_factory=dict)
+    idle_step_ms: dict[str, float] = field(default_factory=dict)
+    sessions: int = 0  # sounds playing at the end of the active run
+
+
+@dataclass
+class LayerBenchResult:
+    spec: dict
+    steps: int
+    runs: list[LayerRun] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [
+            f"{'layers':>7}{'active p50':>12}{'p99':>9}"
+            f"{'idle p50':>11}{'p99':>9}{'playing':>9}"
+        ]
+        for run in self.runs:
+            active, idle = run.active_step_ms, run.idle_step_ms
+            lines.append(
+                f"{run.layers:>7}{active['p50']:>12.3f}{active['p99']:>9.3f}"
+                f"{idle['p50']:>11.3f}{idle['p99']:>9.3f}{run.sessions:>9}"
+            )
+        return "\n".join(lines)
+
+
+def _time_steps(headless: HeadlessEngine, layers: list[Layer], steps: int):
+    engine = headless.engine
+    samples = []
+    for i in range(steps):
+        layer = layers[i % len(layers)]
+        start = time.perf_counter()
+        engine._step(layer)
+        samples.append((time.perf_counter() - start) * 1000)
+        if i % _STEPS_PER_TURN == _STEPS_PER_TURN - 1:
+            headless.process_events()
+    headless.process_events()
+    return samples
+
+
+def run_layer_bench(
+    spec: SynthSpec,
+    layer_counts: Iterable[int] = DEFAULT_LAYER_COUNTS,
+    root: Optional[pathlib.Path] = None,
+    steps: int = 1000,
+) -> LayerBenchResult:
+    """
+    Measures step latency with more and more layers playing at once, all
+    looping through the scenes of a synthetic map and sharing one player pool.
+
+    For each count, `steps` steps are spread round-robin over every layer
+    ("active"), and then made on the main layer alone while the other layers
+    are stopped ("idle"). Neither should grow with the number of layers.
+    """
+    ensure_app()
+    result = LayerBenchResult(spec=spec.as_dict(), steps=steps)
+    with tempfile.TemporaryDirectory(prefix="sound_r_bench_") as tmp:
+        data_map = synth_map(root or tmp, spec)
+        data_map["globalOptions"]["loopScenes"] = True
+        headless = HeadlessEngine(data_map, validate=False)
+        headless.load_assets()
+        headless.start()
+        engine = headless.engine
+        scene_names = list(engine.scene_map.scene_index)
+        for count in sorted(layer_counts):
+            layers = [engine.main]
+            for i in range(1, count):
+                layer = engine.layer(f"layer{i}")
+                layer.loop = True
+                if layer.scene is None:
+                    engine._play_scene(
+                        engine.scene_map.scene(scene_names[i % len(scene_names)]),
+                        layer,
+                    )
+                layers.append(layer)
+            run = LayerRun(count)
+            run.active_step_ms = percentiles(_time_steps(headless, layers, steps))
+            run.sessions = len(engine.sessions)
+            for layer in layers[1:]:
+                engine.stop_layer(layer.name)
+            run.idle_step_ms = percentiles(_time_steps(headless, [engine.main], steps))
+            result.runs.append(run)
+            logger.debug("Measured %d layers", count)
+    return result
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import io
+import json
+import pathlib
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from ..headless import HeadlessEngine
+from ..trace import (
+    Trace,
+    TraceError,
+    TraceKind,
+    TraceRecorder,
+    match_events,
+    read_trace,
+)
+from ..utils import get_default_logger, load_map
+from .suite import percentiles
+
+if TYPE_CHECKING:
+    from ..sounds.sound_engine import SoundEngine
+    from ..trace import TraceEvent
+
+logger = get_default_logger(__name__)
+
+
+@dataclass
+class KindDiff:
+    recorded: int = 0
+    replayed: int = 0
+    matched: int = 0
+    # How far each matched event moved from its recorded time.
+    lag_ms: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class ReplayResult:
+    spec: dict
+    duration_ms: float = 0.0
+    kinds: dict[str, KindDiff] = field(default_factory=dict)
+    recorded_input_ms: dict[str, float] = field(default_factory=dict)
+    replayed_input_ms: dict[str, float] = field(default_factory=dict)
+    missing: int = 0  # recorded events the replay did not produce
+    extra: int = 0  # replayed events the recording does not have
+    first_missing: list[str] = field(default_factory=list)
+
+    def metrics(self) -> dict[str, float]:
+        """
+        The comparable measurements as a flat mapping.
+        """
+        lags = [diff.lag_ms for diff in self.kinds.values() if diff.matched]
+        flat = {
+            f"input_{k}_ms": self.replayed_input_ms[k] for k in ("p50", "p99", "max")
+        }
+        flat["event_lag_max_ms"] = max((lag["max"] for lag in lags), default=0.0)
+        flat["unmatched_events"] = float(self.missing + self.extra)
+        return flat
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [
+            f"{'kind':<14}{'recorded':>10}{'replayed':>10}{'matched':>9}"
+            f"{'lag p50':>10}{'p99':>9}{'max':>9}"
+        ]
+        for kind, diff in self.kinds.items():
+            lag = diff.lag_ms or percentiles(())
+            lines.append(
+                f"{kind:<14}{diff.recorded:>10}{diff.replayed:>10}{diff.matched:>9}"
+                f"{lag['p50']:>10.2f}{lag['p99']:>9.2f}{lag['max']:>9.2f}"
+            )
+        recorded, replayed = self.recorded_input_ms, self.replayed_input_ms
+        lines.append("")
+        lines.append(f"{'input ms':<14}{'recorded':>10}{'replayed':>10}")
+        for q in ("p50", "p90", "p99", "max"):
+            lines.append(f"{q:<14}{recorded[q]:>10.3f}{replayed[q]:>10.3f}")
+        lines.append(f"\nmissing {self.missing}, extra {self.extra}")
+        lines.extend(f"  missing {event}" for event in self.first_missing)
+        return "\n".join(lines)
+
+    def save(self, path: pathlib.Path | str):
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: pathlib.Path | str) -> ReplayResult:
+        with open(path) as f:
+            data = json.load(f)
+        data["kinds"] = {k: KindDiff(**v) for k, v in data["kinds"].items()}
+        return cls(**data)
+
+
+def _feed(engine: SoundEngine, event: TraceEvent):
+    args = event.args
+    match event.kind:
+        case TraceKind.START:
+            engine.start()
+        case TraceKind.STEP:
+            engine.step(*args)
+        case TraceKind.PLAY_OBJ:
+            engine.play_obj(*args)
+        case TraceKind.PLAY_SCENE:
+            engine.play_scene(*args)
+        case TraceKind.STOP_LAYER:
+            engine.stop_layer(*args)
+        case TraceKind.BUS_GAIN:
+            engine.set_bus_gain(args[0], event.value, args[1])
+
+
+def _describe(event: TraceEvent) -> str:
+    args = " ".join(str(arg) for arg in event.args)
+    return f"{event.t_ms:.1f} ms {event.kind.name.lower()} {args}"
+
+
+def run_replay(
+    trace_path: pathlib.Path | str,
+    map_root: pathlib.Path | str,
+    realtime: bool = False,
+) -> ReplayResult:
+    """
+    Feeds the inputs of a recorded trace, at their recorded times, to a
+    headless engine on the null backend, and compares the events it records
+    with those of the trace.
+
+    PARAMETERS
+    ----------
+    trace_path
+        A trace written by `TraceRecorder`, e.g. with `python -m sound_r
+        --trace`.
+    map_root
+        The folder of the map the trace was recorded with.
+    realtime
+        Whether to wait between inputs as the recording did, instead of
+        rendering the audio in between as fast as possible.
+    """
+    recorded = read_trace(trace_path)
+    inputs = recorded.inputs
+    starts = [event for event in inputs if event.kind is TraceKind.START]
+    if not starts:
+        raise TraceError(f"{trace_path} does not record the engine starting")
+    data_map = load_map(pathlib.Path(map_root) / "map.json")
+    headless = HeadlessEngine(
+        data_map, starts[0].args[0], realtime=realtime, validate=False
+    )
+    headless.load_assets()
+    engine = headless.engine
+    stream = io.BytesIO()
+    # Times are read from the audio clock, which runs as fast as it renders.
+    recorder = TraceRecorder(stream, clock=lambda: engine.mixer.time)
+    recorder.attach(engine)
+    for event in inputs:
+        wait = event.t_ms - recorder.now_ms()
+        if wait > 0:
+            headless.advance(wait)
+        _feed(engine, event)
+        headless.process_events()
+    wait = recorded.duration_ms - recorder.now_ms()
+    if wait > 0:
+        headless.advance(wait)
+    recorder.detach()
+    stream.seek(0)
+    replayed = Trace.read(stream)
+
+    result = ReplayResult(
+        spec={"trace": str(trace_path), "realtime": realtime},
+        duration_ms=recorded.duration_ms,
+        recorded_input_ms=percentiles(event.duration_ms for event in inputs),
+        replayed_input_ms=percentiles(event.duration_ms for event in replayed.inputs),
+    )
+    pairs, missing, extra = match_events(recorded.events, replayed.events)
+    counts = Counter(event.kind for event in recorded.events)
+    replayed_counts = Counter(event.kind for event in replayed.events)
+    for kind in TraceKind:
+        if kind is TraceKind.STRING or not (counts[kind] or replayed_counts[kind]):
+            continue
+        lags = [b.t_ms - a.t_ms for a, b in pairs if a.kind is kind]
+        result.kinds[kind.name.lower()] = KindDiff(
+            counts[kind],
+            replayed_counts[kind],
+            len(lags),
+            percentiles(abs(lag) for lag in lags) if lags else {},
+        )
+    result.missing, result.extra = len(missing), len(extra)
+    result.first_missing = [_describe(event) for event in missing[:5]]
+    engine.deleteLater()
+    headless.process_events()
+    return result
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..headless import ensure_app
+from ..sounds.scheduler import CueScheduler
+from ..utils import get_default_logger
+from .suite import percentiles
+
+if TYPE_CHECKING:
+    from typing import Iterable
+
+logger = get_default_logger(__name__)
+
+DEFAULT_PENDING = (10, 1_000, 10_000)
+# Far enough out that the background events never fire during a run.
+_BACKGROUND_DELAY_MS = 3_600_000
+
+
+@dataclass
+class SchedulerRun:
+    pending: int  # background events waiting the whole run
+    schedule_us: float = 0.0  # per call_later
+    cancel_us: float = 0.0  # per cancel
+    fired: int = 0
+    lateness_ms: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class SchedulerBenchResult:
+    events: int
+    spacing_ms: float
+    runs: list[SchedulerRun] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [
+            f"{'pending':>8}{'sched µs':>10}{'cancel µs':>10}{'fired':>7}"
+            f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        ]
+        for run in self.runs:
+            late = run.lateness_ms
+            lines.append(
+                f"{run.pending:>8}{run.schedule_us:>10.2f}{run.cancel_us:>10.2f}"
+                f"{run.fired:>7}{late['p50']:>9.3f}{late['p90']:>9.3f}"
+                f"{late['p99']:>9.3f}{late['max']:>9.3f}"
+            )
+        return "\n".join(lines)
+
+
+def _noop():
+    pass
+
+
+def _measure(pending: int, events: int, spacing_ms: float) -> SchedulerRun:
+    scheduler = CueScheduler()
+    run = SchedulerRun(pending)
+    start = time.perf_counter()
+    background = [
+        scheduler.call_later(_BACKGROUND_DELAY_MS + i, _noop) for i in range(pending)
+    ]
+    if pending:
+        run.schedule_us = (time.perf_counter() - start) * 1e6 / pending
+
+    lateness: list[float] = []
+    loop = QtCore.QEventLoop()
+
+    def fired(due: float):
+        lateness.append((time.perf_counter() - due) * 1000)
+        if len(lateness) == events:
+            loop.quit()
+
+    first = time.perf_counter() + 0.05
+    for i in range(events):
+        due = first + i * spacing_ms / 1000
+        scheduler.call_at(due, fired, due)
+    QtCore.QTimer.singleShot(int(events * spacing_ms) + 5_000, loop.quit)
+    loop.exec()
+    run.fired = len(lateness)
+    run.lateness_ms = percentiles(lateness)
+
+    start = time.perf_counter()
+    for event in background:
+        event.cancel()
+    if pending:
+        run.cancel_us = (time.perf_counter() - start) * 1e6 / pending
+    scheduler.deleteLater()
+    return run
+
+
+def run_scheduler_bench(
+    pending: Iterable[int] = DEFAULT_PENDING,
+    events: int = 200,
+    spacing_ms: float = 5.0,
+) -> SchedulerBenchResult:
+    """
+    Measures how late `CueScheduler` runs events, and what scheduling and
+    cancelling cost, with different numbers of other events pending.
+
+    PARAMETERS
+    ----------
+    pending
+        The numbers of background events to try.
+    events
+        The number of events whose lateness is measured in each run.
+    spacing_ms
+        The time between those events.
+    """
+    ensure_app()
+    result = SchedulerBenchResult(events=events, spacing_ms=spacing_ms)
+    for count in pending:
+        result.runs.append(_measure(count, events, spacing_ms))
+    return result
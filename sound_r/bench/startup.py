@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from ..utils import get_default_logger
+from .synth import SynthSpec, synth_map
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+logger = get_default_logger(__name__)
+
+DEFAULT_STARTUP_REPEAT = 5
+# A command that loads one of these did not stay light.
+HEAVY_MODULES = ("PySide6", "numpy", "tqdm")
+# What each entry point imports first; `python` is the bare interpreter.
+IMPORTS = {
+    "python": "",
+    "cli": "sound_r.cli",
+    "bundle": "sound_r.sounds.bundle",
+    "control_client": "sound_r.control.client",
+    "engine": "sound_r.sounds.sound_engine",
+    "gui": "sound_r.gui.app",
+}
+COMMANDS = ("validate", "stats", "compile")
+_PACKAGE_PARENT = pathlib.Path(__file__).resolve().parents[2]
+# Run in the child; prints the heavy modules it ended up loading.
+_REPORT = (
+    "import json, sys; "
+    f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+)
+
+
+@dataclass
+class StartupResult:
+    spec: dict
+    repeat: int = DEFAULT_STARTUP_REPEAT
+    import_ms: dict[str, float] = field(default_factory=dict)
+    command_ms: dict[str, float] = field(default_factory=dict)
+    heavy: dict[str, list[str]] = field(default_factory=dict)
+
+    def metrics(self) -> dict[str, float]:
+        """
+        The comparable measurements as a flat mapping.
+        """
+        flat = {f"import_{k}_ms": v for k, v in self.import_ms.items()}
+        flat.update({f"{k}_ms": v for k, v in self.command_ms.items()})
+        return flat
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [f"{'metric':<26}{'value':>10}  heavy imports"]
+        for name, value in self.metrics().items():
+            key = name.removeprefix("import_").removesuffix("_ms")
+            heavy = ", ".join(self.heavy.get(key, ())) or "-"
+            lines.append(f"{name:<26}{value:>10.3f}  {heavy}")
+        return "\n".join(lines)
+
+    def save(self, path: pathlib.Path | str):
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: pathlib.Path | str) -> StartupResult:
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+def _run(
+    name: str, code: str, cwd: str, repeat: int
+) -> Optional[tuple[float, list[str]]]:
+    env = {**os.environ, "PYTHONPATH": str(_PACKAGE_PARENT)}
+    times = []
+    heavy: list[str] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        done = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        times.append((time.perf_counter() - start) * 1000)
+        if done.returncode != 0:
+            logger.warning(
+                "Could not time %s: %s",
+                name,
+                done.stderr.strip().splitlines()[-1:] or done.returncode,
+            )
+            return None
+        heavy = json.loads(done.stdout.strip().splitlines()[-1])
+    return statistics.median(times), heavy
+
+
+def run_startup_bench(
+    spec: SynthSpec,
+    root: Optional[pathlib.Path] = None,
+    repeat: int = DEFAULT_STARTUP_REPEAT,
+) -> StartupResult:
+    """
+    Measures how long each entry point takes to start in a fresh interpreter,
+    and which heavy modules it loads: importing the main modules, and running
+    the Qt-free commands of `python -m sound_r` on a synthetic map.
+
+    Entry points that fail here (e.g. without QtMultimedia) are left out.
+    """
+    result = StartupResult(spec=spec.as_dict(), repeat=repeat)
+    with tempfile.TemporaryDirectory(prefix="sound_r_bench_") as tmp:
+        map_root = pathlib.Path(root or tmp)
+        synth_map(map_root, spec)
+        for name, module in IMPORTS.items():
+            code = f"import {module}; {_REPORT}" if module else _REPORT
+            measured = _run(name, code, tmp, repeat)
+            if measured is not None:
+                result.import_ms[name], result.heavy[name] = measured
+        for command in COMMANDS:
+            argv = ["sound_r", command, "--data_map", str(map_root)]
+            code = (
+                f"import runpy, sys; sys.argv = {argv!r}\n"
+                "try:\n"
+                "    runpy.run_module('sound_r', run_name='__main__')\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                f"{_REPORT}"
+            )
+            measured = _run(command, code, tmp, repeat)
+            if measured is not None:
+                result.command_ms[command], result.heavy[command] = measured
+    return result
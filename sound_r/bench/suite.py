@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import json
+import pathlib
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from ..headless import HeadlessEngine, ensure_app
+from ..sounds.compiled import compile_map, validate_mapping
+from ..utils import get_default_logger
+from .synth import SynthSpec, synth_map
+
+if TYPE_CHECKING:
+    from typing import Callable, Iterable, Optional
+
+    from .replay import ReplayResult
+    from .startup import StartupResult
+
+logger = get_default_logger(__name__)
+
+DEFAULT_TOLERANCE = 0.10
+STEP_ADVANCE_MS = 20
+
+
+def percentiles(samples: Iterable[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": ordered[-1],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+def _time_ms(func: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+@dataclass
+class BenchResult:
+    spec: dict
+    validate_ms: float = 0.0
+    compile_ms: float = 0.0
+    engine_init_ms: float = 0.0
+    start_ready_ms: float = 0.0
+    load_ms: float = 0.0
+    steps: int = 0
+    scene_jumps: int = 0
+    step_ms: dict[str, float] = field(default_factory=dict)
+    loaded_sounds: int = 0
+    bytes_per_sound: float = 0.0
+
+    def metrics(self) -> dict[str, float]:
+        """
+        The comparable measurements as a flat mapping.
+        """
+        flat = {
+            "validate_ms": self.validate_ms,
+            "compile_ms": self.compile_ms,
+            "engine_init_ms": self.engine_init_ms,
+            "start_ready_ms": self.start_ready_ms,
+            "load_ms": self.load_ms,
+            "bytes_per_sound": self.bytes_per_sound,
+        }
+        flat.update({f"step_{k}_ms": v for k, v in self.step_ms.items()})
+        return flat
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [f"{'metric':<22}{'value':>14}"]
+        for name, value in self.metrics().items():
+            lines.append(f"{name:<22}{value:>14.3f}")
+        return "\n".join(lines)
+
+    def save(self, path: pathlib.Path | str):
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: pathlib.Path | str) -> BenchResult:
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+@dataclass
+class Comparison:
+    metric: str
+    baseline: float
+    current: float
+    change: float  # relative, positive is worse
+    regressed: bool
+
+
+def compare(
+    result: BenchResult | StartupResult | ReplayResult,
+    baseline: BenchResult | StartupResult | ReplayResult,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> list[Comparison]:
+    """
+    Compares every metric of `result` with `baseline`. All metrics are costs,
+    so a metric regressed if it grew by more than `tolerance` (relative).
+    """
+    if result.spec != baseline.spec:
+        logger.warning("Comparing runs of different map specs")
+    comparisons = []
+    current = result.metrics()
+    for metric, base in baseline.metrics().items():
+        if metric not in current:
+            continue
+        now = current[metric]
+        change = (now - base) / base if base else 0.0
+        comparisons.append(Comparison(metric, base, now, change, change > tolerance))
+    return comparisons
+
+
+def format_comparison(comparisons: list[Comparison]) -> str:
+    lines = [f"{'metric':<26}{'baseline':>14}{'current':>14}{'change':>10}"]
+    for c in comparisons:
+        lines.append(
+            f"{c.metric:<26}{c.baseline:>14.3f}{c.current:>14.3f}"
+            f"{c.change:>+10.1%}" + ("  REGRESSED" if c.regressed else "")
+        )
+    return "\n".join(lines)
+
+
+def _measure_steps(headless: HeadlessEngine, steps: int) -> tuple[list[float], int]:
+    scene_names = list(headless.engine.scene_map.scene_index)
+    samples = []
+    jumps = 0
+    for i in range(steps):
+        before = (headless.engine.scene, headless.engine.idx)
+        start = time.perf_counter()
+        headless.step()
+        samples.append((time.perf_counter() - start) * 1000)
+        if (headless.engine.scene, headless.engine.idx) == before:
+            # End of a cue chain; carry on from another scene.
+            headless.engine.play_scene(scene_names[i % len(scene_names)])
+            jumps += 1
+        headless.advance(STEP_ADVANCE_MS)
+    return samples, jumps
+
+
+def _measure_memory(data_map) -> tuple[int, float]:
+    tracemalloc.start()
+    try:
+        headless = HeadlessEngine(data_map, validate=False)
+        baseline = tracemalloc.get_traced_memory()[0]
+        headless.load_assets()
+        loaded = len(headless.engine._preloaded_pcm)
+        used = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return loaded, used / loaded if loaded else 0.0
+
+
+def run_bench(
+    spec: SynthSpec,
+    root: Optional[pathlib.Path] = None,
+    steps: int = 200,
+    repeat: int = 5,
+) -> BenchResult:
+    """
+    Synthesizes a map from `spec` and measures validation and compile time,
+    engine construction and asset loading, step latency and the memory held
+    per loaded sound, all on the headless null backend.
+
+    PARAMETERS
+    ----------
+    spec
+        The shape of the map to benchmark.
+    root
+        Where to write the map; a temporary folder by default.
+    steps
+        The number of `step()` calls to time.
+    repeat
+        How often to repeat the validation and compile timings.
+    """
+    ensure_app()
+    with tempfile.TemporaryDirectory(prefix="sound_r_bench_") as tmp:
+        data_map = synth_map(root or tmp, spec)
+        result = BenchResult(spec=spec.as_dict())
+        result.validate_ms = _time_ms(
+            lambda: validate_mapping(data_map, update_map=False), repeat
+        )
+        result.compile_ms = _time_ms(lambda: compile_map(data_map), repeat)
+
+        start = time.perf_counter()
+        headless = HeadlessEngine(data_map)
+        result.engine_init_ms = (time.perf_counter() - start) * 1000
+        report = headless.load_assets()
+        if report is not None:
+            result.start_ready_ms = report.start_ready_ms or 0.0
+            result.load_ms = report.wall_ms
+
+        headless.start()
+        samples, result.scene_jumps = _measure_steps(headless, steps)
+        result.steps = len(samples)
+        result.step_ms = percentiles(samples)
+        headless.engine.sink.stop()
+
+        result.loaded_sounds, result.bytes_per_sound = _measure_memory(data_map)
+    return result
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import json
+import math
+import pathlib
+import random
+import struct
+import wave
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from ..sounds import types
+
+logger = get_default_logger(__name__)
+
+
+@dataclass
+class SynthSpec:
+    """
+    The shape of a synthetic map.
+
+    PARAMETERS
+    ----------
+    scenes
+        The number of scenes.
+    sounds
+        The number of distinct sound files.
+    art
+        The number of distinct art files.
+    objects_per_scene
+        The number of sound and art objects in each scene.
+    cue_depth
+        The length of the cue chains; every scene cues the next one until the
+        chain is this long.
+    sound_ms
+        The length of each sound file.
+    art_size
+        The width and height of each art file.
+    loop_ratio
+        The share of sound objects that loop.
+    seed
+        Seeds the choice of assets, so equal specs give equal maps.
+    """
+
+    scenes: int = 20
+    sounds: int = 50
+    art: int = 10
+    objects_per_scene: int = 8
+    cue_depth: int = 4
+    sound_ms: int = 1000
+    art_size: int = 512
+    loop_ratio: float = 0.2
+    seed: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def write_tone(path: pathlib.Path, ms: int, freq: float, sample_rate: int = 48000):
+    frames = sample_rate * ms // 1000
+    samples = (
+        int(8000 * math.sin(2 * math.pi * freq * i / sample_rate))
+        for i in range(frames)
+    )
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(struct.pack(f"<{frames}h", *samples))
+
+
+def write_art(path: pathlib.Path, size: int, hue: int):
+    from PySide6 import QtGui
+
+    image = QtGui.QImage(size, size, QtGui.QImage.Format.Format_RGB32)
+    image.fill(QtGui.QColor.fromHsv(hue % 360, 160, 200))
+    image.save(str(path))
+
+
+def synth_map(root: pathlib.Path | str, spec: SynthSpec) -> types.ObjectMap:
+    """
+    Writes a map described by `spec` to `root` (map.json plus its sounds and
+    art) and returns it ready to be loaded. Asset files are reused if they
+    already exist.
+    """
+    root = pathlib.Path(root)
+    (root / "sounds").mkdir(parents=True, exist_ok=True)
+    (root / "art").mkdir(parents=True, exist_ok=True)
+    rng = random.Random(spec.seed)
+
+    sound_ids = {f"snd{i}": f"snd{i}.wav" for i in range(spec.sounds)}
+    for i, file in enumerate(sound_ids.values()):
+        path = root / "sounds" / file
+        if not path.exists():
+            write_tone(path, spec.sound_ms, 220 + 10 * i)
+    art_ids = {f"art{i}": f"art{i}.png" for i in range(spec.art)}
+    for i, file in enumerate(art_ids.values()):
+        path = root / "art" / file
+        if not path.exists():
+            write_art(path, spec.art_size, 37 * i)
+
+    names = ["start"] + [f"scene{i}" for i in range(1, spec.scenes)]
+    scenes: dict[str, list[types.SceneObject]] = {}
+    for i, name in enumerate(names):
+        objects: list[types.SceneObject] = []
+        for j in range(spec.objects_per_scene):
+            if art_ids and rng.random() < 0.2:
+                objects.append(
+                    {
+                        "type": "art",
+                        "id": f"{name}-{j}",
+                        "payload": rng.choice([*art_ids]),
+                    }
+                )
+            elif sound_ids:
+                objects.append(
+                    {
+                        "type": "sound",
+                        "id": f"{name}-{j}",
+                        "payload": rng.choice([*sound_ids]),
+                        "loop": rng.random() < spec.loop_ratio,
+                    }
+                )
+        if (i + 1) % max(spec.cue_depth, 1) and i + 1 < len(names):
+            objects.append(
+                {"type": "cue", "id": f"{name}-cue", "payload": names[i + 1]}
+            )
+        scenes[name] = objects
+
+    data_map = {
+        "soundIDs": sound_ids,
+        "artIDs": art_ids,
+        "scenes": scenes,
+        "globalOptions": {
+            "audioBackend": "null",
+            "pcmCache": False,
+            "normalizeLoudness": False,
+            "trimSilence": False,
+        },
+    }
+    with (root / "map.json").open("w") as f:
+        json.dump(data_map, f, indent=2)
+    data_map["root"] = root
+    logger.info(
+        "Synthesized %d scenes, %d sounds and %d art in %s",
+        spec.scenes,
+        spec.sounds,
+        spec.art,
+        root,
+    )
+    return data_map
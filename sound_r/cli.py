@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from .sounds.compiled import (
+    MapValidationError,
+    ValidationIssue,
+    compile_map,
+    json_pointer,
+    log_issues,
+)
+from .sounds.probe import probe_sound
+from .utils import get_default_logger, load_map
+
+if TYPE_CHECKING:
+    import pathlib
+
+    from .sounds.compiled import CompiledMap
+
+# The commands that only read the map and the headers of its assets. Nothing
+# imported here may import Qt or numpy, so they start in a fraction of a
+# second; see `python -m sound_r.bench --startup`.
+
+logger = get_default_logger(__name__)
+
+
+def missing_assets(compiled: CompiledMap) -> list[ValidationIssue]:
+    """
+    Returns an issue for every sound and image whose file does not exist.
+    """
+    issues = []
+    for kind, folder, ids, files in (
+        ("soundIDs", "sounds", compiled.sound_ids, compiled.sound_files),
+        ("artIDs", "art", compiled.art_ids, compiled.art_files),
+    ):
+        for asset_id, file in zip(ids, files):
+            if not os.path.isfile(compiled.root / folder / file):
+                issues.append(
+                    ValidationIssue(
+                        json_pointer(kind, asset_id),
+                        "nofile",
+                        f"`{asset_id}` points to a missing file `{folder}/{file}`.",
+                    )
+                )
+    return issues
+
+
+def validate_map(map_path: pathlib.Path, check_files: bool = True) -> int:
+    """
+    Validates map.json, logging every issue, and returns the number found.
+
+    PARAMETERS
+    ----------
+    map_path
+        The map.json to check.
+    check_files
+        Whether to also check that every asset file exists.
+    """
+    try:
+        compiled = compile_map(load_map(map_path))
+    except MapValidationError as e:
+        # Too broken to compile at all, e.g. without scenes.
+        log_issues(e.issues)
+        logger.info("%s: %d issues", map_path, len(e.issues))
+        return len(e.issues)
+    issues = list(compiled.issues)
+    if check_files:
+        issues += missing_assets(compiled)
+    log_issues(issues)
+    logger.info(
+        "%s: %d scenes, %d objects, %d issues",
+        map_path,
+        len(compiled.scenes),
+        compiled.object_count,
+        len(issues),
+    )
+    return len(issues)
+
+
+@dataclass
+class MapStats:
+    scenes: int = 0
+    objects: int = 0
+    objects_by_type: dict[str, int] = field(default_factory=dict)
+    timed_objects: int = 0
+    sounds: int = 0
+    art: int = 0
+    sound_bytes: int = 0
+    art_bytes: int = 0
+    sound_ms: float = 0.0  # sounds whose length could be read from the header
+    sounds_without_length: int = 0
+    missing_files: int = 0
+    issues: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = []
+        for name, value in self.as_dict().items():
+            if isinstance(value, dict):
+                value = ", ".join(f"{k} {v}" for k, v in value.items()) or "-"
+            elif isinstance(value, float):
+                value = f"{value:.1f}"
+            lines.append(f"{name:<22}{value}")
+        return "\n".join(lines)
+
+
+def map_stats(compiled: CompiledMap) -> MapStats:
+    """
+    Counts the scenes, objects and assets of a map and sizes its assets from
+    their files and headers.
+    """
+    by_type = Counter(
+        obj.type.name.lower() for scene in compiled.scenes for obj in scene.objects
+    )
+    stats = MapStats(
+        scenes=len(compiled.scenes),
+        objects=compiled.object_count,
+        objects_by_type=dict(by_type),
+        timed_objects=sum(
+            obj.timed for scene in compiled.scenes for obj in scene.objects
+        ),
+        sounds=len(compiled.sound_ids),
+        art=len(compiled.art_ids),
+        issues=len(compiled.issues),
+    )
+    for file in compiled.sound_files:
+        path = compiled.root / "sounds" / file
+        try:
+            stats.sound_bytes += os.path.getsize(path)
+        except OSError:
+            stats.missing_files += 1
+            continue
+        duration = probe_sound(path).get("duration_ms")
+        if duration is None:
+            stats.sounds_without_length += 1
+        else:
+            stats.sound_ms += duration
+    for file in compiled.art_files:
+        try:
+            stats.art_bytes += os.path.getsize(compiled.root / "art" / file)
+        except OSError:
+            stats.missing_files += 1
+    return stats
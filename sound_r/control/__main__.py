@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from ..bench.synth import SynthSpec
+from ..utils import get_default_logger
+from .client import ControlClient
+from .load import run_load, run_spawned_load
+from .server import DEFAULT_CONTROL_PORT, DEFAULT_HOST, EVENTS
+
+logger = get_default_logger(__name__)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m sound_r.control",
+        description="Talks to a running sound_r control server.",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_CONTROL_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    send = commands.add_parser(
+        "send", help="Send one request, e.g. `send step` or `send obj intro 3`."
+    )
+    send.add_argument("words", nargs="+")
+    listen = commands.add_parser("listen", help="Print events as they arrive.")
+    listen.add_argument("events", nargs="*", choices=EVENTS)
+    load = commands.add_parser(
+        "load", help="Send a command at a fixed rate and report the latency."
+    )
+    load.add_argument("--cmd", default="step", help="The request line to send.")
+    load.add_argument("--rate", type=float, default=500.0, help="Commands/second.")
+    load.add_argument("--seconds", type=float, default=5.0)
+    load.add_argument("--batch", type=int, default=1, help="Commands per request.")
+    load.add_argument(
+        "--spawn",
+        action="store_true",
+        help="Serve a headless engine on a synthetic map in this process instead "
+        "of connecting to --host/--port.",
+    )
+    load.add_argument("--json", action="store_true", help="Print JSON.")
+    args = parser.parse_args()
+
+    if args.command == "send":
+        with ControlClient(args.host, args.port) as client:
+            print(json.dumps(client.send_line(" ".join(args.words))))
+    elif args.command == "listen":
+        with ControlClient(args.host, args.port, timeout=None) as client:
+            client.subscribe(*args.events)
+            try:
+                for event in client.events():
+                    print(json.dumps(event), flush=True)
+            except KeyboardInterrupt:
+                pass
+    else:
+        load_args = dict(
+            command=args.cmd, rate=args.rate, seconds=args.seconds, batch=args.batch
+        )
+        if args.spawn:
+            result = run_spawned_load(SynthSpec(sound_ms=200), **load_args)
+        else:
+            result = run_load(args.host, args.port, **load_args)
+        print(
+            json.dumps(result.as_dict(), indent=2)
+            if args.json
+            else result.format_table()
+        )
+        sys.exit(1 if result.errors or result.replied < result.sent else 0)
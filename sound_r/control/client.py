@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+import socket
+from collections import deque
+from typing import TYPE_CHECKING
+
+from .protocol import DEFAULT_CONTROL_PORT, DEFAULT_HOST, encode
+
+if TYPE_CHECKING:
+    from typing import Any, Iterator, Optional
+
+
+class ControlClient:
+    """
+    A blocking client for `ControlServer`, for scripts and tests.
+
+    Replies and events share the connection; events read while waiting for a
+    reply are kept for `events`.
+
+    PARAMETERS
+    ----------
+    host, port
+        The server's address.
+    timeout
+        Seconds to wait for a reply or an event.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_CONTROL_PORT,
+        timeout: Optional[float] = 5.0,
+    ):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rb")
+        self.pending_events: deque[dict] = deque()
+
+    def __enter__(self) -> ControlClient:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def _read(self) -> Any:
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("The control server closed the connection.")
+        return json.loads(line)
+
+    def _read_reply(self) -> Any:
+        while True:
+            message = self._read()
+            if isinstance(message, dict) and "event" in message:
+                self.pending_events.append(message)
+            else:
+                return message
+
+    def send_line(self, line: str) -> Any:
+        """
+        Sends a raw request line, e.g. `step` or `obj intro 3; step`, and
+        returns the reply.
+        """
+        self.sock.sendall(line.rstrip("\n").encode() + b"\n")
+        return self._read_reply()
+
+    def request(self, cmd: str, **args) -> dict:
+        self.sock.sendall(encode({"cmd": cmd, **args}))
+        return self._read_reply()
+
+    def batch(self, commands: list[dict]) -> list[dict]:
+        """
+        Sends `commands` as one request; they run in order in a single turn of
+        the engine's event loop.
+        """
+        self.sock.sendall(encode(commands))
+        return self._read_reply()
+
+    def step(self, layer: Optional[str] = None) -> dict:
+        return self.request("step", layer=layer)
+
+    def play_scene(self, scene_id: str, layer: Optional[str] = None) -> dict:
+        return self.request("scene", scene=scene_id, layer=layer)
+
+    def play_obj(self, scene_id: str, idx: int, layer: Optional[str] = None) -> dict:
+        return self.request("obj", scene=scene_id, idx=idx, layer=layer)
+
+    def state(self, layer: Optional[str] = None) -> dict:
+        return self.request("state", layer=layer)
+
+    def stop_layer(self, layer: str) -> dict:
+        return self.request("stop", layer=layer)
+
+    def layers(self) -> list[dict]:
+        return self.request("layers")["layers"]
+
+    def buses(self) -> list[dict]:
+        return self.request("buses")["buses"]
+
+    def set_bus_gain(self, bus: str, gain_db: float, fade_ms: float = 0) -> dict:
+        return self.request("gain", bus=bus, gain_db=gain_db, fade_ms=fade_ms)
+
+    def subscribe(self, *events: str) -> dict:
+        """
+        Subscribes to `events`, or to every event if none are given.
+        """
+        return self.request("subscribe", events=list(events))
+
+    def unsubscribe(self, *events: str) -> dict:
+        return self.request("unsubscribe", events=list(events))
+
+    def events(self) -> Iterator[dict]:
+        """
+        Yields events as they arrive, until the connection closes or times out.
+        """
+        try:
+            while True:
+                while self.pending_events:
+                    yield self.pending_events.popleft()
+                message = self._read()
+                if isinstance(message, dict) and "event" in message:
+                    yield message
+        except (ConnectionError, socket.timeout):
+            return
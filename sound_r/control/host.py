@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..utils import get_default_logger
+from .server import EVENTS, ControlError, ControlServer
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from ..sounds.loader import TimingReport
+    from ..sounds.reload import MapDiff
+    from ..sounds.sound_engine import SoundEngine
+
+logger = get_default_logger(__name__)
+
+# Printed on stdout, followed by the port, once the engine process listens.
+READY_PREFIX = "sound_r engine listening on"
+HOST_EVENTS = (
+    *EVENTS,
+    "clear_loop",
+    "map_reloaded",
+    "scene_ready",
+    "assets_loaded",
+)
+
+
+class EngineHost(ControlServer):
+    """
+    Serves a `SoundEngine` running in its own process to a `RemoteEngine`
+    in the GUI's, so nothing the GUI does delays the engine's event loop.
+
+    On top of the control commands it loads assets (`load`), starts the
+    engine (`start`) and watches the map (`watch`), and forwards every signal
+    the window uses as an event. The process quits once its last client
+    disconnects.
+    """
+
+    events = HOST_EVENTS
+    _orphaned = QtCore.Signal()
+
+    def __init__(self, engine: SoundEngine, *args, **kwargs):
+        super().__init__(engine, *args, **kwargs)
+        self._commands.update(
+            load=self._cmd_load, start=self._cmd_start, watch=self._cmd_watch
+        )
+        self._loader = None
+        engine.clear_loop.connect(lambda: self._emit_event("clear_loop"))
+        engine.map_reloaded.connect(self._on_map_reloaded)
+        # Emitted by the server's thread.
+        self._orphaned.connect(
+            QtCore.QCoreApplication.quit, QtCore.Qt.ConnectionType.QueuedConnection
+        )
+
+    async def _serve_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        await super()._serve_client(reader, writer)
+        if not self._clients:
+            logger.info("Last client gone; stopping the engine process")
+            self._orphaned.emit()
+
+    def _cmd_load(self, cmd: dict) -> dict:
+        if self._loader is not None:
+            raise ControlError("Assets are already loading.")
+        self._loader = self.engine.load_assets()
+        self._loader.scene_ready.connect(lambda: self._emit_event("scene_ready"))
+        self._loader.finished.connect(self._on_assets_loaded)
+        return {}
+
+    def _cmd_start(self, cmd: dict) -> dict:
+        self.engine.start()
+        return self._state(self.engine.main)
+
+    def _cmd_watch(self, cmd: dict) -> dict:
+        self.engine.watch_map()
+        return {}
+
+    def _on_assets_loaded(self, report: TimingReport):
+        self._emit_event("assets_loaded", report=report.as_dict())
+
+    def _on_map_reloaded(self, diff: MapDiff):
+        self._emit_event(
+            "map_reloaded",
+            **{name: sorted(ids) for name, ids in vars(diff).items()},
+        )
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..bench.suite import percentiles
+from ..bench.synth import synth_map
+from ..headless import HeadlessEngine
+from ..utils import get_default_logger
+from .server import DEFAULT_HOST, MAX_LINE_BYTES, ControlServer, encode, parse_line
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import Optional
+
+    from ..bench.synth import SynthSpec
+
+logger = get_default_logger(__name__)
+
+# How long to wait for the last replies once everything is sent.
+DRAIN_TIMEOUT_S = 5.0
+
+
+@dataclass
+class LoadResult:
+    command: str
+    rate: float  # requested commands per second
+    seconds: float
+    batch: int  # commands per request
+    sent: int = 0
+    replied: int = 0
+    errors: int = 0
+    achieved_rate: float = 0.0  # replied commands per second
+    round_trip_ms: dict[str, float] = field(default_factory=dict)
+    server_ms: dict[str, float] = field(default_factory=dict)
+    server: dict[str, int] = field(default_factory=dict)  # ControlStats
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def format_table(self) -> str:
+        lines = [
+            f"{self.command!r} x{self.batch} at {self.rate:g}/s for {self.seconds:g} s",
+            f"sent {self.sent}, replied {self.replied}, errors {self.errors}, "
+            f"{self.achieved_rate:.0f}/s",
+            f"{'(ms)':<14}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}",
+        ]
+        for name, p in (
+            ("round trip", self.round_trip_ms),
+            ("server", self.server_ms),
+        ):
+            lines.append(
+                f"{name:<14}{p['p50']:>9.3f}{p['p90']:>9.3f}"
+                f"{p['p99']:>9.3f}{p['max']:>9.3f}"
+            )
+        return "\n".join(lines)
+
+
+async def _load(
+    host: str, port: int, command: str, rate: float, seconds: float, batch: int
+) -> LoadResult:
+    commands, _ = parse_line(command)
+    line = encode(commands * batch if batch > 1 else commands[0])
+    result = LoadResult(command=command, rate=rate, seconds=seconds, batch=batch)
+    round_trips: list[float] = []
+    server_ms: list[float] = []
+    # Replies to one connection come back in request order.
+    sent_at: deque[float] = deque()
+    done_sending = asyncio.Event()
+
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE_BYTES)
+
+    async def send():
+        interval = batch / rate
+        start = next_at = time.perf_counter()
+        while next_at - start < seconds:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent_at.append(time.perf_counter())
+            writer.write(line)
+            result.sent += batch
+            await writer.drain()
+            next_at += interval
+        done_sending.set()
+
+    async def receive():
+        while not (done_sending.is_set() and not sent_at):
+            raw = await reader.readline()
+            if not raw:
+                break
+            now = time.perf_counter()
+            reply = json.loads(raw)
+            if isinstance(reply, dict) and "event" in reply:
+                continue
+            replies = reply if isinstance(reply, list) else [reply]
+            round_trips.append((now - sent_at.popleft()) * 1000)
+            for r in replies:
+                result.replied += 1
+                if r.get("ok"):
+                    server_ms.append(r.get("ms", 0.0))
+                else:
+                    result.errors += 1
+
+    started = time.perf_counter()
+    sender = asyncio.create_task(send())
+    receiver = asyncio.create_task(receive())
+    await sender
+    try:
+        await asyncio.wait_for(receiver, DRAIN_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        logger.warning("%d requests were not answered", len(sent_at))
+    elapsed = time.perf_counter() - started
+    writer.close()
+    await writer.wait_closed()
+    result.achieved_rate = result.replied / elapsed if elapsed else 0.0
+    result.round_trip_ms = percentiles(round_trips)
+    result.server_ms = percentiles(server_ms)
+    return result
+
+
+def run_load(
+    host: str = DEFAULT_HOST,
+    port: int = 0,
+    command: str = "step",
+    rate: float = 500.0,
+    seconds: float = 5.0,
+    batch: int = 1,
+) -> LoadResult:
+    """
+    Sends `command` to a running control server `rate` times a second (in
+    requests of `batch` commands) for `seconds`, and measures how many were
+    answered and how long that took.
+
+    PARAMETERS
+    ----------
+    command
+        A request line, e.g. `step`, `ping` or `obj start 0`.
+    """
+    return asyncio.run(_load(host, port, command, rate, seconds, batch))
+
+
+def run_spawned_load(
+    spec: SynthSpec, root: Optional[pathlib.Path] = None, **load_args
+) -> LoadResult:
+    """
+    Runs `run_load` against a control server for a headless engine playing a
+    synthetic map, all in this process. The engine runs on the calling
+    thread's Qt event loop, like it does in the app.
+    """
+    with tempfile.TemporaryDirectory(prefix="sound_r_load_") as tmp:
+        data_map = synth_map(root or tmp, spec)
+        data_map["globalOptions"]["loopScenes"] = True
+        headless = HeadlessEngine(data_map, realtime=True)
+        headless.load_assets()
+        headless.start()
+        server = ControlServer(headless.engine, port=0)
+        port = server.start()
+        results: list[LoadResult] = []
+        client = threading.Thread(
+            target=lambda: results.append(run_load(port=port, **load_args)),
+            name="sound_r-load",
+        )
+        loop = QtCore.QEventLoop()
+        poll = QtCore.QTimer()
+        poll.timeout.connect(lambda: client.is_alive() or loop.quit())
+        poll.start(50)
+        client.start()
+        loop.exec()
+        poll.stop()
+        client.join()
+        server.stop()
+        headless.engine.sink.stop()
+    if not results:
+        raise RuntimeError("The load test failed; see the log.")
+    results[0].server = server.stats.as_dict()
+    return results[0]
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any
+
+# Shared by the server and its clients; kept free of Qt so clients start fast.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_CONTROL_PORT = 47800
+
+
+def encode(message: Any) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
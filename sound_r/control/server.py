@@ -0,0 +1,551 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..metrics import metrics
+from ..sounds.layers import MAIN_LAYER
+from ..utils import get_default_logger
+from .protocol import DEFAULT_CONTROL_PORT, DEFAULT_HOST, encode
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Optional
+
+    from ..sounds.layers import Layer
+    from ..sounds.sound_engine import SoundEngine
+
+logger = get_default_logger(__name__)
+
+EVENTS = ("sound_looped", "scene_looped", "select_image")
+# Events are dropped for a subscriber with this many bytes still unsent.
+MAX_EVENT_BACKLOG = 256 * 1024
+MAX_LINE_BYTES = 64 * 1024
+PLAY_COMMANDS = frozenset(("step", "scene", "obj"))
+
+
+class ControlError(ValueError):
+    pass
+
+
+@dataclass
+class ControlStats:
+    clients: int = 0  # connected now
+    commands: int = 0
+    batches: int = 0  # requests carrying more than one command
+    drains: int = 0  # hops to the Qt thread
+    errors: int = 0
+    events_sent: int = 0
+    events_dropped: int = 0  # subscriber too far behind
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+def parse_line(line: str) -> tuple[list[dict], bool]:
+    """
+    Parses one request line into its commands and whether it was a batch.
+
+    A line is either JSON (a command object, or an array of them for a batch)
+    or text: a command name and its arguments separated by spaces, with `;`
+    separating the commands of a batch, e.g. `step` or `obj intro 3; step`.
+    Commands that act on a layer take its name last, e.g. `step music` or
+    `scene battle music`. `gain sfx -6 200` fades the bus `sfx` to -6 dB over
+    200 ms.
+    """
+    line = line.strip()
+    if line[:1] in ("{", "["):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ControlError(f"Invalid JSON: {e}") from None
+        if isinstance(request, dict):
+            return [request], False
+        if isinstance(request, list) and all(isinstance(c, dict) for c in request):
+            return request, True
+        raise ControlError("A request must be an object or an array of objects.")
+    commands = []
+    for part in line.split(";"):
+        words = part.split()
+        if not words:
+            continue
+        match words:
+            case ["scene", scene, *layer] if len(layer) <= 1:
+                commands.append(
+                    {
+                        "cmd": "scene",
+                        "scene": scene,
+                        "layer": layer[0] if layer else None,
+                    }
+                )
+            case ["obj", scene, idx, *layer] if len(layer) <= 1:
+                commands.append(
+                    {
+                        "cmd": "obj",
+                        "scene": scene,
+                        "idx": idx,
+                        "layer": layer[0] if layer else None,
+                    }
+                )
+            case [("step" | "state" | "stop") as cmd, layer]:
+                commands.append({"cmd": cmd, "layer": layer})
+            case ["gain", bus, gain_db, *fade_ms] if len(fade_ms) <= 1:
+                commands.append(
+                    {
+                        "cmd": "gain",
+                        "bus": bus,
+                        "gain_db": gain_db,
+                        "fade_ms": fade_ms[0] if fade_ms else 0,
+                    }
+                )
+            case [("subscribe" | "unsubscribe") as cmd, *events]:
+                commands.append({"cmd": cmd, "events": events})
+            case [cmd]:
+                commands.append({"cmd": cmd})
+            case _:
+                raise ControlError(f"Invalid command: {part.strip()}")
+    return commands, len(commands) > 1
+
+
+class _Client:
+    __slots__ = ("writer", "events", "name")
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.events: set[str] = set()
+        peer = writer.get_extra_info("peername")
+        self.name = f"{peer[0]}:{peer[1]}" if peer else "?"
+
+    def send(self, message: Any) -> bool:
+        if self.writer.is_closing():
+            return False
+        self.writer.write(encode(message))
+        return True
+
+    @property
+    def backlog(self) -> int:
+        return self.writer.transport.get_write_buffer_size()
+
+
+class _Request:
+    __slots__ = ("client", "commands", "batch", "received")
+
+    def __init__(
+        self, client: _Client, commands: list[dict], batch: bool, received: float
+    ):
+        self.client = client
+        self.commands = commands
+        self.batch = batch
+        self.received = received
+
+
+class ControlServer(QtCore.QObject):
+    """
+    Lets local clients drive a `SoundEngine` over TCP.
+
+    The server runs an asyncio loop on its own thread. Requests are one JSON
+    or text line each (see `parse_line`) and are answered with one JSON line.
+    They are queued for the Qt thread, which runs everything queued so far in
+    a single event-loop turn, so a burst of requests costs one thread hop
+    instead of one per command. Subscribed clients also get the engine's
+    `sound_looped`, `scene_looped` and `select_image` signals as events.
+
+    Each reply carries `ms`, the time from reading the request to the end of
+    the command, which for play commands is the command-to-play latency, and
+    `handler_ms`, the part of it spent running the command on the Qt thread.
+    With metrics enabled the same times are recorded as `control.to_play`
+    (play commands) and `control.queued` (waiting for the Qt thread).
+
+    PARAMETERS
+    ----------
+    engine
+        The engine to drive.
+    host, port
+        Where to listen. Port 0 picks a free port; see `port` after `start`.
+    step
+        Called for `step` instead of `engine.step`, e.g. to also update a
+        window.
+    """
+
+    _requests_ready = QtCore.Signal()
+    # What clients can subscribe to.
+    events: tuple[str, ...] = EVENTS
+
+    def __init__(
+        self,
+        engine: SoundEngine,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_CONTROL_PORT,
+        step: Optional[Callable[[], None]] = None,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.stats = ControlStats()
+        self._step = step or engine.step
+        self._commands: dict[str, Callable[[dict], dict]] = {
+            "step": self._cmd_step,
+            "scene": self._cmd_scene,
+            "obj": self._cmd_obj,
+            "state": self._cmd_state,
+            "stop": self._cmd_stop,
+            "layers": self._cmd_layers,
+            "buses": self._cmd_buses,
+            "gain": self._cmd_gain,
+            "ping": lambda _cmd: {},
+            "subscribe": self._cmd_unbatchable,
+            "unsubscribe": self._cmd_unbatchable,
+        }
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._start_error: Optional[OSError] = None
+        self._clients: set[_Client] = set()
+        # Read by the Qt thread to skip building events nobody wants.
+        self._subscribed: dict[str, int] = dict.fromkeys(self.events, 0)
+        self._pending: deque[_Request] = deque()
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._requests_ready.connect(
+            self._run_pending, QtCore.Qt.ConnectionType.QueuedConnection
+        )
+        engine.sound_looped.connect(self._on_sound_looped)
+        engine.scene_looped.connect(self._on_scene_looped)
+        engine.select_image.connect(self._on_select_image)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> int:
+        """
+        Starts listening and returns the port. Raises OSError if the address
+        can't be bound.
+        """
+        if self.running:
+            return self.port
+        self._started.clear()
+        self._start_error = None
+        self._thread = threading.Thread(
+            target=self._run, name="sound_r-control", daemon=True
+        )
+        self._thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._start_error
+        logger.info("Control server listening on %s:%d", self.host, self.port)
+        return self.port
+
+    def stop(self):
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        logger.info("Control server stopped")
+
+    # Server thread
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(
+                asyncio.start_server(
+                    self._serve_client, self.host, self.port, limit=MAX_LINE_BYTES
+                )
+            )
+        except OSError as e:
+            self._start_error = e
+            self._started.set()
+            loop.close()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            for client in list(self._clients):
+                client.writer.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+            self._clients.clear()
+            self._subscribed = dict.fromkeys(self.events, 0)
+
+    async def _serve_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        client = _Client(writer)
+        self._clients.add(client)
+        self.stats.clients = len(self._clients)
+        logger.debug("Control client %s connected", client.name)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    client.send({"ok": False, "error": "Request line too long."})
+                    break
+                if not line:
+                    break
+                self._receive(client, line.decode(errors="replace"))
+        except ConnectionError:
+            pass
+        finally:
+            self._set_events(client, ())
+            self._clients.discard(client)
+            self.stats.clients = len(self._clients)
+            writer.close()
+            logger.debug("Control client %s disconnected", client.name)
+
+    def _receive(self, client: _Client, line: str):
+        received = time.perf_counter()
+        if not line.strip():
+            return
+        try:
+            commands, batch = parse_line(line)
+        except ControlError as e:
+            self.stats.errors += 1
+            client.send({"ok": False, "error": str(e)})
+            return
+        # Subscriptions are handled here; everything else needs the engine.
+        if (
+            not batch
+            and commands
+            and commands[0].get("cmd")
+            in (
+                "subscribe",
+                "unsubscribe",
+            )
+        ):
+            client.send(self._subscribe(client, commands[0]))
+            return
+        self.stats.commands += len(commands)
+        self.stats.batches += batch
+        self._pending.append(_Request(client, commands, batch, received))
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._requests_ready.emit()
+
+    def _subscribe(self, client: _Client, cmd: dict) -> dict:
+        events = cmd.get("events") or self.events
+        if not isinstance(events, (list, tuple)) or not all(
+            isinstance(event, str) for event in events
+        ):
+            return self._reply(cmd, error=f"Invalid events: {events}")
+        unknown = set(events) - set(self.events)
+        if unknown:
+            return self._reply(cmd, error=f"Unknown events: {sorted(unknown)}")
+        if cmd["cmd"] == "subscribe":
+            self._set_events(client, client.events | set(events))
+        else:
+            self._set_events(client, client.events - set(events))
+        return self._reply(cmd, events=sorted(client.events))
+
+    def _set_events(self, client: _Client, events):
+        for event in client.events:
+            self._subscribed[event] -= 1
+        client.events = set(events)
+        for event in client.events:
+            self._subscribed[event] += 1
+
+    def _deliver(self, replies: list[tuple[_Client, Any]]):
+        for client, reply in replies:
+            client.send(reply)
+
+    def _broadcast(self, event: str, message: dict):
+        for client in self._clients:
+            if event not in client.events:
+                continue
+            if client.backlog > MAX_EVENT_BACKLOG:
+                self.stats.events_dropped += 1
+            elif client.send(message):
+                self.stats.events_sent += 1
+
+    # Qt thread
+
+    def _run_pending(self):
+        with self._lock:
+            self._scheduled = False
+        self.stats.drains += 1
+        replies = []
+        while self._pending:
+            request = self._pending.popleft()
+            results = [self._execute(cmd, request.received) for cmd in request.commands]
+            replies.append((request.client, results if request.batch else results[0]))
+        if replies:
+            self._call_in_loop(self._deliver, replies)
+
+    def _call_in_loop(self, func: Callable, *args):
+        try:
+            self._loop.call_soon_threadsafe(func, *args)
+        except (AttributeError, RuntimeError):
+            # Stopped; clients are gone.
+            pass
+
+    @staticmethod
+    def _reply(cmd: dict, error: Optional[str] = None, **result) -> dict:
+        reply = {"id": cmd["id"]} if "id" in cmd else {}
+        if error is not None:
+            reply.update(ok=False, error=error)
+        else:
+            reply.update(ok=True, **result)
+        return reply
+
+    def _execute(self, cmd: dict, received: float) -> dict:
+        """
+        Runs one command and returns its reply; every command gets exactly one,
+        an error reply if it fails in any way.
+        """
+        started = time.perf_counter()
+        name = cmd.get("cmd")
+        metrics.record("control.queued", (started - received) * 1000)
+        try:
+            handler = self._commands.get(name) if isinstance(name, str) else None
+            if handler is None:
+                raise ControlError(f"Unknown command: {name}")
+            result = handler(cmd)
+        except ControlError as e:
+            self.stats.errors += 1
+            return self._reply(cmd, error=str(e))
+        except Exception as e:
+            logger.exception("Control command %s failed", name)
+            self.stats.errors += 1
+            return self._reply(cmd, error=f"{type(e).__name__}: {e}")
+        done = time.perf_counter()
+        ms = (done - received) * 1000
+        if name in PLAY_COMMANDS:
+            metrics.record("control.to_play", ms)
+        return self._reply(
+            cmd,
+            ms=round(ms, 3),
+            handler_ms=round((done - started) * 1000, 3),
+            **result,
+        )
+
+    def _layer_arg(self, cmd: dict, create: bool = False) -> Layer:
+        name = cmd.get("layer") or MAIN_LAYER
+        if not isinstance(name, str):
+            raise ControlError(f"Invalid layer: {name}")
+        if create:
+            return self.engine.layer(name)
+        layer = self.engine.layers.get(name)
+        if layer is None:
+            raise ControlError(f"Unknown layer: {name}")
+        return layer
+
+    def _require_started(self, layer: Layer):
+        if layer.scene is None:
+            if layer is self.engine.main:
+                raise ControlError("The engine has not started.")
+            raise ControlError(f"Layer `{layer.name}` is idle.")
+
+    def _scene_arg(self, cmd: dict) -> str:
+        scene_id = cmd.get("scene")
+        if (
+            not isinstance(scene_id, str)
+            or scene_id not in self.engine.scene_map.scene_index
+        ):
+            raise ControlError(f"Unknown scene: {scene_id}")
+        return scene_id
+
+    @staticmethod
+    def _state(layer: Layer) -> dict:
+        state = {"layer": layer.name, "scene": None, "idx": layer.idx, "obj": None}
+        if layer.scene is not None:
+            state["scene"] = layer.scene.name
+            if layer.scene.objects:
+                state["obj"] = layer.obj.id
+        return state
+
+    def _cmd_step(self, cmd: dict) -> dict:
+        layer = self._layer_arg(cmd)
+        self._require_started(layer)
+        if layer is self.engine.main:
+            self._step()
+        else:
+            self.engine.step(layer.name)
+        return self._state(layer)
+
+    def _cmd_scene(self, cmd: dict) -> dict:
+        layer = self._layer_arg(cmd, create=True)
+        self.engine.play_scene(self._scene_arg(cmd), layer.name)
+        return self._state(layer)
+
+    def _cmd_obj(self, cmd: dict) -> dict:
+        scene_id = self._scene_arg(cmd)
+        try:
+            idx = int(cmd.get("idx"))
+        except (TypeError, ValueError):
+            raise ControlError(f"Invalid object index: {cmd.get('idx')}") from None
+        if not 0 <= idx < len(self.engine.scene_map.scene(scene_id)):
+            raise ControlError(f"No object {idx} in scene `{scene_id}`")
+        self.engine.play_obj(scene_id, idx, self._layer_arg(cmd).name)
+        return {}
+
+    def _cmd_state(self, cmd: dict) -> dict:
+        return self._state(self._layer_arg(cmd))
+
+    def _cmd_stop(self, cmd: dict) -> dict:
+        layer = self._layer_arg(cmd)
+        self.engine.stop_layer(layer.name)
+        return self._state(layer)
+
+    def _cmd_layers(self, cmd: dict) -> dict:
+        return {"layers": [self._state(layer) for layer in self.engine.layers.values()]}
+
+    def _cmd_buses(self, cmd: dict) -> dict:
+        return {
+            "buses": [
+                {"bus": bus.name, "max_voices": bus.max_voices, **bus.stats.as_dict()}
+                for bus in self.engine.buses.values()
+            ]
+        }
+
+    def _cmd_gain(self, cmd: dict) -> dict:
+        bus = cmd.get("bus")
+        if not isinstance(bus, str):
+            raise ControlError(f"Invalid bus: {bus}")
+        try:
+            gain_db = float(cmd.get("gain_db"))
+            fade_ms = float(cmd.get("fade_ms") or 0)
+        except (TypeError, ValueError):
+            raise ControlError("`gain_db` and `fade_ms` must be numbers.") from None
+        self.engine.set_bus_gain(bus, gain_db, fade_ms)
+        return {}
+
+    def _cmd_unbatchable(self, cmd: dict) -> dict:
+        raise ControlError(f"`{cmd['cmd']}` can't be part of a batch.")
+
+    def _emit_event(self, event: str, **fields):
+        if self._subscribed[event] and self.running:
+            self._call_in_loop(self._broadcast, event, {"event": event, **fields})
+
+    def _on_sound_looped(self, looped: tuple):
+        scene_id, sound_id, count, at_ms = looped
+        self._emit_event(
+            "sound_looped", scene=scene_id, obj=sound_id, count=count, at_ms=at_ms
+        )
+
+    def _on_scene_looped(self, scene_id: str):
+        self._emit_event("scene_looped", scene=scene_id)
+
+    def _on_select_image(self, art_id: str, scale: float):
+        self._emit_event("select_image", art=art_id, scale=scale)
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import logging
 import os
 from contextlib import suppress
 from typing import TYPE_CHECKING
@@ -8,28 +7,33 @@ from typing import TYPE_CHECKING
 os.environ["QT_MULTIMEDIA_PREFERRED_PLUGINS"] = "windowsmediafoundation"
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from ..metrics import metrics
 from ..sounds import types
 from ..sounds.sound_engine import SoundEngine, SoundPlayer
 from ..utils import get_default_logger
+from .log_view import (  # noqa: F401
+    DEFAULT_LOG_CAPACITY,
+    MainWindowLogHandler,
+    StatusLogModel,
+    StatusLogView,
+)
 
 if TYPE_CHECKING:
     from typing import Optional
 
-logger = get_default_logger(__name__)
-
+    from ..sounds.bundle import Bundle
+    from ..sounds.reload import MapDiff
+    from .remote import RemoteEngine
 
-class MainWindowLogHandler(logging.Handler):
+logger = get_default_logger(__name__)
 
-    def __init__(self, parent: MainWindow):
-        super().__init__()
-        self.parent = parent
 
-    def emit(self, record):
-        msg = self.format(record)
-        self.parent.status_box.append(msg)
+class ImageView(QtWidgets.QLabel):
+    # Emitted once the view stopped being resized for RESIZE_DEBOUNCE_MS.
+    resized = QtCore.Signal(QtCore.QSize)
 
+    RESIZE_DEBOUNCE_MS = 150
 
-class ImageView(QtWidgets.QLabel):
     def __init__(
         self,
         parent: Optional[QtWidgets.QWidget] = None,
@@ -38,31 +42,50 @@ class ImageView(QtWidgets.QLabel):
         super().__init__(parent)
         # self.setScaledContents(True)
         self.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        # Let the layout decide the size so the art never grows the window.
+        self.setSizePolicy(
+            QtWidgets.QSizePolicy.Policy.Ignored, QtWidgets.QSizePolicy.Policy.Ignored
+        )
+        self._resize_timer = QtCore.QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(self.RESIZE_DEBOUNCE_MS)
+        self._resize_timer.timeout.connect(lambda: self.resized.emit(self.size()))
         if img:
             self.set_image(img)
 
-    def set_image(self, img: QtGui.QImage):
-        self.setPixmap(QtGui.QPixmap.fromImage(img))
+    def set_image(self, img: QtGui.QImage | QtGui.QPixmap):
+        if isinstance(img, QtGui.QImage):
+            img = QtGui.QPixmap.fromImage(img)
+        self.setPixmap(img)
 
     def load_image(self, img_path: str):
         img = QtGui.QImage(img_path)
         self.set_image(img)
 
+    def resizeEvent(self, event: QtGui.QResizeEvent):
+        super().resizeEvent(event)
+        self._resize_timer.start()
+
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(
         self,
-        data_map: types.ObjectMap,
+        data_map: types.ObjectMap | Bundle,
         parent: Optional[QtWidgets.QWidget] = None,
         starting_id: str = "start",
+        timing_report: Optional[str] = None,
+        engine: Optional[SoundEngine | RemoteEngine] = None,
     ):
         logger.info("Initializing MainWindow")
         super().__init__(parent)
         self.setWindowTitle("D&D Sound-R")
-        # Primary setup
-        self.sound_engine = SoundEngine(
-            starting_id=starting_id, data_map=data_map, parent=self
-        )
+        self.timing_report = timing_report
+        # Primary setup; `engine` may run in another process (`RemoteEngine`).
+        self.sound_engine = engine
+        if engine is None:
+            self.sound_engine = SoundEngine(
+                starting_id=starting_id, data_map=data_map, parent=self
+            )
         central_widget = QtWidgets.QWidget(self)
         layout = QtWidgets.QHBoxLayout(central_widget)
         central_widget.setLayout(layout)
@@ -74,6 +97,14 @@ class MainWindow(QtWidgets.QMainWindow):
         self.art_panel.setLayout(art_layout)
         self.art_image = ImageView(self.art_panel)
         art_layout.addWidget(self.art_image)
+        # Art is decoded off the GUI thread; `_wanted_art` is what the panel
+        # should show once its decode finishes.
+        self._wanted_art: Optional[tuple[str, float]] = None
+        art_cache = self.sound_engine.art_cache
+        art_cache.use_pixmaps = True
+        art_cache.image_ready.connect(self._on_image_ready)
+        art_cache.image_failed.connect(self._on_image_failed)
+        self.art_image.resized.connect(self._on_art_resized)
 
         # Actions panel
         self.actions_panel = QtWidgets.QWidget(self)
@@ -87,23 +118,43 @@ class MainWindow(QtWidgets.QMainWindow):
         self.status_panel = QtWidgets.QWidget(self)
         status_layout = QtWidgets.QVBoxLayout(self.status_panel)
         self.status_panel.setLayout(status_layout)
-        self.status_box = QtWidgets.QTextEdit(self)
-        self.status_box.setReadOnly(True)
+        self.status_log = StatusLogModel(
+            self.sound_engine.scene_map.options.get(
+                "statusLogLines", DEFAULT_LOG_CAPACITY
+            ),
+            parent=self,
+        )
+        self.status_box = StatusLogView(self.status_log, self)
         self.sound_engine.sound_looped.connect(
-            lambda scene_sound: self.status_box.append(
-                f"Looped [{scene_sound[0]}: {scene_sound[1]}]"
+            lambda looped: self.status_log.append(
+                f"Looped [{looped[0]}: {looped[1]}] x{looped[2]}", "loop"
             )
         )
         self.sound_engine.scene_looped.connect(
-            lambda scene_id: self.status_box.append(f"Looped scene: {scene_id}")
+            lambda scene_id: self.status_log.append(f"Looped scene: {scene_id}", "loop")
         )
         # self.sound_engine.clear_loop.connect(
         #     lambda: self.sound_engine.sound_looped.disconnect()
         # )
         self.sound_engine.select_image.connect(self.display_image)
+        self.sound_engine.map_reloaded.connect(self._on_map_reloaded)
+        if self.sound_engine.scene_map.options.get("hotReload", True):
+            self.sound_engine.watch_map()
+
+        # Metrics panel, refreshed while metrics are enabled
+        self.metrics_box = QtWidgets.QPlainTextEdit(self)
+        self.metrics_box.setReadOnly(True)
+        self.metrics_box.setFont(
+            QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont)
+        )
+        self.metrics_box.setMaximumHeight(200)
+        self.metrics_timer = QtCore.QTimer(self)
+        self.metrics_timer.setInterval(1000)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
 
         actions_layout.addWidget(self.step_btn)
         status_layout.addWidget(self.status_box)
+        status_layout.addWidget(self.metrics_box)
         layout.addWidget(self.art_panel)
         layout.addWidget(self.status_panel)
         layout.addWidget(self.actions_panel)
@@ -111,40 +162,77 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def start(self):
         logger.info("Starting MainWindow")
+        # Show the window right away and start the engine once the assets of
+        # the starting scene are ready; the rest keep loading in the background.
+        self.step_btn.setEnabled(False)
+        self.showMaximized()
+        loader = self.sound_engine.load_assets()
+        loader.scene_ready.connect(self._start_engine)
+        loader.finished.connect(self._assets_loaded)
+
+    def _start_engine(self):
         self.sound_engine.start()
+        self.metrics_box.setVisible(metrics.enabled)
+        if metrics.enabled:
+            self.metrics_timer.start()
+        self.step_btn.setEnabled(True)
         scene_id, sound_id = self.sound_engine.get_scene_and_sound()
-        self.status_box.append(f"Starting [{scene_id}: {sound_id}]")
+        self.status_log.append(f"Starting [{scene_id}: {sound_id}]", "step")
         logger.info("MainWindow started")
-        self.showMaximized()
+
+    def _assets_loaded(self, report):
+        self.status_log.append(
+            f"Loaded {len(report.timings)} assets in {report.wall_ms:.0f} ms"
+        )
+        if self.timing_report:
+            report.export(self.timing_report)
+            logger.info("Asset timing report written to %s", self.timing_report)
 
     def step(self):
+        metrics.mark("cue")
         scene_id, sound_id = self.sound_engine.get_scene_and_sound()
-        self.sound_engine.step()
+        with metrics.span("ui.step"):
+            self.sound_engine.step()
         new_scene_id, new_sound_id = self.sound_engine.get_scene_and_sound()
-        self.status_box.append(
-            f"[{sound_id}: {scene_id}] -> [{new_sound_id}: {new_scene_id}]"
+        self.status_log.append(
+            f"[{sound_id}: {scene_id}] -> [{new_sound_id}: {new_scene_id}]", "step"
         )
 
+    def refresh_metrics(self):
+        self.metrics_box.setPlainText(metrics.format_text())
+
     def display_image(self, art_id: str, scale: float):
-        logger.debug(f"Displaying image: {art_id}")
-        try:
-            sound_path = (
-                self.sound_engine.art_path.resolve(strict=True)
-                / self.sound_engine.data_map["artIDs"][art_id]
-            )
-            print(art_id)
-            image = QtGui.QImage(sound_path)
-            if scale != 1.0:
-                print(image.width(), image.height())
-                image = image.scaled(image.width() * scale, image.height() * scale)
-                print(image.width(), image.height())
-            print(image)
+        logger.debug("Displaying image: %s", art_id)
+        self._wanted_art = (art_id, scale)
+        image = self.sound_engine.art_cache.get(art_id, scale)
+        if image is not None:
             self.art_image.set_image(image)
             self.art_image.show()
-            # self.art_image.setStyleSheet("border: 1px solid black;")
-        except FileNotFoundError:
-            logger.error(f"Image not found: {art_id}")
-            self.status_box.append(f"Image not found: {art_id}")
+            self.status_log.append(f"Art {art_id}: cache hit", "art")
+        else:
+            self.sound_engine.art_cache.request(art_id, scale)
+
+    def _on_image_ready(self, art_id: str, scale: float, image, decode_ms: float):
+        if self._wanted_art != (art_id, scale):
+            return
+        self.art_image.set_image(image)
+        self.art_image.show()
+        self.status_log.append(f"Art {art_id}: decoded in {decode_ms:.0f} ms", "art")
+
+    def _on_image_failed(self, art_id: str, scale: float):
+        if self._wanted_art == (art_id, scale):
+            logger.error("Image not found: %s", art_id)
+            self.status_log.append(f"Image not found: {art_id}", "art", "error")
+
+    def _on_art_resized(self, size: QtCore.QSize):
+        self.sound_engine.art_cache.target_size = (size.width(), size.height())
+        if self._wanted_art is not None:
+            self.display_image(*self._wanted_art)
+
+    def _on_map_reloaded(self, diff: MapDiff):
+        self.status_log.append(f"Reloaded map: {diff.summary()}")
+        if self._wanted_art is not None and self._wanted_art[0] in diff.changed_art:
+            self.display_image(*self._wanted_art)
 
     def add_sound_playing(self, sound_id: str):
         pass
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Any, Optional
+
+logger = get_default_logger(__name__)
+
+DEFAULT_LOG_CAPACITY = 5000
+# Appends are shown at most once per frame.
+FLUSH_INTERVAL_MS = 16
+
+CATEGORIES = ("status", "step", "loop", "art", "log")
+CategoryRole = QtCore.Qt.ItemDataRole.UserRole + 1
+TimeRole = QtCore.Qt.ItemDataRole.UserRole + 2
+
+_COLORS = {
+    "error": QtGui.QColor(200, 40, 40),
+    "warning": QtGui.QColor(190, 120, 0),
+}
+
+
+class StatusLogModel(QtCore.QAbstractListModel):
+    """
+    The last `capacity` status lines, kept in a ring buffer.
+
+    `append` only queues a line; queued lines are added to the model together
+    once per frame, dropping the oldest rows in a single removal when the
+    buffer is full. Row `i` is always the `i`th oldest line, so views and
+    proxies index the buffer directly instead of copying it.
+
+    PARAMETERS
+    ----------
+    capacity
+        The number of lines to keep.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_LOG_CAPACITY,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1. {capacity} given.")
+        self.capacity = capacity
+        # (time, category, severity, text)
+        self._lines: list[Optional[tuple[float, str, str, str]]] = [None] * capacity
+        self._start = 0
+        self._count = 0
+        self._pending: list[tuple[float, str, str, str]] = []
+        self.dropped = 0
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+
+    def append(self, text: str, category: str = "status", severity: str = "info"):
+        self._pending.append((time.time(), category, severity, text))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @QtCore.Slot(str, str)
+    def append_log(self, text: str, severity: str):
+        self.append(text, "log", severity)
+
+    def line(self, row: int) -> tuple[float, str, str, str]:
+        return self._lines[(self._start + row) % self.capacity]
+
+    def flush(self):
+        """
+        Adds the queued lines to the model.
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if len(pending) > self.capacity:
+            self.dropped += len(pending) - self.capacity
+            pending = pending[-self.capacity :]
+        overflow = self._count + len(pending) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            self._start = (self._start + overflow) % self.capacity
+            self._count -= overflow
+            self.dropped += overflow
+            self.endRemoveRows()
+        first = self._count
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(pending) - 1)
+        for entry in pending:
+            self._lines[(self._start + self._count) % self.capacity] = entry
+            self._count += 1
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._lines = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self._pending.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._count
+
+    def data(self, index: QtCore.QModelIndex, role: int = 0) -> Any:
+        if not index.isValid() or index.row() >= self._count:
+            return None
+        created, category, severity, text = self.line(index.row())
+        match role:
+            case QtCore.Qt.ItemDataRole.DisplayRole:
+                return text
+            case QtCore.Qt.ItemDataRole.ToolTipRole:
+                return time.strftime("%H:%M:%S", time.localtime(created))
+            case QtCore.Qt.ItemDataRole.ForegroundRole:
+                return _COLORS.get(severity)
+            case role if role == CategoryRole:
+                return category
+            case role if role == TimeRole:
+                return created
+        return None
+
+
+class StatusFilterModel(QtCore.QSortFilterProxyModel):
+    """
+    Filters a `StatusLogModel` by category and by case-insensitive text. The
+    proxy only maps rows; the lines stay in the source's buffer.
+    """
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None):
+        super().__init__(parent)
+        self.category: Optional[str] = None
+        self.setFilterCaseSensitivity(QtCore.Qt.CaseSensitivity.CaseInsensitive)
+
+    def set_category(self, category: Optional[str]):
+        self.category = category
+        self.invalidateFilter()
+
+    def filterAcceptsRow(
+        self, source_row: int, source_parent: QtCore.QModelIndex
+    ) -> bool:
+        if self.category is not None:
+            model: StatusLogModel = self.sourceModel()
+            if model.line(source_row)[1] != self.category:
+                return False
+        return super().filterAcceptsRow(source_row, source_parent)
+
+
+class StatusLogView(QtWidgets.QWidget):
+    """
+    A search box, a category filter and a list of status lines that follows
+    the newest line while scrolled to the bottom.
+    """
+
+    def __init__(
+        self, model: StatusLogModel, parent: Optional[QtWidgets.QWidget] = None
+    ):
+        super().__init__(parent)
+        self.model = model
+        self.proxy = StatusFilterModel(self)
+        self.proxy.setSourceModel(model)
+
+        self.search = QtWidgets.QLineEdit(self)
+        self.search.setPlaceholderText("Search")
+        self.search.setClearButtonEnabled(True)
+        self.search.textChanged.connect(self.proxy.setFilterFixedString)
+        self.category = QtWidgets.QComboBox(self)
+        self.category.addItem("All", None)
+        for category in CATEGORIES:
+            self.category.addItem(category.capitalize(), category)
+        self.category.currentIndexChanged.connect(
+            lambda: self.proxy.set_category(self.category.currentData())
+        )
+
+        self.list = QtWidgets.QListView(self)
+        self.list.setModel(self.proxy)
+        # Rows all have one height, so the view lays out only what is visible.
+        self.list.setUniformItemSizes(True)
+        self.list.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+        )
+        self.list.setSelectionMode(
+            QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection
+        )
+        self._follow = True
+        self.list.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.proxy.rowsInserted.connect(self._on_rows_inserted)
+
+        filters = QtWidgets.QHBoxLayout()
+        filters.setContentsMargins(0, 0, 0, 0)
+        filters.addWidget(self.search)
+        filters.addWidget(self.category)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(filters)
+        layout.addWidget(self.list)
+
+    def _on_scrolled(self, value: int):
+        self._follow = value >= self.list.verticalScrollBar().maximum()
+
+    def _on_rows_inserted(self, *_):
+        if self._follow:
+            self.list.scrollToBottom()
+
+
+class _LogBridge(QtCore.QObject):
+    # text, severity
+    record = QtCore.Signal(str, str)
+
+
+class MainWindowLogHandler(logging.Handler):
+    """
+    Shows log records in a `StatusLogModel`. Records may come from any thread
+    (e.g. the log queue's listener); they reach the model through a queued
+    signal.
+    """
+
+    def __init__(self, model: StatusLogModel, level: int = logging.INFO):
+        super().__init__(level)
+        self._bridge = _LogBridge()
+        # Queued whenever the record comes from another thread than the model's.
+        self._bridge.record.connect(model.append_log)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._bridge.record.emit(self.format(record), record.levelname.lower())
+        except RuntimeError:
+            # The window, and with it the model, is gone.
+            pass
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import sys
+import time
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore, QtNetwork
+
+from ..control.host import HOST_EVENTS, READY_PREFIX
+from ..control.protocol import DEFAULT_HOST, encode
+from ..metrics import metrics
+from ..sounds.art import ArtCache, art_source
+from ..sounds.bundle import Bundle
+from ..sounds.compiled import compile_map
+from ..sounds.layers import MAIN_LAYER
+from ..sounds.loader import AssetTiming, TimingReport
+from ..sounds.reload import MapDiff
+from ..utils import get_default_logger, load_map
+
+if TYPE_CHECKING:
+    from typing import Any, Optional
+
+    from ..sounds import types
+
+logger = get_default_logger(__name__)
+
+# How long to wait for the engine process to listen, and for each reply.
+START_TIMEOUT_MS = 30_000
+REPLY_TIMEOUT_MS = 5_000
+_PACKAGE_PARENT = pathlib.Path(__file__).resolve().parents[2]
+
+
+class RemoteEngineError(RuntimeError):
+    pass
+
+
+@dataclass
+class RemoteStats:
+    requests: int = 0
+    events: int = 0
+    # The last step: the round trip, and the part of it spent outside the
+    # engine's handling of the command.
+    step_ms: float = 0.0
+    step_ipc_ms: float = 0.0
+
+    def as_dict(self) -> dict[str, int | float]:
+        return asdict(self)
+
+
+class RemoteLoader(QtCore.QObject):
+    """
+    Stands in for the engine process's `AssetLoader`.
+    """
+
+    scene_ready = QtCore.Signal()
+    finished = QtCore.Signal(object)  # TimingReport
+
+
+class RemoteEngine(QtCore.QObject):
+    """
+    Runs a `SoundEngine` in a child process (`python -m sound_r engine`) and
+    stands in for it in the window, so GUI stalls (image decodes, layout,
+    resizing) never delay its media handling, steps or fades.
+
+    Commands go to the engine's `EngineHost` over a local TCP connection and
+    block for the reply, which takes a fraction of a millisecond; the
+    engine's signals come back as events and are re-emitted here. Art is
+    decoded in this process, from the same map or bundle.
+
+    With metrics enabled every round trip is recorded as `ipc.request`, and
+    the time a step spends outside the engine as `ipc.step_overhead`.
+
+    PARAMETERS
+    ----------
+    data_map
+        The map or bundle the engine process starts from; used here for its
+        options and art.
+    engine_args
+        Extra arguments for `python -m sound_r engine`, e.g. `--no-bundle`.
+    port
+        The port the engine process listens on, which other control clients
+        can use too. Defaults to the map's `controlPort`, else a free one.
+    """
+
+    sound_looped = QtCore.Signal(tuple)
+    clear_loop = QtCore.Signal()
+    select_image = QtCore.Signal(str, float)
+    scene_looped = QtCore.Signal(str)
+    map_reloaded = QtCore.Signal(object)  # MapDiff
+
+    def __init__(
+        self,
+        data_map: types.ObjectMap | Bundle,
+        engine_args: tuple[str, ...] = (),
+        port: Optional[int] = None,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.bundle: Optional[Bundle] = None
+        if isinstance(data_map, Bundle):
+            self.bundle = data_map
+            self.scene_map = data_map.scene_map
+        else:
+            self.scene_map = compile_map(data_map)
+        self.art_cache = ArtCache(self.art_source, parent=self)
+        self.stats = RemoteStats()
+        self.loader: Optional[RemoteLoader] = None
+        self._replies: dict[int, dict] = {}
+        self._next_id = 0
+
+        self.process = QtCore.QProcess(self)
+        self.process.setProcessChannelMode(
+            QtCore.QProcess.ProcessChannelMode.ForwardedErrorChannel
+        )
+        environment = QtCore.QProcessEnvironment.systemEnvironment()
+        python_path = environment.value("PYTHONPATH")
+        environment.insert(
+            "PYTHONPATH",
+            os.pathsep.join(filter(None, (str(_PACKAGE_PARENT), python_path))),
+        )
+        self.process.setProcessEnvironment(environment)
+        if port is None:
+            port = self.scene_map.options.get("controlPort", 0)
+        args = [
+            "-m",
+            "sound_r",
+            "engine",
+            "--data_map",
+            str(self.scene_map.root),
+            "--control",
+            str(port),
+            *engine_args,
+        ]
+        self.process.start(sys.executable, args)
+        port = self._wait_for_port()
+        self.process.finished.connect(self._on_process_finished)
+        self.process.readyReadStandardOutput.connect(self._log_output)
+        self._log_output()
+
+        self.socket = QtNetwork.QTcpSocket(self)
+        self.socket.connectToHost(DEFAULT_HOST, port)
+        if not self.socket.waitForConnected(REPLY_TIMEOUT_MS):
+            raise RemoteEngineError(
+                f"Could not connect to the engine process: {self.socket.errorString()}"
+            )
+        self.socket.setSocketOption(
+            QtNetwork.QAbstractSocket.SocketOption.LowDelayOption, 1
+        )
+        self.socket.readyRead.connect(self._read_messages)
+        self.request("subscribe", events=list(HOST_EVENTS))
+        logger.info(
+            "Engine process %d listening on port %d", self.process.processId(), port
+        )
+
+    def _wait_for_port(self) -> int:
+        deadline = time.perf_counter() + START_TIMEOUT_MS / 1000
+        while time.perf_counter() < deadline:
+            while self.process.canReadLine():
+                line = bytes(self.process.readLine()).decode(errors="replace").strip()
+                if line.startswith(READY_PREFIX):
+                    return int(line.removeprefix(READY_PREFIX))
+                if line:
+                    logger.info("[engine] %s", line)
+            if self.process.state() == QtCore.QProcess.ProcessState.NotRunning:
+                break
+            self.process.waitForReadyRead(100)
+        self.process.kill()
+        raise RemoteEngineError("The engine process did not start")
+
+    def _log_output(self):
+        # The engine's stdout; its log goes to stderr, which is forwarded.
+        while self.process.canReadLine():
+            line = bytes(self.process.readLine()).decode(errors="replace").strip()
+            if line:
+                logger.info("[engine] %s", line)
+
+    def _on_process_finished(self, code: int, _status):
+        if code:
+            logger.error("The engine process exited with code %d", code)
+        else:
+            logger.info("The engine process exited")
+
+    # Messages
+
+    def _read_messages(self):
+        while self.socket.canReadLine():
+            message = json.loads(bytes(self.socket.readLine()))
+            if isinstance(message, dict) and "event" in message:
+                self.stats.events += 1
+                self._on_event(message)
+            elif isinstance(message, dict) and "id" in message:
+                self._replies[message["id"]] = message
+            else:
+                logger.warning("Unexpected message from the engine: %s", message)
+
+    def request(self, cmd: str, **args) -> Any:
+        """
+        Sends a command to the engine process and waits for its reply. Events
+        arriving meanwhile are emitted before this returns, in the order the
+        engine sent them.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        start = time.perf_counter()
+        self.socket.write(encode({"cmd": cmd, "id": request_id, **args}))
+        self.socket.flush()
+        self.stats.requests += 1
+        deadline = start + REPLY_TIMEOUT_MS / 1000
+        while True:
+            self._read_messages()
+            reply = self._replies.pop(request_id, None)
+            if reply is not None:
+                metrics.record("ipc.request", (time.perf_counter() - start) * 1000)
+                if not reply.get("ok", True):
+                    raise RemoteEngineError(reply.get("error"))
+                return reply
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not self.socket.waitForReadyRead(
+                int(remaining * 1000) + 1
+            ):
+                raise RemoteEngineError(f"No reply from the engine process to {cmd}")
+
+    def _on_event(self, message: dict):
+        match message["event"]:
+            case "sound_looped":
+                self.sound_looped.emit(
+                    (
+                        message["scene"],
+                        message["obj"],
+                        message["count"],
+                        message["at_ms"],
+                    )
+                )
+            case "scene_looped":
+                self.scene_looped.emit(message["scene"])
+            case "select_image":
+                self.select_image.emit(message["art"], message["scale"])
+            case "clear_loop":
+                self.clear_loop.emit()
+            case "map_reloaded":
+                self._on_map_reloaded(message)
+            # Loader events are emitted from the event loop: they may arrive
+            # while `load_assets` still waits for its reply, before its caller
+            # has connected to them.
+            case "scene_ready" if self.loader is not None:
+                QtCore.QTimer.singleShot(0, self.loader.scene_ready.emit)
+            case "assets_loaded" if self.loader is not None:
+                report = message["report"]
+                report["timings"] = [AssetTiming(**t) for t in report["timings"]]
+                QtCore.QTimer.singleShot(
+                    0, partial(self.loader.finished.emit, TimingReport(**report))
+                )
+
+    def _on_map_reloaded(self, message: dict):
+        diff = MapDiff(
+            **{name: set(ids) for name, ids in message.items() if name != "event"}
+        )
+        # Art is resolved here, so this process needs the new file names too.
+        self.scene_map = compile_map(load_map(self.scene_map.root / "map.json"))
+        for art_id in diff.removed_art | diff.changed_art:
+            self.art_cache.discard(art_id)
+        self.map_reloaded.emit(diff)
+
+    # The part of `SoundEngine` the window uses
+
+    def art_source(self, art_id: str):
+        return art_source(self.scene_map, self.bundle, art_id)
+
+    def load_assets(self) -> RemoteLoader:
+        self.loader = RemoteLoader(self)
+        self.request("load")
+        return self.loader
+
+    def start(self):
+        self.request("start")
+
+    def watch_map(self):
+        self.request("watch")
+
+    def step(self, layer: str = MAIN_LAYER):
+        start = time.perf_counter()
+        reply = self.request("step", layer=layer)
+        step_ms = (time.perf_counter() - start) * 1000
+        self.stats.step_ms = step_ms
+        # `handler_ms` is the time the engine spent running the step itself;
+        # everything else, including its hop to the engine's Qt thread, is IPC.
+        self.stats.step_ipc_ms = step_ms - reply["handler_ms"]
+        metrics.record("ipc.step_overhead", self.stats.step_ipc_ms)
+
+    def get_scene_and_sound(self, layer: str = MAIN_LAYER) -> tuple[str, str]:
+        state = self.request("state", layer=layer)
+        return state["scene"], state["obj"]
+
+    def close(self):
+        """
+        Disconnects, which stops the engine process, and waits for it to exit.
+        """
+        if self.process.state() == QtCore.QProcess.ProcessState.NotRunning:
+            return
+        self.socket.disconnectFromHost()
+        if not self.process.waitForFinished(REPLY_TIMEOUT_MS):
+            logger.warning("The engine process did not exit; killing it")
+            self.process.kill()
+            self.process.waitForFinished()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import sys
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from .metrics import metrics
+from .sounds.mixer import NullSink
+from .sounds.sound_engine import SoundEngine
+from .utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+    from .sounds import types
+    from .sounds.compiled import CompiledMap
+    from .sounds.loader import TimingReport
+
+logger = get_default_logger(__name__)
+
+
+def ensure_app() -> QtCore.QCoreApplication:
+    """
+    Returns the running Qt application, creating a windowless one if needed.
+    """
+    app = QtCore.QCoreApplication.instance()
+    if app is None:
+        app = QtCore.QCoreApplication(sys.argv[:1])
+    return app
+
+
+class HeadlessEngine:
+    """
+    Runs a `SoundEngine` without a window or an audio device so it can be
+    driven from scripts and benchmarks.
+
+    With the default "null" backend sounds are mixed but never played. Unless
+    `realtime` is set the mixer clock only moves through `advance`, which makes
+    runs deterministic.
+
+    PARAMETERS
+    ----------
+    data_map
+        The map to play, raw or compiled.
+    starting_id
+        The scene to start at.
+    backend
+        The audio backend; see `GlobalOptions.audioBackend`.
+    realtime
+        Whether the null sink should follow the wall clock.
+    """
+
+    def __init__(
+        self,
+        data_map: types.ObjectMap | CompiledMap,
+        starting_id: str = "start",
+        backend: str = "null",
+        realtime: bool = False,
+        validate: bool = True,
+    ):
+        self.app = ensure_app()
+        self.engine = SoundEngine(
+            data_map, starting_id, backend=backend, validate=validate
+        )
+        if isinstance(self.engine.sink, NullSink):
+            self.engine.sink.realtime = realtime
+            self.engine.mixer.wait_for_streams = not realtime
+
+    def load_assets(self, timeout_ms: int = 600_000) -> Optional[TimingReport]:
+        """
+        Loads every asset on the worker pool and waits for it to finish.
+        Returns the timing report, or None on timeout.
+        """
+        reports: list[TimingReport] = []
+        loop = QtCore.QEventLoop()
+        loader = self.engine.load_assets()
+        loader.finished.connect(reports.append)
+        loader.finished.connect(loop.quit)
+        QtCore.QTimer.singleShot(timeout_ms, loop.quit)
+        if not reports:
+            loop.exec()
+        return reports[0] if reports else None
+
+    def start(self):
+        self.engine.start()
+        self.process_events()
+
+    def step(self):
+        metrics.mark("cue")
+        self.engine.step()
+
+    def scene_and_sound(self) -> tuple[str, str]:
+        return self.engine.get_scene_and_sound()
+
+    def advance(self, ms: float):
+        """
+        Renders `ms` of audio (null backend) and handles the resulting events.
+        """
+        sink = self.engine.sink
+        if isinstance(sink, NullSink) and not sink.realtime:
+            sink.pump(self.engine.mixer.frames_for_ms(ms))
+        else:
+            QtCore.QThread.msleep(int(ms))
+        self.process_events()
+
+    def process_events(self):
+        self.app.processEvents()
+        # Deferred deletions are only run by a running event loop.
+        QtCore.QCoreApplication.sendPostedEvents(
+            None, QtCore.QEvent.Type.DeferredDelete
+        )
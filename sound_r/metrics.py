@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import pathlib
+import time
+from typing import TYPE_CHECKING
+
+from .utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+logger = get_default_logger(__name__)
+
+# Setting this (to anything but 0) enables metrics at import time.
+METRICS_ENV = "SOUND_R_METRICS"
+# Upper bucket bounds in ms: 10 µs doubling up to ~42 s, then overflow.
+BUCKET_BOUNDS_MS = tuple(0.01 * 2**i for i in range(23))
+
+
+class Histogram:
+    """
+    A latency histogram over fixed, exponentially growing buckets. Exact
+    count, sum, min and max are kept alongside; percentiles are estimated as
+    the upper bound of the bucket they fall in.
+    """
+
+    __slots__ = ("name", "counts", "count", "total", "min", "max")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def record(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class _Span:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry: MetricsRegistry, name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.registry.record(self.name, (time.perf_counter() - self.start) * 1000)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    """
+    Named latency histograms fed by timing spans.
+
+    While disabled, `span` returns a shared no-op context manager and `record`
+    and `mark` return immediately, so instrumented code pays for little more
+    than an attribute lookup.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: dict[str, Histogram] = {}
+        self.gauges: dict[str, float] = {}
+        self._marks: dict[str, float] = {}
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def span(self, name: str) -> _Span | _NullSpan:
+        """
+        Times the body of a `with` block into the histogram `name`.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, ms: float):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(name)
+        histogram.record(ms)
+
+    def gauge(self, name: str, value: float):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def mark(self, name: str):
+        """
+        Remembers now as the start of `name`, to be closed by `since`.
+        """
+        if self.enabled:
+            self._marks[name] = time.perf_counter()
+
+    def take_mark(self, name: str) -> Optional[float]:
+        """
+        Returns and forgets the mark `name`, if set.
+        """
+        return self._marks.pop(name, None)
+
+    def since(self, name: str, histogram: str, start: Optional[float] = None):
+        """
+        Records the time since the mark `name` (or `start`) into `histogram`.
+        """
+        if not self.enabled:
+            return
+        start = self._marks.get(name) if start is None else start
+        if start is not None:
+            self.record(histogram, (time.perf_counter() - start) * 1000)
+
+    def reset(self):
+        self.histograms.clear()
+        self.gauges.clear()
+        self._marks.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "histograms": {
+                name: histogram.summary()
+                for name, histogram in sorted(self.histograms.items())
+            },
+            "gauges": dict(sorted(self.gauges.items())),
+        }
+
+    def format_text(self) -> str:
+        lines = [f"{'span (ms)':<28}{'n':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+        for name, s in self.snapshot()["histograms"].items():
+            lines.append(
+                f"{name:<28}{s['count']:>6}{s['p50']:>9.2f}{s['p90']:>9.2f}"
+                f"{s['p99']:>9.2f}{s['max']:>9.2f}"
+            )
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"{name:<28}{value:>15.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path: pathlib.Path | str):
+        """
+        Writes the metrics to `path`, as JSON if it ends in .json and as a text
+        table otherwise.
+        """
+        path = pathlib.Path(path)
+        with path.open("w") as f:
+            if path.suffix.lower() == ".json":
+                json.dump(self.snapshot(), f, indent=2)
+            else:
+                f.write(self.format_text() + "\n")
+        logger.info("Metrics written to %s", path)
+
+
+metrics = MetricsRegistry(enabled=os.environ.get(METRICS_ENV, "0") not in ("", "0"))
@@ -0,0 +1,526 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from ..utils import get_default_logger, progress_bar
+from .pcm import DEFAULT_CHANNELS, DEFAULT_SAMPLE_RATE, decode_pcm, np, require_numpy
+from .pcm_cache import cache_dir, file_hash
+
+if TYPE_CHECKING:
+    from typing import Callable, Iterable, Optional
+
+    from .compiled import CompiledMap
+
+logger = get_default_logger(__name__)
+
+INDEX_FILENAME = "analysis.json"
+# Bump when a measurement changes so stale results are not reused.
+ANALYSIS_VERSION = 1
+INDEX_VERSION = 1
+DEFAULT_SILENCE_DB = -60.0
+DEFAULT_LOUDNESS_TARGET = -18.0  # LUFS
+# Normalization never boosts more than this, nor pushes the peak above the
+# ceiling.
+MAX_BOOST_DB = 12.0
+PEAK_CEILING_DB = -1.0
+# Kept before the first audible sample so attacks are not cut.
+TRIM_PAD_MS = 5
+# PCM is analysed this many seconds at a time to bound memory.
+_CHUNK_S = 60
+
+# ITU-R BS.1770 K-weighting: a high shelf and a high-pass biquad, as
+# (b, a) coefficients at 48 kHz.
+_K_RATE = 48000
+_K_SHELF = (
+    (1.53512485958697, -2.69169618940638, 1.19839281085285),
+    (1.0, -1.69065929318241, 0.73248077421585),
+)
+_K_HIGHPASS = ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621))
+# Gating blocks of 400 ms overlap by 75%, i.e. are made of four 100 ms hops.
+_HOP_S = 0.1
+_HOPS_PER_BLOCK = 4
+_ABSOLUTE_GATE = -70.0  # LUFS
+_RELATIVE_GATE = -10.0  # LU
+
+
+@dataclass
+class SoundAnalysis:
+    duration_ms: float
+    peak_db: Optional[float]  # sample peak in dBFS; None if digitally silent
+    rms_db: Optional[float]
+    lufs: Optional[float]  # integrated loudness; None if below the gate
+    start_ms: float  # where the audio starts after leading silence
+    end_ms: float  # where trailing silence starts
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def gain_db(
+        self,
+        target: float = DEFAULT_LOUDNESS_TARGET,
+        max_boost: float = MAX_BOOST_DB,
+        ceiling: float = PEAK_CEILING_DB,
+    ) -> float:
+        """
+        The gain that brings the sound to `target` LUFS without boosting more
+        than `max_boost` or raising its peak above `ceiling`.
+        """
+        if self.lufs is None:
+            return 0.0
+        gain = min(target - self.lufs, max_boost)
+        if self.peak_db is not None:
+            gain = min(gain, ceiling - self.peak_db)
+        return gain
+
+
+def _to_db(power: float) -> Optional[float]:
+    return 10 * float(np.log10(power)) if power > 0 else None
+
+
+def _biquad_power(coeffs: tuple[tuple[float, ...], ...], w: np.ndarray) -> np.ndarray:
+    (b0, b1, b2), (a0, a1, a2) = coeffs
+    z = np.exp(-1j * w)
+    return np.abs((b0 + b1 * z + b2 * z * z) / (a0 + a1 * z + a2 * z * z)) ** 2
+
+
+def k_weighting(frames: int, sample_rate: int) -> np.ndarray:
+    """
+    The power response of the K-weighting filter at the `rfft` bins of
+    `frames` frames, scaled so that summing weighted bin powers gives a block's
+    mean square (Parseval).
+    """
+    freqs = np.fft.rfftfreq(frames, 1 / sample_rate)
+    w = 2 * np.pi * np.minimum(freqs, _K_RATE / 2) / _K_RATE
+    weights = _biquad_power(_K_SHELF, w) * _biquad_power(_K_HIGHPASS, w)
+    # Every bin but DC (and Nyquist, for even lengths) stands for two.
+    weights[1 : (frames + 1) // 2] *= 2
+    return weights / frames**2
+
+
+def _hop_power(pcm: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    The K-weighted mean square of every 100 ms hop of `pcm`, summed over
+    channels. A sound shorter than a hop is one hop.
+    """
+    hop = min(int(sample_rate * _HOP_S), len(pcm))
+    count = len(pcm) // hop
+    weights = k_weighting(hop, sample_rate)
+    power = np.zeros(count)
+    step = max(1, int(_CHUNK_S / _HOP_S))
+    for first in range(0, count, step):
+        last = min(first + step, count)
+        for channel in range(pcm.shape[1]):
+            blocks = pcm[first * hop : last * hop, channel].reshape(-1, hop)
+            spectrum = np.fft.rfft(blocks, axis=1)
+            power[first:last] += (spectrum.real**2 + spectrum.imag**2) @ weights
+    return power
+
+
+def integrated_loudness(pcm: np.ndarray, sample_rate: int) -> Optional[float]:
+    """
+    The gated integrated loudness of `pcm` in LUFS, after ITU-R BS.1770.
+
+    The K-weighting is applied per 100 ms hop in the frequency domain rather
+    than as a running IIR filter, which keeps it vectorized; for program
+    material the result stays within a few tenths of a dB of the reference.
+    """
+    if len(pcm) == 0:
+        return None
+    hops = _hop_power(pcm, sample_rate)
+    if len(hops) < _HOPS_PER_BLOCK:
+        blocks = hops[None].mean(axis=1)
+    else:
+        blocks = np.convolve(
+            hops, np.full(_HOPS_PER_BLOCK, 1 / _HOPS_PER_BLOCK), "valid"
+        )
+    with np.errstate(divide="ignore"):
+        loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[loudness > _ABSOLUTE_GATE]
+    if not gated.size:
+        return None
+    relative = -0.691 + 10 * np.log10(gated.mean()) + _RELATIVE_GATE
+    gated = gated[loudness[loudness > _ABSOLUTE_GATE] > relative]
+    return -0.691 + 10 * float(np.log10(gated.mean()))
+
+
+def analyze_pcm(
+    pcm: np.ndarray, sample_rate: int, silence_db: float = DEFAULT_SILENCE_DB
+) -> SoundAnalysis:
+    """
+    Measures float32 `pcm` (frames x channels).
+
+    PARAMETERS
+    ----------
+    pcm
+        The decoded sound.
+    sample_rate
+        Its sample rate.
+    silence_db
+        Leading and trailing audio whose peak stays below this level counts as
+        silence.
+    """
+    require_numpy()
+    frames = len(pcm)
+    duration_ms = 1000 * frames / sample_rate
+    if frames == 0:
+        return SoundAnalysis(0.0, None, None, None, 0.0, 0.0)
+    peak = max(float(pcm.max()), -float(pcm.min()))
+    flat = pcm.reshape(-1)
+    mean_square = float(np.dot(flat, flat)) / flat.size
+    # Reduced a channel at a time; max(axis=1) over a few columns is slow.
+    envelope = np.maximum.reduce([np.abs(pcm[:, c]) for c in range(pcm.shape[1])])
+    audible = envelope > 10 ** (silence_db / 20)
+    if audible.any():
+        pad = int(sample_rate * TRIM_PAD_MS / 1000)
+        first = max(0, int(np.argmax(audible)) - pad)
+        last = min(frames, frames - int(np.argmax(audible[::-1])) + pad)
+    else:
+        first = last = 0
+    return SoundAnalysis(
+        duration_ms=duration_ms,
+        peak_db=_to_db(peak * peak),
+        rms_db=_to_db(mean_square),
+        lufs=integrated_loudness(pcm, sample_rate),
+        start_ms=1000 * first / sample_rate,
+        end_ms=1000 * last / sample_rate,
+    )
+
+
+_worker_app = None
+
+
+def analyze_file(
+    path: pathlib.Path | str,
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    channels: int = DEFAULT_CHANNELS,
+    silence_db: float = DEFAULT_SILENCE_DB,
+) -> SoundAnalysis:
+    """
+    Decodes and measures the sound at `path`. Runs in worker processes.
+    """
+    global _worker_app
+    from PySide6 import QtCore
+
+    # QAudioDecoder needs an application object, which a fresh worker lacks.
+    if QtCore.QCoreApplication.instance() is None:
+        _worker_app = QtCore.QCoreApplication([])
+    return analyze_pcm(decode_pcm(path, sample_rate, channels), sample_rate, silence_db)
+
+
+class AnalysisIndex:
+    """
+    Analysis results stored next to the map, keyed by the SHA-256 of each sound
+    file so renamed files keep their results and edited ones are analysed
+    again. Like `PcmCache`, content hashes are remembered per (path, size,
+    mtime), so looking up an unchanged file only stats it.
+
+    PARAMETERS
+    ----------
+    root
+        The folder the map was loaded from.
+    channels
+        The channel count sounds are analysed at; loudness depends on it.
+    silence_db
+        The silence threshold of the trim points.
+    """
+
+    def __init__(
+        self,
+        root: pathlib.Path,
+        channels: int = DEFAULT_CHANNELS,
+        silence_db: float = DEFAULT_SILENCE_DB,
+    ):
+        self.path = cache_dir(root) / INDEX_FILENAME
+        self.channels = channels
+        self.silence_db = silence_db
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._entries: dict[str, dict] = {}
+        self._hashes: dict[str, list] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with self.path.open() as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable analysis index: %s", e)
+            return
+        if index.get("version") != INDEX_VERSION:
+            return
+        self._entries = index.get("entries", {})
+        self._hashes = index.get("hashes", {})
+
+    def flush(self):
+        """
+        Writes the index to disk if it changed.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            index = {
+                "version": INDEX_VERSION,
+                "entries": self._entries,
+                "hashes": self._hashes,
+            }
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def _key(self, digest: str) -> str:
+        return f"{digest}-{self.channels}ch-{self.silence_db:g}db-v{ANALYSIS_VERSION}"
+
+    def _known_hash(self, path: pathlib.Path) -> Optional[str]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        with self._lock:
+            known = self._hashes.get(str(path))
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        return None
+
+    def content_hash(self, path: pathlib.Path) -> str:
+        path = pathlib.Path(path).resolve()
+        digest = self._known_hash(path)
+        if digest is not None:
+            return digest
+        stat = path.stat()
+        digest = file_hash(path)
+        with self._lock:
+            self._hashes[str(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._dirty = True
+        return digest
+
+    def get(self, path: pathlib.Path) -> Optional[SoundAnalysis]:
+        """
+        Returns the analysis of `path` if the file is unchanged since it was
+        hashed. Never reads the file, so it is cheap enough for the GUI thread.
+        """
+        digest = self._known_hash(pathlib.Path(path).resolve())
+        if digest is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(self._key(digest))
+        return SoundAnalysis(**entry) if entry is not None else None
+
+    def has(self, path: pathlib.Path) -> bool:
+        """
+        Whether `path` has been analysed, hashing it if needed.
+        """
+        key = self._key(self.content_hash(path))
+        with self._lock:
+            return key in self._entries
+
+    def put(self, path: pathlib.Path, analysis: SoundAnalysis):
+        key = self._key(self.content_hash(path))
+        with self._lock:
+            self._entries[key] = analysis.as_dict()
+            self._dirty = True
+
+    def prune(self, keep_sources: Iterable[pathlib.Path]):
+        """
+        Forgets remembered hashes of files that are no longer in the map.
+        """
+        keep = {str(pathlib.Path(path).resolve()) for path in keep_sources}
+        with self._lock:
+            for path in [path for path in self._hashes if path not in keep]:
+                del self._hashes[path]
+                self._dirty = True
+
+
+@dataclass
+class AnalysisStats:
+    analyzed: int = 0
+    cached: int = 0
+    failed: int = 0
+    workers: int = 0
+    wall_ms: float = 0.0
+    errors: dict[str, str] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Analyzer:
+    """
+    Fills an `AnalysisIndex` by decoding and measuring sounds on a pool of
+    worker processes, so the analysis scales with cores instead of sharing one
+    interpreter with playback. Only sounds missing from the index are
+    analysed.
+
+    PARAMETERS
+    ----------
+    index
+        Where results are looked up and stored.
+    sample_rate
+        The rate sounds are decoded at.
+    workers
+        The number of worker processes; one per core by default. With one
+        worker, or a single sound to analyse, no process is started.
+    """
+
+    def __init__(
+        self,
+        index: AnalysisIndex,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        workers: Optional[int] = None,
+    ):
+        self.index = index
+        self.sample_rate = sample_rate
+        self.workers = workers or os.cpu_count() or 1
+        self._thread: Optional[threading.Thread] = None
+
+    def run(
+        self,
+        paths: Iterable[pathlib.Path],
+        on_result: Optional[
+            Callable[[pathlib.Path, Optional[SoundAnalysis]], None]
+        ] = None,
+        progress: bool = False,
+    ) -> AnalysisStats:
+        """
+        Analyses the sounds at `paths` that are not in the index yet, calling
+        `on_result(path, analysis)` for each (with None for a failure), and
+        writes the index.
+        """
+        started = time.perf_counter()
+        stats = AnalysisStats()
+        missing = []
+        for path in dict.fromkeys(pathlib.Path(path) for path in paths):
+            try:
+                if self.index.has(path):
+                    stats.cached += 1
+                else:
+                    missing.append(path)
+            except OSError as e:
+                stats.failed += 1
+                stats.errors[str(path)] = str(e)
+        stats.workers = min(self.workers, len(missing))
+        args = (self.sample_rate, self.index.channels, self.index.silence_db)
+        if stats.workers > 1:
+            # Spawned, as forking a process that runs Qt is unsafe.
+            executor = ProcessPoolExecutor(
+                stats.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            with executor:
+                futures = {
+                    executor.submit(analyze_file, path, *args): path for path in missing
+                }
+                done = as_completed(futures)
+                if progress:
+                    done = progress_bar(
+                        done, total=len(futures), desc="Analysing", unit="sound"
+                    )
+                for future in done:
+                    try:
+                        analysis = future.result()
+                    except Exception as e:
+                        analysis = e
+                    self._store(futures[future], analysis, stats, on_result)
+        else:
+            for path in missing:
+                try:
+                    analysis = analyze_file(path, *args)
+                except Exception as e:
+                    analysis = e
+                self._store(path, analysis, stats, on_result)
+        self.index.flush()
+        stats.wall_ms = (time.perf_counter() - started) * 1000
+        return stats
+
+    def _store(
+        self,
+        path: pathlib.Path,
+        analysis: SoundAnalysis | Exception,
+        stats: AnalysisStats,
+        on_result: Optional[Callable[[pathlib.Path, Optional[SoundAnalysis]], None]],
+    ):
+        if isinstance(analysis, Exception):
+            logger.error("Could not analyse %s: %s", path, analysis)
+            stats.failed += 1
+            stats.errors[str(path)] = str(analysis)
+            analysis = None
+        else:
+            self.index.put(path, analysis)
+            stats.analyzed += 1
+        if on_result is not None:
+            on_result(path, analysis)
+
+    def start(
+        self,
+        paths: Iterable[pathlib.Path],
+        on_result: Callable[[pathlib.Path, Optional[SoundAnalysis]], None],
+        on_done: Optional[Callable[[AnalysisStats], None]] = None,
+    ):
+        """
+        Runs `run` on a background thread. Both callbacks are called from that
+        thread.
+        """
+        paths = list(paths)
+
+        def run():
+            stats = self.run(paths, on_result)
+            if on_done is not None:
+                on_done(stats)
+
+        self._thread = threading.Thread(
+            target=run, name="sound_r-analysis", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+def analyze_map(
+    scene_map: CompiledMap,
+    workers: Optional[int] = None,
+    progress: bool = True,
+) -> tuple[AnalysisIndex, AnalysisStats]:
+    """
+    Analyses every sound of `scene_map` that is not in its analysis index yet.
+    """
+    options = scene_map.options
+    index = AnalysisIndex(
+        scene_map.root,
+        options.get("channels", DEFAULT_CHANNELS),
+        options.get("silenceThresholdDb", DEFAULT_SILENCE_DB),
+    )
+    analyzer = Analyzer(
+        index,
+        options.get("sampleRate", DEFAULT_SAMPLE_RATE),
+        workers or options.get("analysisWorkers"),
+    )
+    paths = [scene_map.root / "sounds" / file for file in scene_map.sound_files]
+    stats = analyzer.run(paths, progress=progress)
+    index.prune(paths)
+    index.flush()
+    logger.info(
+        "Analysis: %d analysed on %d workers, %d cached, %d failed in %.0f ms",
+        stats.analyzed,
+        stats.workers,
+        stats.cached,
+        stats.failed,
+        stats.wall_ms,
+    )
+    return index, stats
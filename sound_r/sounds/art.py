@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore, QtGui
+
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import Callable, Optional
+
+    from .bundle import Bundle
+    from .compiled import CompiledMap
+
+logger = get_default_logger(__name__)
+
+# (art_id, scale, target width, target height); a 0 target means unbounded.
+ArtKey = tuple[str, float, int, int]
+
+DEFAULT_ART_BUDGET = 256 * 1024 * 1024
+
+
+def _scaled_size(
+    size: QtCore.QSize, scale: float, target: tuple[int, int]
+) -> QtCore.QSize:
+    width, height = size.width() * scale, size.height() * scale
+    target_w, target_h = target
+    if target_w > 0 and target_h > 0 and (width > target_w or height > target_h):
+        ratio = min(target_w / width, target_h / height)
+        width, height = width * ratio, height * ratio
+    return QtCore.QSize(max(1, int(width)), max(1, int(height)))
+
+
+def decode_art(
+    source: pathlib.Path | str | QtGui.QImage,
+    scale: float = 1.0,
+    target: tuple[int, int] = (0, 0),
+) -> QtGui.QImage:
+    """
+    Reads an image scaled by `scale` and shrunk to fit within `target`, keeping
+    its aspect ratio. Formats that support it (e.g. JPEG) are decoded directly
+    at the reduced size; an already decoded `source` (e.g. from a bundle) is
+    only rescaled. Safe to call from worker threads.
+    """
+    if isinstance(source, QtGui.QImage):
+        scaled = _scaled_size(source.size(), scale, target)
+        if scaled == source.size():
+            return source
+        return source.scaled(
+            scaled,
+            QtCore.Qt.AspectRatioMode.IgnoreAspectRatio,
+            QtCore.Qt.TransformationMode.SmoothTransformation,
+        )
+    reader = QtGui.QImageReader(str(source))
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid():
+        scaled = _scaled_size(size, scale, target)
+        if scaled != size:
+            reader.setScaledSize(scaled)
+    image = reader.read()
+    if image.isNull():
+        logger.debug("Could not read %s: %s", source, reader.errorString())
+    return image
+
+
+def art_source(
+    scene_map: CompiledMap, bundle: Optional[Bundle], art_id: str
+) -> pathlib.Path | QtGui.QImage:
+    """
+    The image embedded in `bundle` for `art_id`, or else its file.
+    """
+    if bundle is not None:
+        entry = bundle.art.get(art_id)
+        # The map may have been reloaded since the bundle was compiled.
+        if entry is not None and entry.file == scene_map.art_file(art_id):
+            image = bundle.image(art_id)
+            if image is not None:
+                return image
+    return scene_map.root / "art" / scene_map.art_file(art_id)
+
+
+def art_bytes(art: QtGui.QImage | QtGui.QPixmap) -> int:
+    if isinstance(art, QtGui.QImage):
+        return art.sizeInBytes()
+    return art.width() * art.height() * max(art.depth(), 8) // 8
+
+
+@dataclass
+class ArtCacheStats:
+    hits: int = 0
+    misses: int = 0
+    decoded: int = 0
+    evictions: int = 0
+    failures: int = 0
+    bytes: int = 0
+    decode_ms: float = 0.0
+
+    def as_dict(self) -> dict[str, int | float]:
+        return asdict(self)
+
+
+class _DecodeSignals(QtCore.QObject):
+    # key, image, decode time (ms)
+    decoded = QtCore.Signal(tuple, QtGui.QImage, float)
+
+
+class _DecodeTask(QtCore.QRunnable):
+    def __init__(
+        self,
+        key: ArtKey,
+        source: pathlib.Path | QtGui.QImage,
+        signals: _DecodeSignals,
+    ):
+        super().__init__()
+        self.key = key
+        self.source = source
+        self.signals = signals
+
+    def run(self):
+        start = time.perf_counter()
+        _, scale, target_w, target_h = self.key
+        image = decode_art(self.source, scale, (target_w, target_h))
+        self.signals.decoded.emit(self.key, image, (time.perf_counter() - start) * 1000)
+
+
+class ArtCache(QtCore.QObject):
+    """
+    A byte-budgeted LRU cache of decoded and scaled art.
+
+    Entries are keyed by (art_id, scale, target size), where the target size is
+    the box images are currently shrunk to fit (see `target_size`). Images are
+    decoded on a `QThreadPool` and handed back to the thread owning the cache
+    through `image_ready`. With `use_pixmaps` set (GUI thread only) images are
+    converted to `QPixmap`s once as they arrive, so showing a cached image
+    costs nothing.
+
+    PARAMETERS
+    ----------
+    resolve
+        Maps an art id to the path of its image file, or to an already decoded
+        image.
+    budget
+        The maximum number of bytes of decoded images to keep.
+    """
+
+    # art_id, scale, QImage or QPixmap, decode time (ms)
+    image_ready = QtCore.Signal(str, float, object, float)
+    image_failed = QtCore.Signal(str, float)
+
+    def __init__(
+        self,
+        resolve: Callable[[str], pathlib.Path | QtGui.QImage],
+        budget: int = DEFAULT_ART_BUDGET,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.resolve = resolve
+        self.budget = budget
+        self.use_pixmaps = False
+        self.target_size: tuple[int, int] = (0, 0)
+        self.stats = ArtCacheStats()
+        self.thread_pool = QtCore.QThreadPool(self)
+        self._images: OrderedDict[ArtKey, QtGui.QImage | QtGui.QPixmap] = OrderedDict()
+        self._pending: set[ArtKey] = set()
+        self._signals = _DecodeSignals(self)
+        self._signals.decoded.connect(self._on_decoded)
+
+    def key(self, art_id: str, scale: float = 1.0) -> ArtKey:
+        return (art_id, scale, *self.target_size)
+
+    def has(self, art_id: str, scale: float = 1.0) -> bool:
+        return self.key(art_id, scale) in self._images
+
+    def is_pending(self, art_id: str, scale: float = 1.0) -> bool:
+        return self.key(art_id, scale) in self._pending
+
+    def get(
+        self, art_id: str, scale: float = 1.0
+    ) -> Optional[QtGui.QImage | QtGui.QPixmap]:
+        key = self.key(art_id, scale)
+        image = self._images.get(key)
+        if image is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._images.move_to_end(key)
+        return image
+
+    def request(self, art_id: str, scale: float = 1.0) -> bool:
+        """
+        Starts decoding the image in the background unless it is cached or
+        already being decoded. Returns whether a decode was started.
+        """
+        key = self.key(art_id, scale)
+        if key in self._images or key in self._pending:
+            return False
+        try:
+            source = self.resolve(art_id)
+        except (KeyError, FileNotFoundError):
+            logger.warning("Cannot load unknown art: %s", art_id)
+            self.stats.failures += 1
+            self.image_failed.emit(art_id, scale)
+            return False
+        self._pending.add(key)
+        self.thread_pool.start(_DecodeTask(key, source, self._signals))
+        return True
+
+    def put(
+        self,
+        art_id: str,
+        scale: float,
+        image: QtGui.QImage | QtGui.QPixmap,
+        key: Optional[ArtKey] = None,
+    ) -> QtGui.QImage | QtGui.QPixmap:
+        """
+        Caches `image`, by default under the current target size. Returns the
+        cached object, which is a `QPixmap` if `use_pixmaps` is set.
+        """
+        key = key or self.key(art_id, scale)
+        if self.use_pixmaps and isinstance(image, QtGui.QImage):
+            image = QtGui.QPixmap.fromImage(image)
+        old = self._images.pop(key, None)
+        if old is not None:
+            self.stats.bytes -= art_bytes(old)
+        self._images[key] = image
+        self.stats.bytes += art_bytes(image)
+        self._evict()
+        return image
+
+    def discard(self, art_id: str):
+        for key in [key for key in self._images if key[0] == art_id]:
+            self.stats.bytes -= art_bytes(self._images.pop(key))
+
+    def clear(self):
+        self._images.clear()
+        self.stats.bytes = 0
+
+    def _evict(self):
+        # Always keep the most recent image, even if it alone exceeds the budget.
+        while self.stats.bytes > self.budget and len(self._images) > 1:
+            _, image = self._images.popitem(last=False)
+            self.stats.bytes -= art_bytes(image)
+            self.stats.evictions += 1
+
+    @QtCore.Slot(tuple, QtGui.QImage, float)
+    def _on_decoded(self, key: ArtKey, image: QtGui.QImage, elapsed_ms: float):
+        self._pending.discard(key)
+        art_id, scale, *_ = key
+        if image.isNull():
+            logger.warning("Failed to decode art %s", art_id)
+            self.stats.failures += 1
+            self.image_failed.emit(art_id, scale)
+            return
+        self.stats.decoded += 1
+        self.stats.decode_ms += elapsed_ms
+        logger.debug("Decoded art %s (x%s) in %.1f ms", art_id, scale, elapsed_ms)
+        self.image_ready.emit(
+            art_id, scale, self.put(art_id, scale, image, key), elapsed_ms
+        )
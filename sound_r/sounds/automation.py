@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Callable, Hashable, Optional
+
+logger = get_default_logger(__name__)
+
+# How often the timer updates ramps when nothing else drives the automation.
+DEFAULT_TICK_MS = 10
+DEFAULT_DUCK_MS = 250
+FADE = "fade"
+DUCK = "duck"
+
+
+def db_to_gain(db: float) -> float:
+    return 10 ** (db / 20)
+
+
+class Ramp:
+    """
+    A linear move of one value from `start` to `end`, written through
+    `apply`.
+    """
+
+    __slots__ = ("start", "end", "started", "duration", "apply", "on_done")
+
+    def __init__(
+        self,
+        start: float,
+        end: float,
+        started: float,
+        duration: float,
+        apply: Callable[[float], None],
+        on_done: Optional[Callable[[], None]],
+    ):
+        self.start = start
+        self.end = end
+        self.started = started  # clock seconds
+        self.duration = duration  # seconds
+        self.apply = apply
+        self.on_done = on_done
+
+    def value_at(self, now: float) -> float:
+        progress = (now - self.started) / self.duration
+        if progress >= 1:
+            return self.end
+        return self.start + (self.end - self.start) * max(progress, 0.0)
+
+
+@dataclass
+class AutomationStats:
+    started: int = 0
+    completed: int = 0
+    cancelled: int = 0  # replaced or cancelled before reaching the end
+    ticks: int = 0
+    active: int = 0
+    peak_active: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class Automation(QtCore.QObject):
+    """
+    Runs every gain ramp of the engine (fades, crossfades and ducking) from one
+    tick, instead of one animation and timer per player.
+
+    Each ramp is keyed, e.g. by (player, FADE); starting a ramp under a key
+    replaces the one running there, from wherever it currently is. `tick`
+    writes the current value of every ramp and runs the callbacks of those
+    that finished. Without a mixer the ticks come from one precise timer that
+    only runs while ramps are active; a mixer calls `tick` once per rendered
+    block instead, on its own clock. Both the clock and the ticks can be
+    driven by hand, so ramp timing can be tested without an event loop.
+
+    PARAMETERS
+    ----------
+    clock
+        Returns the current time in seconds; `time.perf_counter` by default.
+    tick_ms
+        The timer's interval.
+    timer
+        Whether to tick from a timer. Pass False when calling `tick` yourself.
+    """
+
+    def __init__(
+        self,
+        clock: Optional[Callable[[], float]] = None,
+        tick_ms: float = DEFAULT_TICK_MS,
+        timer: bool = True,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.clock = clock or time.perf_counter
+        self.stats = AutomationStats()
+        self._ramps: dict[Hashable, Ramp] = {}
+        self._timer: Optional[QtCore.QTimer] = None
+        if timer:
+            self._timer = QtCore.QTimer(self)
+            self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+            self._timer.setInterval(int(tick_ms))
+            self._timer.timeout.connect(self.tick)
+
+    def __len__(self) -> int:
+        return len(self._ramps)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._ramps
+
+    def ramp(
+        self,
+        key: Hashable,
+        start: float,
+        end: float,
+        duration_ms: float,
+        apply: Callable[[float], None],
+        on_done: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Moves a value from `start` to `end` over `duration_ms`, writing it with
+        `apply` on every tick, then calls `on_done`. A ramp already running
+        under `key` is dropped without calling its `on_done`.
+        """
+        self.cancel(key)
+        if duration_ms <= 0:
+            apply(end)
+            if on_done is not None:
+                on_done()
+            return
+        self._ramps[key] = Ramp(
+            start, end, self.clock(), duration_ms / 1000, apply, on_done
+        )
+        apply(start)
+        stats = self.stats
+        stats.started += 1
+        stats.active = len(self._ramps)
+        stats.peak_active = max(stats.peak_active, stats.active)
+        if self._timer is not None and not self._timer.isActive():
+            self._timer.start()
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Drops the ramp under `key` where it is, without calling its `on_done`.
+        Returns whether one was running.
+        """
+        if self._ramps.pop(key, None) is None:
+            return False
+        self.stats.cancelled += 1
+        self.stats.active = len(self._ramps)
+        return True
+
+    def value(self, key: Hashable) -> Optional[float]:
+        """
+        The current value of the ramp under `key`, or None if there is none.
+        """
+        ramp = self._ramps.get(key)
+        return None if ramp is None else ramp.value_at(self.clock())
+
+    def tick(self, now: Optional[float] = None):
+        now = self.clock() if now is None else now
+        self.stats.ticks += 1
+        finished = []
+        for key, ramp in self._ramps.items():
+            progress = (now - ramp.started) / ramp.duration
+            if progress >= 1:
+                ramp.apply(ramp.end)
+                finished.append((key, ramp))
+            elif progress > 0:
+                ramp.apply(ramp.start + (ramp.end - ramp.start) * progress)
+        # Callbacks may start or cancel ramps, so they run after the loop.
+        for key, ramp in finished:
+            if self._ramps.get(key) is not ramp:
+                continue
+            del self._ramps[key]
+            self.stats.completed += 1
+            if ramp.on_done is not None:
+                try:
+                    ramp.on_done()
+                except Exception:
+                    logger.exception("Ramp callback %r failed", ramp.on_done)
+        self.stats.active = len(self._ramps)
+        if not self._ramps and self._timer is not None:
+            self._timer.stop()
+
+
+class GainStage:
+    """
+    The level of one player: its volume times a fade gain and a duck gain,
+    both ramped by an `Automation`, and the gain of its bus where the backend
+    cannot apply that to the whole bus at once. Every change of the level is
+    written with `apply`.
+
+    PARAMETERS
+    ----------
+    automation
+        Runs the fade and duck ramps.
+    apply
+        Writes the level to the player's output.
+    volume
+        The level before fading and ducking.
+    """
+
+    __slots__ = (
+        "automation",
+        "apply",
+        "volume",
+        "fade",
+        "duck",
+        "bus",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        automation: Automation,
+        apply: Callable[[float], None],
+        volume: float = 1.0,
+    ):
+        self.automation = automation
+        self.apply = apply
+        self.volume = volume
+        self.fade = 1.0
+        self.duck = 1.0
+        self.bus = 1.0
+
+    @property
+    def level(self) -> float:
+        return self.volume * self.fade * self.duck * self.bus
+
+    @property
+    def fading(self) -> bool:
+        return (self, FADE) in self.automation
+
+    def set_volume(self, volume: float):
+        self.volume = volume
+        self.apply(self.level)
+
+    def set_fade(self, gain: float):
+        self.fade = gain
+        self.apply(self.level)
+
+    def set_duck(self, gain: float):
+        self.duck = gain
+        self.apply(self.level)
+
+    def set_bus(self, gain: float):
+        self.bus = gain
+        self.apply(self.level)
+
+    def fade_to(
+        self,
+        gain: float,
+        duration_ms: float,
+        on_done: Optional[Callable[[], None]] = None,
+        start: Optional[float] = None,
+    ):
+        """
+        Fades from `start` (the current fade gain by default) to `gain`, then
+        calls `on_done`. Replaces a fade in progress.
+        """
+        self.automation.ramp(
+            (self, FADE),
+            self.fade if start is None else start,
+            gain,
+            duration_ms,
+            self.set_fade,
+            on_done,
+        )
+
+    def duck_to(self, gain: float, duration_ms: float):
+        self.automation.ramp((self, DUCK), self.duck, gain, duration_ms, self.set_duck)
+
+    def stop_fade(self):
+        self.automation.cancel((self, FADE))
+
+    def cancel(self):
+        self.automation.cancel((self, FADE))
+        self.automation.cancel((self, DUCK))
@@ -0,0 +1,619 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import tempfile
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+from ..utils import cache_dir, get_default_logger
+from .compiled import (
+    CompiledMap,
+    ObjType,
+    Scene,
+    SceneObj,
+    ValidationIssue,
+    compile_map,
+)
+from .probe import probe_image, probe_sound
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+    import numpy as np
+    from PySide6 import QtGui
+
+# Kept free of Qt imports (and numpy, unless PCM is embedded) so a bundle can
+# be opened before anything heavy is loaded.
+
+logger = get_default_logger(__name__)
+
+MAGIC = b"SOUNDRBN"
+# Bump when the layout changes; older bundles are then rebuilt.
+BUNDLE_VERSION = 5
+BUNDLE_NAME = "map.bundle"
+DATA_ALIGN = 64
+
+# magic, version, section count, SHA-256 of map.json
+_HEADER = struct.Struct("<8sII32s")
+# tag, offset, length
+_SECTION = struct.Struct("<4sQQ")
+# name, first object, object count
+_SCENE = struct.Struct("<III")
+# type, flags, id, payload, target, scale, fadein, fadeout, delay, every, at,
+# layer (-1 for none), duck (-1 for none), bus (-1 for none), priority
+_OBJ = struct.Struct("<BBxxIIIdiiiiiidii")
+# id, file, format, size, mtime_ns, rate, channels, duration_ms,
+# PCM offset, PCM frames, PCM rate, PCM channels
+_SOUND = struct.Struct("<IIIQqIHdQQIH")
+# id, file, format, size, mtime_ns, width, height,
+# image offset, image width, image height, bytes per line, QImage format
+_ART = struct.Struct("<IIIQqIIQIIII")
+# location, code, message
+_ISSUE = struct.Struct("<III")
+
+_LOOP, _STEP, _RETAIN = 1, 2, 4
+# (loop, step, retain) for every combination of flags
+_FLAGS = tuple(
+    (bool(flags & _LOOP), bool(flags & _STEP), bool(flags & _RETAIN))
+    for flags in range(8)
+)
+_OBJ_TYPES = tuple(ObjType)
+
+
+class BundleError(ValueError):
+    pass
+
+
+def bundle_path(root: pathlib.Path) -> pathlib.Path:
+    return cache_dir(root) / BUNDLE_NAME
+
+
+def source_hash(map_path: pathlib.Path) -> bytes:
+    return hashlib.sha256(pathlib.Path(map_path).read_bytes()).digest()
+
+
+@dataclass(frozen=True, slots=True)
+class SoundEntry:
+    id: str
+    file: str
+    format: str
+    size: int
+    mtime_ns: int
+    sample_rate: int
+    channels: int
+    duration_ms: float
+    pcm_offset: int = 0
+    pcm_frames: int = 0
+    pcm_rate: int = 0
+    pcm_channels: int = 0
+
+    def info(self) -> dict:
+        info: dict = {"format": self.format}
+        if self.sample_rate:
+            info.update(
+                sample_rate=self.sample_rate,
+                channels=self.channels,
+                duration_ms=self.duration_ms,
+            )
+        return info
+
+
+@dataclass(frozen=True, slots=True)
+class ArtEntry:
+    id: str
+    file: str
+    format: str
+    size: int
+    mtime_ns: int
+    width: int
+    height: int
+    image_offset: int = 0
+    image_width: int = 0
+    image_height: int = 0
+    bytes_per_line: int = 0
+    image_format: int = 0
+
+    def info(self) -> dict:
+        return {"format": self.format, "width": self.width, "height": self.height}
+
+
+class Bundle:
+    """
+    A compiled map read from a bundle file.
+
+    The file is memory-mapped, so opening a bundle costs little more than
+    unpacking the scene graph; embedded PCM and art are only paged in when
+    they are used.
+
+    PARAMETERS
+    ----------
+    path
+        The bundle file.
+    root
+        The folder of the map the bundle was compiled from. Defaults to the
+        folder recorded in the bundle.
+    """
+
+    def __init__(self, path: pathlib.Path | str, root: Optional[pathlib.Path] = None):
+        self.path = pathlib.Path(path)
+        with self.path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read(root)
+        except (struct.error, ValueError, EOFError, TypeError, IndexError) as e:
+            self.close()
+            if isinstance(e, BundleError):
+                raise
+            raise BundleError(f"Corrupt bundle {self.path}: {e}") from e
+
+    def _read(self, root: Optional[pathlib.Path]):
+        view = memoryview(self._mmap)
+        magic, version, count, digest = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise BundleError(f"{self.path} is not a sound_r bundle")
+        if version != BUNDLE_VERSION:
+            raise BundleError(f"{self.path} has bundle version {version}")
+        self.source_hash = digest
+        sections = {}
+        for i in range(count):
+            tag, offset, length = _SECTION.unpack_from(
+                view, _HEADER.size + i * _SECTION.size
+            )
+            sections[tag] = view[offset : offset + length]
+
+        strings = [sys.intern(s) for s in bytes(sections[b"STRS"]).decode().split("\0")]
+        meta = marshal.loads(sections[b"META"])
+        self.root = pathlib.Path(root if root is not None else meta["root"])
+        self.map_file: str = meta["mapFile"]
+        self.pcm_format: Optional[tuple[int, int]] = meta["pcm"]
+        self.art_max: int = meta["artMax"]
+        options = marshal.loads(sections[b"OPTS"])
+
+        self.sounds = {
+            entry.id: entry
+            for entry in (
+                SoundEntry(strings[id_], strings[file], strings[fmt], *rest)
+                for id_, file, fmt, *rest in _SOUND.iter_unpack(sections[b"SNDS"])
+            )
+        }
+        self.art = {
+            entry.id: entry
+            for entry in (
+                ArtEntry(strings[id_], strings[file], strings[fmt], *rest)
+                for id_, file, fmt, *rest in _ART.iter_unpack(sections[b"ARTS"])
+            )
+        }
+        sound_ids = tuple(self.sounds)
+        art_ids = tuple(self.art)
+        records = list(_SCENE.iter_unpack(sections[b"SCNS"]))
+        scene_names = tuple(strings[name] for name, _, _ in records)
+        names = (sound_ids, scene_names, art_ids)
+        # Built with tuple.__new__ to skip the NamedTuple constructor, which
+        # dominates opening large maps.
+        new = tuple.__new__
+        objs = [
+            new(
+                SceneObj,
+                (
+                    _OBJ_TYPES[type_],
+                    strings[id_],
+                    names[type_][target],
+                    target,
+                    *_FLAGS[flags],
+                    scale,
+                    None if fadein < 0 else fadein,
+                    None if fadeout < 0 else fadeout,
+                    None if delay < 0 else delay,
+                    None if every < 0 else every,
+                    None if at < 0 else at,
+                    None if layer < 0 else strings[layer],
+                    None if duck < 0 else duck,
+                    None if bus < 0 else strings[bus],
+                    priority,
+                ),
+            )
+            for (
+                type_,
+                flags,
+                id_,
+                _,
+                target,
+                scale,
+                fadein,
+                fadeout,
+                delay,
+                every,
+                at,
+                layer,
+                duck,
+                bus,
+                priority,
+            ) in _OBJ.iter_unpack(sections[b"OBJS"])
+        ]
+        scenes = tuple(
+            Scene(i, scene_names[i], tuple(objs[first : first + count]))
+            for i, (_, first, count) in enumerate(records)
+        )
+        issues = tuple(
+            ValidationIssue(strings[location], strings[code], strings[message])
+            for location, code, message in _ISSUE.iter_unpack(sections[b"ISSU"])
+        )
+        self.scene_map = CompiledMap(
+            root=self.root,
+            sound_ids=sound_ids,
+            sound_files=tuple(entry.file for entry in self.sounds.values()),
+            art_ids=art_ids,
+            art_files=tuple(entry.file for entry in self.art.values()),
+            scenes=scenes,
+            sound_index=MappingProxyType({id_: i for i, id_ in enumerate(sound_ids)}),
+            art_index=MappingProxyType({id_: i for i, id_ in enumerate(art_ids)}),
+            scene_index=MappingProxyType(
+                {name: i for i, name in enumerate(scene_names)}
+            ),
+            options=MappingProxyType(options),
+            issues=issues,
+        )
+        self._pcm_paths = {
+            str(self.root / "sounds" / entry.file): entry
+            for entry in self.sounds.values()
+            if entry.pcm_frames
+        }
+
+    @property
+    def map_path(self) -> pathlib.Path:
+        return self.root / self.map_file
+
+    def is_stale(self) -> bool:
+        """
+        Whether map.json or any asset changed since the bundle was compiled.
+        Assets are compared by size and modification time, so this never
+        reads them.
+        """
+        try:
+            if source_hash(self.map_path) != self.source_hash:
+                return True
+            for folder, entries in (
+                ("sounds", self.sounds.values()),
+                ("art", self.art.values()),
+            ):
+                for entry in entries:
+                    # Assets missing at compile time are recorded as 0, 0.
+                    if _stat_asset(self.root / folder / entry.file) != (
+                        entry.size,
+                        entry.mtime_ns,
+                    ):
+                        return True
+        except OSError:
+            return True
+        return False
+
+    def pcm(
+        self, path: pathlib.Path | str, sample_rate: int, channels: int
+    ) -> Optional[np.ndarray]:
+        """
+        Returns the embedded PCM of the sound at `path` as a read-only view of
+        the bundle, or None if it was not embedded in this format.
+        """
+        entry = self._pcm_paths.get(str(path))
+        if entry is None or (entry.pcm_rate, entry.pcm_channels) != (
+            sample_rate,
+            channels,
+        ):
+            return None
+        import numpy as np
+
+        return np.frombuffer(
+            self._mmap,
+            dtype=np.float32,
+            count=entry.pcm_frames * entry.pcm_channels,
+            offset=entry.pcm_offset,
+        ).reshape(entry.pcm_frames, entry.pcm_channels)
+
+    def image(self, art_id: str) -> Optional[QtGui.QImage]:
+        """
+        Returns the embedded, pre-scaled image of `art_id`, or None if art was
+        not embedded.
+        """
+        entry = self.art.get(art_id)
+        if entry is None or not entry.image_width:
+            return None
+        from PySide6 import QtGui
+
+        end = entry.image_offset + entry.bytes_per_line * entry.image_height
+        with memoryview(self._mmap)[entry.image_offset : end] as pixels:
+            # Copied so the image does not outlive the mapping.
+            return QtGui.QImage(
+                pixels,
+                entry.image_width,
+                entry.image_height,
+                entry.bytes_per_line,
+                QtGui.QImage.Format(entry.image_format),
+            ).copy()
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Embedded PCM is still in use; the mapping goes with it.
+            pass
+
+
+def _stat_asset(path: pathlib.Path) -> tuple[int, int]:
+    """
+    The size and modification time of an asset, or 0, 0 if it is missing.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_bundle(
+    map_path: pathlib.Path | str,
+    output: Optional[pathlib.Path | str] = None,
+    embed_pcm: bool = False,
+    art_max: int = 0,
+) -> pathlib.Path:
+    """
+    Compiles map.json and writes it, with an index of its assets, to a bundle.
+
+    PARAMETERS
+    ----------
+    map_path
+        The map.json to compile.
+    output
+        Where to write the bundle. Defaults to the map's cache folder, where
+        `load_bundle` looks for it.
+    embed_pcm
+        Decode every sound to the map's mixer format (`sampleRate`,
+        `channels`) and embed it, so the mixer backends play them without
+        decoding.
+    art_max
+        If positive, embeds every image shrunk to fit a square of this size.
+
+    RETURNS
+    -------
+    -
+        The path of the bundle.
+    """
+    map_path = pathlib.Path(map_path).resolve()
+    root = map_path.parent
+    raw = map_path.read_bytes()
+    data_map = json.loads(raw)
+    compiled = compile_map(data_map, root=root)
+    # Only embedding (and images whose headers are not understood) need Qt
+    # or numpy.
+    pcm = None
+    if embed_pcm:
+        from .pcm import DEFAULT_CHANNELS, DEFAULT_SAMPLE_RATE, decode_pcm
+
+        pcm = (
+            compiled.options.get("sampleRate", DEFAULT_SAMPLE_RATE),
+            compiled.options.get("channels", DEFAULT_CHANNELS),
+        )
+    output = pathlib.Path(output) if output is not None else bundle_path(root)
+
+    strings: dict[str, int] = {}
+
+    def string(value: str) -> int:
+        index = strings.get(value)
+        if index is None:
+            if "\0" in value:
+                raise BundleError(f"Cannot bundle a string containing NUL: {value!r}")
+            index = strings[value] = len(strings)
+        return index
+
+    data = bytearray()
+
+    def add_data(payload: bytes) -> int:
+        # Offsets are relative to the data section until the layout is known.
+        data.extend(b"\0" * (-len(data) % DATA_ALIGN))
+        offset = len(data)
+        data.extend(payload)
+        return offset
+
+    sound_records = []
+    for sound_id, file in zip(compiled.sound_ids, compiled.sound_files):
+        path = root / "sounds" / file
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            # Recorded as missing, with a zero size and time for `is_stale`;
+            # playing it fails as it would without a bundle.
+            logger.warning("Sound `%s` is missing: %s", sound_id, e)
+            sound_records.append([string(sound_id), string(file), string("")] + [0] * 9)
+            continue
+        info = probe_sound(path)
+        fields = [
+            string(sound_id),
+            string(file),
+            string(info.get("format", "")),
+            stat.st_size,
+            stat.st_mtime_ns,
+            info.get("sample_rate", 0),
+            info.get("channels", 0),
+            info.get("duration_ms", 0.0),
+        ]
+        if pcm is not None:
+            samples = decode_pcm(path, *pcm)
+            fields += [add_data(samples.tobytes()), len(samples), *pcm]
+        else:
+            fields += [0, 0, 0, 0]
+        sound_records.append(fields)
+
+    art_records = []
+    for art_id, file in zip(compiled.art_ids, compiled.art_files):
+        path = root / "art" / file
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning("Art `%s` is missing: %s", art_id, e)
+            art_records.append([string(art_id), string(file), string("")] + [0] * 9)
+            continue
+        info = probe_image(path)
+        if info["width"] < 0:
+            from .loader import probe_art
+
+            info = probe_art(path)
+        fields = [
+            string(art_id),
+            string(file),
+            string(info.get("format", "")),
+            stat.st_size,
+            stat.st_mtime_ns,
+            max(info.get("width", 0), 0),
+            max(info.get("height", 0), 0),
+        ]
+        image = None
+        if art_max > 0:
+            from PySide6 import QtGui
+
+            from .art import decode_art
+
+            image = decode_art(path, 1.0, (art_max, art_max))
+        if image is not None and not image.isNull():
+            image = image.convertToFormat(QtGui.QImage.Format.Format_ARGB32)
+            fields += [
+                add_data(bytes(image.constBits())),
+                image.width(),
+                image.height(),
+                image.bytesPerLine(),
+                image.format().value,
+            ]
+        else:
+            fields += [0, 0, 0, 0, 0]
+        art_records.append(fields)
+
+    scene_records = []
+    obj_records = []
+    for scene in compiled.scenes:
+        scene_records.append((string(scene.name), len(obj_records), len(scene)))
+        for obj in scene.objects:
+            flags = (
+                (_LOOP if obj.loop else 0)
+                | (_STEP if obj.step else 0)
+                | (_RETAIN if obj.retain else 0)
+            )
+            obj_records.append(
+                (
+                    int(obj.type),
+                    flags,
+                    string(obj.id),
+                    string(obj.payload),
+                    obj.target,
+                    obj.scale,
+                    -1 if obj.fadein is None else obj.fadein,
+                    -1 if obj.fadeout is None else obj.fadeout,
+                    -1 if obj.delay is None else obj.delay,
+                    -1 if obj.every is None else obj.every,
+                    -1 if obj.at is None else obj.at,
+                    -1 if obj.layer is None else string(obj.layer),
+                    -1.0 if obj.duck is None else obj.duck,
+                    -1 if obj.bus is None else string(obj.bus),
+                    obj.priority,
+                )
+            )
+    issue_records = [
+        (string(issue.location), string(issue.code), string(issue.message))
+        for issue in compiled.issues
+    ]
+
+    sections = {
+        b"META": marshal.dumps(
+            {
+                "root": str(root),
+                "mapFile": map_path.name,
+                "pcm": tuple(pcm) if pcm is not None else None,
+                "artMax": art_max,
+            }
+        ),
+        b"OPTS": marshal.dumps(dict(compiled.options)),
+        b"STRS": "\0".join(strings).encode(),
+        b"SCNS": b"".join(_SCENE.pack(*r) for r in scene_records),
+        b"OBJS": b"".join(_OBJ.pack(*r) for r in obj_records),
+        b"ISSU": b"".join(_ISSUE.pack(*r) for r in issue_records),
+    }
+    # Asset records hold absolute data offsets, so they are packed last.
+    table_end = _HEADER.size + (len(sections) + 3) * _SECTION.size
+    data_start = table_end + sum(len(body) for body in sections.values())
+    data_start += _SOUND.size * len(sound_records) + _ART.size * len(art_records)
+    data_start += -data_start % DATA_ALIGN
+
+    def absolute(records: list[list], offset_field: int, size_field: int):
+        for fields in records:
+            if fields[size_field]:
+                fields[offset_field] += data_start
+
+    absolute(sound_records, 8, 9)
+    absolute(art_records, 7, 8)
+    sections[b"SNDS"] = b"".join(_SOUND.pack(*r) for r in sound_records)
+    sections[b"ARTS"] = b"".join(_ART.pack(*r) for r in art_records)
+
+    body = bytearray()
+    table = []
+    offset = table_end
+    for tag, section in sections.items():
+        table.append(_SECTION.pack(tag, offset, len(section)))
+        body += section
+        offset += len(section)
+    body += b"\0" * (data_start - offset)
+    table.append(_SECTION.pack(b"DATA", data_start, len(data)))
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=output.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(
+            _HEADER.pack(
+                MAGIC, BUNDLE_VERSION, len(table), hashlib.sha256(raw).digest()
+            )
+        )
+        f.writelines(table)
+        f.write(body)
+        f.write(data)
+    os.replace(tmp, output)
+    logger.info(
+        "Compiled %s (%d scenes, %d sounds, %d art) to %s (%.1f MiB)",
+        map_path,
+        len(compiled.scenes),
+        len(compiled.sound_ids),
+        len(compiled.art_ids),
+        output,
+        output.stat().st_size / 1024 / 1024,
+    )
+    return output
+
+
+def load_bundle(
+    map_dir: pathlib.Path | str, path: Optional[pathlib.Path | str] = None
+) -> Bundle:
+    """
+    Opens the bundle of the map in `map_dir`, compiling it first if it is
+    missing, unreadable or stale. A rebuilt bundle keeps the embedding options
+    of the one it replaces.
+    """
+    map_dir = pathlib.Path(map_dir)
+    path = pathlib.Path(path) if path is not None else bundle_path(map_dir)
+    embed_pcm, art_max = False, 0
+    try:
+        bundle = Bundle(path, root=map_dir)
+    except FileNotFoundError:
+        logger.info("No bundle at %s, compiling", path)
+    except BundleError as e:
+        logger.warning("Rebuilding bundle: %s", e)
+    else:
+        if not bundle.is_stale():
+            return bundle
+        logger.info("Bundle %s is out of date, recompiling", path)
+        embed_pcm, art_max = bundle.pcm_format is not None, bundle.art_max
+        bundle.close()
+    write_bundle(map_dir / "map.json", path, embed_pcm, art_max)
+    return Bundle(path, root=map_dir)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from ..utils import get_default_logger
+from .automation import FADE
+
+if TYPE_CHECKING:
+    from typing import Mapping, Optional
+
+    from .automation import Automation
+    from .compiled import CompiledMap
+    from .mixer import MixBus
+    from .session import PlaybackSession
+
+logger = get_default_logger(__name__)
+
+# The bus of sounds that do not name one.
+MAIN_BUS = "main"
+# How quickly a sound that loses its voice fades out.
+DEFAULT_STEAL_FADE_MS = 20
+
+
+@dataclass
+class BusStats:
+    started: int = 0
+    steals: int = 0  # voices taken from a playing sound
+    rejected: int = 0  # not played: every voice had a higher priority
+    active: int = 0
+    peak_active: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class Bus:
+    """
+    A named group of sounds, e.g. music or ambience, with a shared gain and a
+    limited number of voices.
+
+    With a mixer the bus has a `MixBus`: its sounds are summed and the gain is
+    applied once to the sum. Otherwise every player has its own output, so the
+    gain is written to the players of the bus, of which there are at most
+    `max_voices`.
+
+    Once `max_voices` sounds play, starting another takes the voice of the
+    playing sound with the lowest priority, the oldest first; a sound whose
+    priority is lower than all of them is not played.
+
+    PARAMETERS
+    ----------
+    name
+        The bus name, as used by sound objects and `globalOptions.buses`.
+    automation
+        Ramps the bus gain.
+    mix
+        The mixer's bus, if sounds are mixed.
+    max_voices
+        The most sounds playing at once; None for no limit.
+    """
+
+    __slots__ = (
+        "name",
+        "automation",
+        "mix",
+        "max_voices",
+        "gain",
+        "sessions",
+        "stats",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        automation: Automation,
+        mix: Optional[MixBus] = None,
+        max_voices: Optional[int] = None,
+    ):
+        self.name = name
+        self.automation = automation
+        self.mix = mix
+        self.max_voices = max_voices
+        self.gain = 1.0
+        # Playing sounds in the order they started.
+        self.sessions: dict[PlaybackSession, None] = {}
+        self.stats = BusStats()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def fade_to(self, gain: float, duration_ms: float = 0):
+        """
+        Moves the bus gain to `gain` (linear) over `duration_ms`.
+        """
+        self.automation.ramp((self, FADE), self.gain, gain, duration_ms, self._apply)
+
+    def _apply(self, gain: float):
+        self.gain = gain
+        if self.mix is not None:
+            self.mix.set_level(gain)
+            return
+        for session in self.sessions:
+            session.player.gain.set_bus(gain)
+
+    def claim(self, priority: int) -> tuple[bool, Optional[PlaybackSession]]:
+        """
+        Finds a voice for a sound of `priority`.
+
+        RETURNS
+        -------
+        -
+            Whether the sound may play, and the playing sound it must take the
+            voice of, if any.
+        """
+        if self.max_voices is None or len(self.sessions) < self.max_voices:
+            return True, None
+        # min() keeps the first of equals, which started first.
+        victim = min(self.sessions, key=lambda session: session.obj.priority)
+        if victim.obj.priority > priority:
+            return False, None
+        return True, victim
+
+    def add(self, session: PlaybackSession):
+        """
+        Counts `session` as playing on the bus and routes its player there;
+        call before the session plays.
+        """
+        player = session.player
+        if self.mix is not None:
+            player.bus = self.mix
+        else:
+            player.gain.bus = self.gain
+        self.sessions[session] = None
+        stats = self.stats
+        stats.started += 1
+        stats.active = len(self.sessions)
+        stats.peak_active = max(stats.peak_active, stats.active)
+
+    def remove(self, session: PlaybackSession):
+        if session in self.sessions:
+            del self.sessions[session]
+            self.stats.active = len(self.sessions)
+
+    def __repr__(self) -> str:
+        limit = "∞" if self.max_voices is None else self.max_voices
+        return f"<Bus {self.name} {len(self.sessions)}/{limit}>"
+
+
+def bus_options(scene_map: CompiledMap) -> Mapping[str, Mapping]:
+    """
+    Returns the valid entries of `globalOptions.buses`, warning about the
+    rest.
+    """
+    buses = scene_map.options.get("buses") or {}
+    if not isinstance(buses, dict):
+        logger.warning("`globalOptions.buses` must be a mapping of name to options")
+        return {}
+    valid = {}
+    for name, options in buses.items():
+        if not isinstance(options, dict):
+            logger.warning("Options of bus `%s` must be a mapping", name)
+            continue
+        options = dict(options)
+        max_voices = options.get("maxVoices")
+        if max_voices is not None and (type(max_voices) is not int or max_voices < 1):
+            logger.warning("Bus `%s` needs a positive `maxVoices`", name)
+            del options["maxVoices"]
+        gain_db = options.get("gainDb")
+        if gain_db is not None and type(gain_db) not in (int, float):
+            logger.warning("Bus `%s` has a `gainDb` that is not a number", name)
+            del options["gainDb"]
+        valid[name] = options
+    return valid
@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+import pathlib
+import sys
+from dataclasses import dataclass
+from enum import IntEnum
+from pprint import pformat
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from ..utils import get_default_logger, parse_time_field
+from . import types
+
+if TYPE_CHECKING:
+    from typing import Iterable, Mapping, Optional
+
+# Kept free of Qt imports so maps can be checked and compiled without a GUI.
+
+logger = get_default_logger(__name__)
+
+
+class ObjType(IntEnum):
+    SOUND = 0
+    CUE = 1
+    ART = 2
+
+
+_ART = ObjType.ART
+_OBJ_TYPES = {"sound": ObjType.SOUND, "cue": ObjType.CUE, "art": ObjType.ART}
+
+
+class SceneObj(NamedTuple):
+    """
+    A validated scene object. `target` is the interned index of the payload in
+    `CompiledMap.sound_ids`, `art_ids` or `scenes` depending on `type`. `at`
+    is a time of day in seconds after midnight. `layer` is the layer a cue
+    plays its scene on, None for the layer the cue runs in. `duck` is how many
+    dB a sound lowers every other sound by while it plays. `bus` is the bus a
+    sound plays on, None for the main bus, and `priority` decides which sound
+    loses its voice when the bus has none left.
+    """
+
+    type: ObjType
+    id: str
+    payload: str
+    target: int
+    loop: bool = False
+    step: bool = False
+    retain: bool = False
+    scale: float = 1.0
+    fadein: Optional[int] = None
+    fadeout: Optional[int] = None
+    delay: Optional[int] = None
+    every: Optional[int] = None
+    at: Optional[int] = None
+    layer: Optional[str] = None
+    duck: Optional[float] = None
+    bus: Optional[str] = None
+    priority: int = 0
+
+    @property
+    def timed(self) -> bool:
+        """
+        Whether the object is played by the scheduler instead of by stepping.
+        """
+        return self.delay is not None or self.every is not None or self.at is not None
+
+
+@dataclass(frozen=True, slots=True)
+class Scene:
+    index: int
+    name: str
+    objects: tuple[SceneObj, ...]
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def __getitem__(self, idx: int) -> SceneObj:
+        return self.objects[idx]
+
+
+@dataclass(frozen=True, slots=True)
+class ValidationIssue:
+    location: str  # JSON pointer (RFC 6901) into map.json
+    code: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.location or '/'}: {self.message}"
+
+
+class MapValidationError(ValueError):
+    def __init__(self, issues: Iterable[ValidationIssue]):
+        self.issues = tuple(issues)
+        super().__init__(
+            "Invalid object map:\n" + "\n".join(f"  {i}" for i in self.issues)
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledMap:
+    """
+    An immutable, validated ObjectMap. Ids are interned: `sound_ids[i]` is
+    stored at `sound_files[i]` and `sound_index` maps the id back to `i`, and
+    likewise for art and scenes.
+    """
+
+    root: pathlib.Path
+    sound_ids: tuple[str, ...]
+    sound_files: tuple[str, ...]
+    art_ids: tuple[str, ...]
+    art_files: tuple[str, ...]
+    scenes: tuple[Scene, ...]
+    sound_index: Mapping[str, int]
+    art_index: Mapping[str, int]
+    scene_index: Mapping[str, int]
+    options: Mapping[str, Any]
+    issues: tuple[ValidationIssue, ...] = ()
+
+    @property
+    def loop_scenes(self) -> bool:
+        return bool(self.options.get("loopScenes", False))
+
+    @property
+    def object_count(self) -> int:
+        return sum(len(scene.objects) for scene in self.scenes)
+
+    def scene(self, scene_id: str) -> Scene:
+        return self.scenes[self.scene_index[scene_id]]
+
+    def sound_file(self, sound_id: str) -> str:
+        return self.sound_files[self.sound_index[sound_id]]
+
+    def art_file(self, art_id: str) -> str:
+        return self.art_files[self.art_index[art_id]]
+
+    def __str__(self) -> str:
+        return pformat(
+            {
+                "root": self.root,
+                "soundIDs": dict(zip(self.sound_ids, self.sound_files)),
+                "artIDs": dict(zip(self.art_ids, self.art_files)),
+                "scenes": {scene.name: scene.objects for scene in self.scenes},
+                "globalOptions": dict(self.options),
+            }
+        )
+
+
+def json_pointer(*parts: str | int) -> str:
+    return "".join(
+        "/" + str(part).replace("~", "~0").replace("/", "~1") for part in parts
+    )
+
+
+def _intern_ids(
+    data_map: Mapping, key: str, issues: list[ValidationIssue]
+) -> tuple[tuple[str, ...], tuple[str, ...], dict[str, int]]:
+    ids = data_map.get(key, {})
+    if not isinstance(ids, dict):
+        issues.append(
+            ValidationIssue(
+                json_pointer(key),
+                "badtype",
+                f"`{key}` must be a mapping of id to path.",
+            )
+        )
+        ids = {}
+    names: list[str] = []
+    files: list[str] = []
+    for id_, file in ids.items():
+        if not isinstance(file, str):
+            issues.append(
+                ValidationIssue(
+                    json_pointer(key, id_),
+                    "badtype",
+                    f"Path of `{id_}` must be a string.",
+                )
+            )
+            continue
+        names.append(sys.intern(id_))
+        files.append(file)
+    return tuple(names), tuple(files), {name: i for i, name in enumerate(names)}
+
+
+_BOOL_FIELDS = ("loop", "step", "retain")
+_MS_FIELDS = ("fadein", "fadeout", "delay")
+
+
+_BOOLS = (True, False)
+_NUMBERS = (int, float)
+
+
+def _time_of_day(value: Any) -> Optional[int]:
+    """
+    Returns a TIME_FORMAT string as seconds after midnight, or None if it isn't
+    one.
+    """
+    if type(value) is not str:
+        return None
+    try:
+        at = parse_time_field(value)
+    except ValueError:
+        return None
+    return at.hour * 3600 + at.minute * 60 + at.second
+
+
+def _compile_obj(
+    obj: Any,
+    scene_name: str,
+    i: int,
+    indices: tuple[dict[str, int], dict[str, int], dict[str, int]],
+    issues: list[ValidationIssue],
+    names: tuple[tuple[str, ...], tuple[str, ...], tuple[str, ...]] = ((), (), ()),
+) -> Optional[SceneObj]:
+    # Fast path: a well-formed object is checked with one lookup per field and
+    # built without allocating anything but the SceneObj itself.
+    if type(obj) is dict:
+        get = obj.get
+        type_ = _OBJ_TYPES.get(get("type"))
+        id_ = get("id")
+        payload = get("payload")
+        if type_ is not None and type(id_) is str and type(payload) is str:
+            target = indices[type_].get(payload, -1)
+            loop = get("loop", False)
+            step = get("step", type_ is _ART)
+            retain = get("retain", False)
+            scale = get("scale", 1.0)
+            fadein = get("fadein")
+            fadeout = get("fadeout")
+            delay = get("delay")
+            every = get("every")
+            at = get("at")
+            layer = get("layer")
+            duck = get("duck")
+            bus = get("bus")
+            priority = get("priority", 0)
+            if at is not None:
+                at = _time_of_day(at)
+                at_ok = at is not None
+            else:
+                at_ok = True
+            if (
+                target >= 0
+                and type(loop) is bool
+                and type(step) is bool
+                and type(retain) is bool
+                and type(scale) in _NUMBERS
+                and scale > 0
+                and (fadein is None or (type(fadein) is int and fadein >= 0))
+                and (fadeout is None or (type(fadeout) is int and fadeout >= 0))
+                and (delay is None or (type(delay) is int and delay >= 0))
+                and (every is None or (type(every) is int and every > 0))
+                and at_ok
+                and (layer is None or type(layer) is str)
+                and (duck is None or (type(duck) in _NUMBERS and duck > 0))
+                and (bus is None or type(bus) is str)
+                and type(priority) is int
+            ):
+                type_names = names[type_]
+                return SceneObj(
+                    type_,
+                    id_,
+                    type_names[target] if type_names else sys.intern(payload),
+                    target,
+                    loop,
+                    step,
+                    retain,
+                    float(scale),
+                    fadein,
+                    fadeout,
+                    delay,
+                    every,
+                    at,
+                    layer if layer is None else sys.intern(layer),
+                    duck if duck is None else float(duck),
+                    bus if bus is None else sys.intern(bus),
+                    priority,
+                )
+    _collect_obj_issues(obj, scene_name, i, indices, issues)
+    return None
+
+
+def _collect_obj_issues(
+    obj: Any,
+    scene_name: str,
+    i: int,
+    indices: tuple[dict[str, int], dict[str, int], dict[str, int]],
+    issues: list[ValidationIssue],
+):
+    if not isinstance(obj, dict):
+        issues.append(
+            ValidationIssue(
+                json_pointer("scenes", scene_name, i),
+                "badtype",
+                f"Scene `{scene_name}` obj {i} is not an object.",
+            )
+        )
+        return
+
+    def issue(field: str, code: str, message: str):
+        issues.append(
+            ValidationIssue(
+                json_pointer("scenes", scene_name, i, field),
+                code,
+                f"Scene `{scene_name}` obj {i} {message}",
+            )
+        )
+
+    type_ = _OBJ_TYPES.get(obj.get("type"))
+    if "type" not in obj:
+        issue("type", "notype", "is missing a type.")
+    elif type_ is None:
+        issue("type", "badvalue", f"has an unknown type `{obj['type']}`.")
+    if not isinstance(obj.get("id"), str):
+        issue("id", "noid", "is missing an id.")
+    payload = obj.get("payload")
+    if not isinstance(payload, str):
+        issue("payload", "nopayload", "is missing a payload.")
+    elif type_ is not None and payload not in indices[type_]:
+        kind = ("sound", "scene", "art")[type_]
+        issue("payload", "unknown_ref", f"refers to an unknown {kind} `{payload}`.")
+    for field in _BOOL_FIELDS:
+        if field in obj and type(obj[field]) is not bool:
+            issue(field, "badtype", f"has an unexpected type for `{field}`.")
+    scale = obj.get("scale", 1.0)
+    if type(scale) not in (int, float) or scale <= 0:
+        issue("scale", "badvalue", "has a `scale` that is not a positive number.")
+    for field in _MS_FIELDS:
+        value = obj.get(field)
+        if value is not None and (type(value) is not int or value < 0):
+            issue(field, "badvalue", f"has a `{field}` that is not a duration in ms.")
+    every = obj.get("every")
+    if every is not None and (type(every) is not int or every <= 0):
+        issue("every", "badvalue", "has an `every` that is not a positive ms interval.")
+    if "at" in obj and _time_of_day(obj["at"]) is None:
+        issue("at", "badvalue", "has an `at` that is not a time of day (HH:MM:SS).")
+    if obj.get("layer") is not None and type(obj["layer"]) is not str:
+        issue("layer", "badtype", "has a `layer` that is not a layer name.")
+    duck = obj.get("duck")
+    if duck is not None and (type(duck) not in _NUMBERS or duck <= 0):
+        issue("duck", "badvalue", "has a `duck` that is not a positive dB amount.")
+    if obj.get("bus") is not None and type(obj["bus"]) is not str:
+        issue("bus", "badtype", "has a `bus` that is not a bus name.")
+    if "priority" in obj and type(obj["priority"]) is not int:
+        issue("priority", "badtype", "has a `priority` that is not an integer.")
+
+
+def _compile_scene(
+    scene_i: int,
+    scene_name: str,
+    scene_data: Any,
+    indices: tuple[dict[str, int], dict[str, int], dict[str, int]],
+    issues: list[ValidationIssue],
+    names: tuple[tuple[str, ...], tuple[str, ...], tuple[str, ...]],
+) -> Scene:
+    if not isinstance(scene_data, list):
+        issues.append(
+            ValidationIssue(
+                json_pointer("scenes", scene_name),
+                "badtype",
+                f"Scene `{scene_name}` must be a list of objects.",
+            )
+        )
+        scene_data = []
+    objects = (
+        _compile_obj(obj, scene_name, i, indices, issues, names)
+        for i, obj in enumerate(scene_data)
+    )
+    return Scene(scene_i, scene_name, tuple(obj for obj in objects if obj is not None))
+
+
+def compile_map(
+    data_map: types.ObjectMap | Mapping,
+    root: Optional[pathlib.Path] = None,
+    strict: bool = False,
+) -> CompiledMap:
+    """
+    Validates `data_map` in one pass and compiles it.
+
+    PARAMETERS
+    ----------
+    data_map
+        The parsed map.json.
+    root
+        The folder the map was loaded from. Defaults to `data_map["root"]`.
+    strict
+        Raise `MapValidationError` on any issue instead of dropping the
+        offending objects.
+
+    RETURNS
+    -------
+    -
+        The compiled map. Issues found are kept in `CompiledMap.issues`.
+    """
+    issues: list[ValidationIssue] = []
+    scenes_data = data_map.get("scenes")
+    if not isinstance(scenes_data, dict):
+        raise MapValidationError(
+            [
+                ValidationIssue(
+                    json_pointer("scenes"),
+                    "scenes_missing",
+                    "Sound Mapping is missing a `scenes` mapping.",
+                )
+            ]
+        )
+    sound_ids, sound_files, sound_index = _intern_ids(data_map, "soundIDs", issues)
+    art_ids, art_files, art_index = _intern_ids(data_map, "artIDs", issues)
+    scene_names = tuple(sys.intern(name) for name in scenes_data)
+    scene_index = {name: i for i, name in enumerate(scene_names)}
+    indices = (sound_index, scene_index, art_index)
+    names = (sound_ids, scene_names, art_ids)
+
+    scenes = [
+        _compile_scene(
+            scene_i, scene_names[scene_i], scene_data, indices, issues, names
+        )
+        for scene_i, scene_data in enumerate(scenes_data.values())
+    ]
+
+    options = data_map.get("globalOptions") or {}
+    if not isinstance(options, dict):
+        issues.append(
+            ValidationIssue(
+                json_pointer("globalOptions"),
+                "badtype",
+                "`globalOptions` must be a mapping.",
+            )
+        )
+        options = {}
+    if strict and issues:
+        raise MapValidationError(issues)
+    if root is None:
+        root = pathlib.Path(data_map.get("root", "."))
+    return CompiledMap(
+        root=pathlib.Path(root),
+        sound_ids=sound_ids,
+        sound_files=sound_files,
+        art_ids=art_ids,
+        art_files=art_files,
+        scenes=tuple(scenes),
+        sound_index=MappingProxyType(sound_index),
+        art_index=MappingProxyType(art_index),
+        scene_index=MappingProxyType(scene_index),
+        options=MappingProxyType(dict(options)),
+        issues=tuple(issues),
+    )
+
+
+def recompile_map(
+    data_map: types.ObjectMap | Mapping,
+    previous_data: Mapping,
+    previous: CompiledMap,
+) -> CompiledMap:
+    """
+    Compiles an edited version of a map, reusing the compiled scenes of
+    `previous` whose objects are unchanged. Only possible while the sound, art
+    and scene ids stay the same (so interned indices do not move); otherwise
+    the map is compiled from scratch.
+
+    PARAMETERS
+    ----------
+    data_map
+        The edited map.
+    previous_data
+        The map `previous` was compiled from.
+    previous
+        The compiled previous version.
+    """
+    scenes_data = data_map.get("scenes")
+    old_scenes_data = previous_data.get("scenes")
+    options = data_map.get("globalOptions") or {}
+    if (
+        not isinstance(scenes_data, dict)
+        or not isinstance(old_scenes_data, dict)
+        or not isinstance(options, dict)
+        or list(scenes_data) != list(old_scenes_data)
+        or data_map.get("soundIDs") != previous_data.get("soundIDs")
+        or data_map.get("artIDs") != previous_data.get("artIDs")
+    ):
+        return compile_map(data_map, previous.root)
+    indices = (
+        dict(previous.sound_index),
+        dict(previous.scene_index),
+        dict(previous.art_index),
+    )
+    names = (
+        previous.sound_ids,
+        tuple(scene.name for scene in previous.scenes),
+        previous.art_ids,
+    )
+    scenes = list(previous.scenes)
+    changed: list[str] = []
+    issues: list[ValidationIssue] = []
+    for scene_i, (name, scene_data) in enumerate(scenes_data.items()):
+        if scene_data != old_scenes_data[name]:
+            changed.append(json_pointer("scenes", name))
+            scenes[scene_i] = _compile_scene(
+                scene_i, scenes[scene_i].name, scene_data, indices, issues, names
+            )
+    kept = [
+        issue
+        for issue in previous.issues
+        if not any(
+            issue.location == prefix or issue.location.startswith(prefix + "/")
+            for prefix in changed
+        )
+    ]
+    return CompiledMap(
+        root=previous.root,
+        sound_ids=previous.sound_ids,
+        sound_files=previous.sound_files,
+        art_ids=previous.art_ids,
+        art_files=previous.art_files,
+        scenes=tuple(scenes),
+        sound_index=previous.sound_index,
+        art_index=previous.art_index,
+        scene_index=previous.scene_index,
+        options=MappingProxyType(dict(options)),
+        issues=tuple(kept + issues),
+    )
+
+
+def log_issues(issues: Iterable[ValidationIssue]):
+    issues = tuple(issues)
+    if issues:
+        logger.warning(
+            "Encountered the following errors in data_map: \n%s",
+            "\n".join(str(issue) for issue in issues),
+        )
+
+
+def validate_mapping(data_map: types.ObjectMap, update_map: bool = True):
+    """
+    Checks `data_map` and, if `update_map`, returns a copy of it without the
+    invalid scene objects. The input map is never modified.
+    """
+    compiled = compile_map(data_map)
+    log_issues(compiled.issues)
+    if not update_map:
+        return data_map
+    indices = (
+        dict(compiled.sound_index),
+        dict(compiled.scene_index),
+        dict(compiled.art_index),
+    )
+    scenes = {
+        scene: [
+            obj
+            for i, obj in enumerate(scene_data)
+            if _compile_obj(obj, scene, i, indices, []) is not None
+        ]
+        for scene, scene_data in data_map["scenes"].items()
+        if isinstance(scene_data, list)
+    }
+    return {**data_map, "scenes": scenes}
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Mapping, Optional
+
+    from .compiled import CompiledMap, Scene, SceneObj
+    from .scheduler import TimedEvent
+
+logger = get_default_logger(__name__)
+
+# The layer that `step()`, `play_scene()` and the window drive by default.
+MAIN_LAYER = "main"
+
+
+class Layer:
+    """
+    A cursor over the scene graph. Every layer steps, loops and runs the timed
+    objects of its scene on its own; all layers share the engine's players.
+
+    PARAMETERS
+    ----------
+    name
+        The layer's name, as used by `cue` objects and `globalOptions.layers`.
+    loop
+        Whether stepping past the end of a scene starts it over.
+    """
+
+    __slots__ = ("name", "scene", "idx", "loop", "timeline", "timeline_scene")
+
+    def __init__(self, name: str, loop: bool = False):
+        self.name = name
+        self.scene: Optional[Scene] = None
+        self.idx = 0
+        self.loop = loop
+        # Timed objects of `timeline_scene`, the scene that scheduled them.
+        self.timeline: list[TimedEvent] = []
+        self.timeline_scene: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.scene is not None
+
+    @property
+    def obj(self) -> SceneObj:
+        return self.scene[self.idx]
+
+    def __repr__(self) -> str:
+        where = f"{self.scene.name}[{self.idx}]" if self.scene else "idle"
+        return f"<Layer {self.name} {where}>"
+
+
+def layer_options(scene_map: CompiledMap) -> Mapping[str, Mapping]:
+    """
+    Returns the valid entries of `globalOptions.layers`, warning about the
+    rest.
+    """
+    layers = scene_map.options.get("layers") or {}
+    if not isinstance(layers, dict):
+        logger.warning("`globalOptions.layers` must be a mapping of name to options")
+        return {}
+    valid = {}
+    for name, options in layers.items():
+        if not isinstance(options, dict):
+            logger.warning("Options of layer `%s` must be a mapping", name)
+            continue
+        scene = options.get("scene")
+        if scene is not None and scene not in scene_map.scene_index:
+            logger.warning("Layer `%s` starts at an unknown scene `%s`", name, scene)
+            options = {k: v for k, v in options.items() if k != "scene"}
+        valid[name] = options
+    return valid
@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore, QtGui
+
+from ..utils import get_default_logger
+from .art import decode_art
+from .compiled import ObjType
+from .pcm import DecodeError
+from .probe import probe_image, probe_sound
+
+if TYPE_CHECKING:
+    from typing import Callable, Optional
+
+    from .compiled import Scene
+    from .sound_engine import SoundEngine
+
+logger = get_default_logger(__name__)
+
+PRIORITY_START = 1
+PRIORITY_REST = 0
+
+
+@dataclass
+class AssetTiming:
+    kind: str  # "sound" or "art"
+    asset_id: str
+    path: str
+    bytes: int = 0
+    probe_ms: float = 0.0
+    decode_ms: float = 0.0
+    total_ms: float = 0.0
+    needed_at_start: bool = False
+    info: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class TimingReport:
+    timings: list[AssetTiming] = field(default_factory=list)
+    workers: int = 0
+    start_ready_ms: Optional[float] = None
+    wall_ms: float = 0.0
+
+    def slowest(self, count: int = 10) -> list[AssetTiming]:
+        return sorted(self.timings, key=lambda t: t.total_ms, reverse=True)[:count]
+
+    def format_table(self, count: int = 10) -> str:
+        lines = [
+            f"Loaded {len(self.timings)} assets on {self.workers} workers in "
+            f"{self.wall_ms:.0f} ms (starting scene ready after "
+            f"{self.start_ready_ms or 0:.0f} ms). Slowest:",
+            f"{'kind':<6}{'id':<28}{'KiB':>9}{'probe':>9}{'decode':>9}{'total':>9}",
+        ]
+        for t in self.slowest(count):
+            lines.append(
+                f"{t.kind:<6}{t.asset_id[:27]:<28}{t.bytes / 1024:>9.0f}"
+                f"{t.probe_ms:>9.1f}{t.decode_ms:>9.1f}{t.total_ms:>9.1f}"
+                + (f"  ! {t.error}" if t.error else "")
+            )
+        return "\n".join(lines)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def export(self, path: pathlib.Path | str):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+def probe_art(path: pathlib.Path) -> dict:
+    info = probe_image(path)
+    if info["width"] >= 0:
+        return info
+    reader = QtGui.QImageReader(str(path))
+    size = reader.size()
+    return {
+        "format": bytes(reader.format()).decode() or path.suffix.lstrip("."),
+        "width": size.width(),
+        "height": size.height(),
+    }
+
+
+class _LoadSignals(QtCore.QObject):
+    loaded = QtCore.Signal(object, object)  # AssetTiming, decoded result
+
+
+class _LoadTask(QtCore.QRunnable):
+    def __init__(
+        self,
+        timing: AssetTiming,
+        decode: Optional[Callable[[pathlib.Path], object]],
+        signals: _LoadSignals,
+        probe: bool = True,
+    ):
+        super().__init__()
+        self.timing = timing
+        self.decode = decode
+        self.signals = signals
+        self.probe = probe
+
+    def run(self):
+        timing = self.timing
+        path = pathlib.Path(timing.path)
+        start = time.perf_counter()
+        result = None
+        try:
+            if self.probe:
+                timing.bytes = os.path.getsize(path)
+                timing.info.update(
+                    probe_sound(path) if timing.kind == "sound" else probe_art(path)
+                )
+            probed = time.perf_counter()
+            timing.probe_ms = (probed - start) * 1000
+            if self.decode is not None:
+                result = self.decode(path)
+                timing.decode_ms = (time.perf_counter() - probed) * 1000
+        except (OSError, DecodeError) as e:
+            timing.error = str(e)
+        except Exception as e:
+            # Reported like any other failure so the load still completes.
+            logger.exception("Could not load %s", path)
+            timing.error = f"{type(e).__name__}: {e}"
+        finally:
+            timing.total_ms = (time.perf_counter() - start) * 1000
+            self.signals.loaded.emit(timing, result)
+
+
+class AssetLoader(QtCore.QObject):
+    """
+    Probes the engine's assets on a thread pool sized to the machine's cores,
+    and decodes those reachable from the starting scene within the prefetch
+    window; the prefetcher decodes the rest on demand, so the library is never
+    held in memory whole.
+
+    The assets needed at start are queued first; `scene_ready` is emitted as
+    soon as those are done so the engine can start while the rest of the
+    library is still loading. Results are handed back to the engine on the
+    thread that owns the loader.
+    """
+
+    asset_loaded = QtCore.Signal(object)  # AssetTiming
+    scene_ready = QtCore.Signal(str)
+    finished = QtCore.Signal(object)  # TimingReport
+
+    def __init__(
+        self,
+        engine: SoundEngine,
+        workers: Optional[int] = None,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.engine = engine
+        self.thread_pool = QtCore.QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(workers or QtCore.QThread.idealThreadCount())
+        self.report = TimingReport(workers=self.thread_pool.maxThreadCount())
+        self._signals = _LoadSignals(self)
+        self._signals.loaded.connect(self._on_loaded)
+        # Decodes asked for by the prefetcher, outside the load report.
+        self._warm_signals = _LoadSignals(self)
+        self._warm_signals.loaded.connect(self._on_warmed)
+        self._warming: dict[str, Callable[[str], None]] = {}
+        self._outstanding = 0
+        self._start_remaining = 0
+        self._starting_scene = ""
+        self._started_at = 0.0
+
+    def start_assets(self, scene: Scene) -> tuple[set[str], set[tuple[str, float]]]:
+        """
+        Returns the sounds and (art, scale) pairs the engine needs first when
+        starting at `scene`.
+        """
+        sounds: set[str] = set()
+        art: set[tuple[str, float]] = set()
+        if not scene.objects:
+            return sounds, art
+        positions = [(scene, 0), *self.engine.prefetcher.upcoming(scene, 0)]
+        for scene_, idx in positions[: self.engine.prefetcher.depth + 1]:
+            obj = scene_[idx]
+            if obj.type is ObjType.SOUND:
+                sounds.add(obj.payload)
+            elif obj.type is ObjType.ART:
+                art.add((obj.payload, obj.scale))
+        return sounds, art
+
+    def load(self, starting_id: str):
+        scene_map = self.engine.scene_map
+        self._starting_scene = starting_id
+        self._started_at = time.perf_counter()
+        start_sounds, start_art = self.start_assets(scene_map.scene(starting_id))
+        decode_sound = self.engine.preload_decoder()
+        # A bundle already knows what probing would find out.
+        bundle = self.engine.bundle
+        for sound_id, file in zip(scene_map.sound_ids, scene_map.sound_files):
+            path = self.engine.sound_path / file
+            # Streamed sounds are only probed; they are never decoded whole.
+            streamed = self.engine.is_streamed(path)
+            decode = decode_sound if sound_id in start_sounds and not streamed else None
+            timing = AssetTiming(
+                "sound",
+                sound_id,
+                str(path),
+                needed_at_start=sound_id in start_sounds,
+                info={"streamed": True} if streamed else {},
+            )
+            entry = bundle.sounds.get(sound_id) if bundle is not None else None
+            if entry is not None:
+                timing.bytes = entry.size
+                timing.info.update(entry.info())
+            self._queue(timing, decode, entry is None)
+        target = self.engine.art_cache.target_size
+        start_art_ids = {art_id for art_id, _ in start_art}
+        for art_id in scene_map.art_ids:
+            timing = AssetTiming("art", art_id, str(self.engine.resolve_art(art_id)))
+            entry = bundle.art.get(art_id) if bundle is not None else None
+            if entry is not None:
+                timing.bytes = entry.size
+                timing.info.update(entry.info())
+            # Art not needed at start is only probed; the prefetcher decodes it
+            # on demand.
+            if art_id not in start_art_ids:
+                self._queue(timing, None, entry is None)
+        for art_id, scale in sorted(start_art):
+            source = self.engine.art_source(art_id)
+            entry = bundle.art.get(art_id) if bundle is not None else None
+            self._queue(
+                AssetTiming(
+                    "art",
+                    art_id,
+                    str(self.engine.resolve_art(art_id)),
+                    bytes=entry.size if entry is not None else 0,
+                    needed_at_start=True,
+                    info={
+                        **(entry.info() if entry is not None else {}),
+                        "scale": scale,
+                        "target": target,
+                    },
+                ),
+                lambda _, source=source, scale=scale: decode_art(source, scale, target),
+                entry is None,
+            )
+        if not self._start_remaining:
+            QtCore.QTimer.singleShot(0, self._emit_scene_ready)
+        if not self._outstanding:
+            QtCore.QTimer.singleShot(0, self._finish)
+
+    def _queue(
+        self,
+        timing: AssetTiming,
+        decode: Optional[Callable[[pathlib.Path], object]],
+        probe: bool = True,
+    ):
+        if timing.needed_at_start:
+            self._start_remaining += 1
+        self._outstanding += 1
+        self.thread_pool.start(
+            _LoadTask(timing, decode, self._signals, probe),
+            PRIORITY_START if timing.needed_at_start else PRIORITY_REST,
+        )
+
+    def warm_sound(self, sound_id: str, done: Callable[[str], None]) -> bool:
+        """
+        Decodes a sound the engine will need soon on the pool, ahead of the
+        rest of the library, and calls `done` with its id once the engine has
+        it. Returns False if it is already being decoded.
+        """
+        if sound_id in self._warming:
+            return False
+        decode = self.engine.preload_decoder()
+        if decode is None:
+            return False
+        self._warming[sound_id] = done
+        path = self.engine.sound_path / self.engine.scene_map.sound_file(sound_id)
+        self.thread_pool.start(
+            _LoadTask(
+                AssetTiming("sound", sound_id, str(path)),
+                decode,
+                self._warm_signals,
+                probe=False,
+            ),
+            PRIORITY_START,
+        )
+        return True
+
+    @QtCore.Slot(object, object)
+    def _on_warmed(self, timing: AssetTiming, result: object):
+        done = self._warming.pop(timing.asset_id)
+        if timing.error:
+            logger.warning("Failed to warm sound %s: %s", timing.asset_id, timing.error)
+            return
+        self.engine.accept_preloaded(timing, result)
+        done(timing.asset_id)
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started_at) * 1000
+
+    @QtCore.Slot(object, object)
+    def _on_loaded(self, timing: AssetTiming, result: object):
+        self._outstanding -= 1
+        self.report.timings.append(timing)
+        if timing.error:
+            logger.warning(
+                "Failed to load %s %s: %s", timing.kind, timing.asset_id, timing.error
+            )
+        elif result is not None:
+            self.engine.accept_preloaded(timing, result)
+        self.asset_loaded.emit(timing)
+        if timing.needed_at_start:
+            self._start_remaining -= 1
+            if not self._start_remaining:
+                self._emit_scene_ready()
+        if not self._outstanding:
+            self._finish()
+
+    def _emit_scene_ready(self):
+        self.report.start_ready_ms = self._elapsed_ms()
+        logger.info(
+            "Starting scene `%s` ready after %.0f ms",
+            self._starting_scene,
+            self.report.start_ready_ms,
+        )
+        self.scene_ready.emit(self._starting_scene)
+
+    def _finish(self):
+        self.report.wall_ms = self._elapsed_ms()
+        logger.info("%s", self.report.format_table())
+        self.finished.emit(self.report)
@@ -0,0 +1,687 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore, QtMultimedia
+
+from ..utils import get_default_logger
+from .automation import Automation, GainStage
+from .buses import MAIN_BUS
+from .pcm import (
+    DEFAULT_CHANNELS,
+    DEFAULT_SAMPLE_RATE,
+    DecodeError,
+    decode_pcm,
+    float_to_int16,
+    np,
+    require_numpy,
+)
+from .stream import DEFAULT_STREAM_BUFFER_MS, LOOP, StreamSource
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import Callable, Optional
+
+    from .stream import PcmReader
+
+logger = get_default_logger(__name__)
+
+DEFAULT_BLOCK_FRAMES = 512
+DEFAULT_LATENCY_MS = 40
+# The level players play at before any normalization gain.
+DEFAULT_VOLUME = 0.5
+
+
+class RampedGain:
+    """
+    A linear gain that can be moved smoothly, frame by frame, across blocks.
+    """
+
+    __slots__ = ("gain", "_ramp")
+
+    def __init__(self, gain: float = 1.0):
+        self.gain = gain
+        # (start gain, end gain, total frames, frames done, on_done)
+        self._ramp: Optional[tuple[float, float, int, int, Optional[Callable]]] = None
+
+    @property
+    def ramping(self) -> bool:
+        return self._ramp is not None
+
+    def ramp_to(
+        self, gain: float, frames: int, on_done: Optional[Callable[[], None]] = None
+    ):
+        """
+        Linearly moves the gain to `gain` over `frames` frames, then calls
+        `on_done`.
+        """
+        if frames <= 0:
+            self.gain = gain
+            self._ramp = None
+            if on_done is not None:
+                on_done()
+            return
+        self._ramp = (self.gain, gain, frames, 0, on_done)
+
+    def _gains(self, frames: int) -> tuple[float | np.ndarray, Optional[Callable]]:
+        """
+        Returns the gain (scalar or per-frame) for the next `frames` frames and
+        the ramp callback if the ramp finishes within them.
+        """
+        if self._ramp is None:
+            return self.gain, None
+        start, end, total, done, on_done = self._ramp
+        steps = np.arange(done + 1, done + frames + 1, dtype=np.float32)
+        gains = start + (end - start) * np.minimum(steps / total, 1.0)
+        done += frames
+        if done >= total:
+            self.gain = end
+            self._ramp = None
+            return gains, on_done
+        self.gain = float(gains[-1])
+        self._ramp = (start, end, total, done, on_done)
+        return gains, None
+
+
+class Voice(RampedGain):
+    """
+    One playing instance of a PCM buffer inside a `Mixer`.
+
+    PARAMETERS
+    ----------
+    pcm
+        float32 frames x channels, in the mixer's format.
+    gain
+        Linear gain applied to the voice.
+    loops
+        How many times to play the buffer; -1 loops forever.
+    stream
+        Pull audio from this `StreamSource` instead of `pcm`. The stream
+        handles looping itself.
+    bus
+        The bus the voice is mixed into; the mixer's main bus by default.
+    """
+
+    __slots__ = (
+        "pcm",
+        "position",
+        "loops",
+        "loop_count",
+        "active",
+        "on_end",
+        "on_loop",
+        "stream",
+        "bus",
+    )
+
+    def __init__(
+        self,
+        pcm: Optional[np.ndarray],
+        gain: float = 1.0,
+        loops: int = 1,
+        stream: Optional[StreamSource] = None,
+        bus: Optional[MixBus] = None,
+    ):
+        super().__init__(gain)
+        self.pcm = pcm
+        self.stream = stream
+        self.bus = bus
+        self.position = 0
+        self.loops = loops
+        self.loop_count = 0
+        self.active = True
+        # on_end(voice, frame), on_loop(voice, loop_count, frame); frames are
+        # mixer clock time
+        self.on_end: Optional[Callable[[Voice, int], None]] = None
+        self.on_loop: Optional[Callable[[Voice, int, int], None]] = None
+
+    @property
+    def frames(self) -> int:
+        if self.stream is not None:
+            return self.stream.frames
+        return len(self.pcm)
+
+
+class MixBus(RampedGain):
+    """
+    A group of voices mixed together before its gain is applied, once per
+    block for the whole group.
+    """
+
+    __slots__ = ("name", "voices", "block_frames")
+
+    def __init__(self, name: str, block_frames: int = DEFAULT_BLOCK_FRAMES):
+        super().__init__()
+        self.name = name
+        self.voices: list[Voice] = []
+        self.block_frames = block_frames
+
+    def set_level(self, gain: float):
+        """
+        Moves the bus gain to `gain` over one block, without a click.
+        """
+        self.ramp_to(gain, self.block_frames)
+
+
+class Mixer:
+    """
+    Mixes any number of voices into a single block of float32 PCM.
+
+    All voices share one clock (`clock`, in frames rendered), so loop and end
+    events are reported with the exact frame they happened at. Voices are
+    grouped into buses (see `bus`); each bus is summed first and then scaled
+    by its own gain.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        channels: int = DEFAULT_CHANNELS,
+        block_frames: int = DEFAULT_BLOCK_FRAMES,
+        gain: float = 1.0,
+    ):
+        require_numpy()
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self.gain = gain
+        self.clock = 0
+        # Block on streamed voices instead of underrunning; set when rendering
+        # faster than real time.
+        self.wait_for_streams = False
+        self.buses: dict[str, MixBus] = {}
+        self.main_bus = self.bus(MAIN_BUS)
+        self._callbacks: list[Callable[[], None]] = []
+        # Fades and ducking of the voices, on the mixer's clock.
+        self.automation = Automation(clock=lambda: self.time, timer=False)
+
+    @property
+    def time(self) -> float:
+        return self.clock / self.sample_rate
+
+    def frames_for_ms(self, ms: float) -> int:
+        return int(ms * self.sample_rate / 1000)
+
+    @property
+    def voices(self) -> list[Voice]:
+        return [voice for bus in self.buses.values() for voice in bus.voices]
+
+    def bus(self, name: str) -> MixBus:
+        """
+        Returns the bus `name`, creating it at unity gain if needed.
+        """
+        bus = self.buses.get(name)
+        if bus is None:
+            bus = self.buses[name] = MixBus(name, self.block_frames)
+        return bus
+
+    def play(self, voice: Voice):
+        voice.active = True
+        voices = (voice.bus or self.main_bus).voices
+        if voice not in voices:
+            voices.append(voice)
+
+    def stop(self, voice: Voice):
+        voice.active = False
+        voices = (voice.bus or self.main_bus).voices
+        if voice in voices:
+            voices.remove(voice)
+
+    def after_block(self, callback: Callable[[], None]):
+        """
+        Runs `callback` once the block being rendered has been mixed, along
+        with the voice callbacks.
+        """
+        self._callbacks.append(callback)
+
+    def render(self, frames: int) -> np.ndarray:
+        """
+        Renders the next `frames` frames of every active voice and advances the
+        clock. Automation is brought to the end of the block first, and voice
+        callbacks run after the block has been mixed.
+        """
+        if len(self.automation):
+            self.automation.tick(self.time + frames / self.sample_rate)
+        out = np.zeros((frames, self.channels), dtype=np.float32)
+        submix = None
+        for bus in self.buses.values():
+            if not bus.voices:
+                if bus.ramping:
+                    bus._gains(frames)
+                continue
+            gains, ramp_done = bus._gains(frames)
+            if ramp_done is not None:
+                self._callbacks.append(ramp_done)
+            unity = np.isscalar(gains) and gains == 1.0
+            if unity:
+                target = out
+            elif submix is None:
+                target = submix = np.zeros_like(out)
+            else:
+                target = submix
+                target.fill(0.0)
+            for voice in bus.voices:
+                self._mix_voice(voice, target, frames)
+            bus.voices = [voice for voice in bus.voices if voice.active]
+            if unity:
+                continue
+            if not np.isscalar(gains):
+                out += target * gains[:, None]
+            elif gains != 0.0:
+                out += target * gains
+        if self.gain != 1.0:
+            out *= self.gain
+        self.clock += frames
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+        return out
+
+    def _mix_voice(self, voice: Voice, out: np.ndarray, frames: int):
+        gains, ramp_done = voice._gains(frames)
+        if ramp_done is not None:
+            self._callbacks.append(ramp_done)
+        if voice.stream is not None:
+            self._mix_stream(voice, out, frames, gains)
+            return
+        per_frame = not np.isscalar(gains)
+        pcm = voice.pcm
+        written = 0
+        while written < frames and voice.active:
+            take = min(len(pcm) - voice.position, frames - written)
+            if take > 0:
+                segment = pcm[voice.position : voice.position + take]
+                if per_frame:
+                    out[written : written + take] += (
+                        segment * gains[written : written + take, None]
+                    )
+                elif gains == 1.0:
+                    out[written : written + take] += segment
+                elif gains != 0.0:
+                    out[written : written + take] += segment * gains
+                voice.position += take
+                written += take
+            if voice.position >= len(pcm):
+                frame = self.clock + written
+                if voice.loops < 0 or voice.loop_count + 1 < voice.loops:
+                    voice.loop_count += 1
+                    voice.position = 0
+                    if voice.on_loop is not None:
+                        self._callbacks.append(
+                            lambda v=voice, c=voice.loop_count, f=frame: v.on_loop(
+                                v, c, f
+                            )
+                        )
+                else:
+                    voice.active = False
+                    if voice.on_end is not None:
+                        self._callbacks.append(lambda v=voice, f=frame: v.on_end(v, f))
+            if len(pcm) == 0:
+                voice.active = False
+
+    def _mix_stream(
+        self, voice: Voice, out: np.ndarray, frames: int, gains: float | np.ndarray
+    ):
+        block, events = voice.stream.read(frames, self.wait_for_streams)
+        for offset, kind in events:
+            frame = self.clock + offset
+            if kind == LOOP:
+                voice.loop_count += 1
+                if voice.on_loop is not None:
+                    self._callbacks.append(
+                        lambda v=voice, c=voice.loop_count, f=frame: v.on_loop(v, c, f)
+                    )
+            else:
+                # Anything after the end is silence already.
+                voice.active = False
+                if voice.on_end is not None:
+                    self._callbacks.append(lambda v=voice, f=frame: v.on_end(v, f))
+        if np.isscalar(gains):
+            if gains != 0.0:
+                out += block if gains == 1.0 else block * gains
+        else:
+            out += block * gains[:, None]
+        voice.position = voice.stream.position
+
+
+class NullSink(QtCore.QObject):
+    """
+    Drives a `Mixer` without an audio device, either in real time from a timer
+    or manually through `pump`. Used for headless runs and tests.
+    """
+
+    def __init__(
+        self,
+        mixer: Mixer,
+        realtime: bool = True,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.mixer = mixer
+        self.realtime = realtime
+        self.latency_ms = 0.0
+        self._started_at: Optional[float] = None
+        self._start_clock = 0
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._catch_up)
+
+    def start(self):
+        if not self.realtime:
+            return
+        self._started_at = time.perf_counter()
+        self._start_clock = self.mixer.clock
+        block_ms = 1000 * self.mixer.block_frames / self.mixer.sample_rate
+        self._timer.start(max(1, int(block_ms)))
+
+    def stop(self):
+        self._timer.stop()
+
+    def pump(self, frames: int):
+        block = self.mixer.block_frames
+        while frames > 0:
+            self.mixer.render(min(block, frames))
+            frames -= block
+
+    def _catch_up(self):
+        elapsed = time.perf_counter() - self._started_at
+        due = int(elapsed * self.mixer.sample_rate) - (
+            self.mixer.clock - self._start_clock
+        )
+        if due >= self.mixer.block_frames:
+            self.pump(due - due % self.mixer.block_frames)
+
+
+class QtAudioSink(QtCore.QObject):
+    """
+    Feeds a `Mixer` into a single `QAudioSink` in push mode. The sink's buffer
+    is sized to `latency_ms`, which is the output latency of every sound.
+    """
+
+    def __init__(
+        self,
+        mixer: Mixer,
+        latency_ms: float = DEFAULT_LATENCY_MS,
+        device: Optional[QtMultimedia.QAudioDevice] = None,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.mixer = mixer
+        format_ = QtMultimedia.QAudioFormat()
+        format_.setSampleRate(mixer.sample_rate)
+        format_.setChannelCount(mixer.channels)
+        format_.setSampleFormat(QtMultimedia.QAudioFormat.SampleFormat.Int16)
+        self.format = format_
+        self.bytes_per_frame = format_.bytesPerFrame()
+        device = device or QtMultimedia.QMediaDevices.defaultAudioOutput()
+        self.sink = QtMultimedia.QAudioSink(device, format_, self)
+        self.sink.setBufferSize(mixer.frames_for_ms(latency_ms) * self.bytes_per_frame)
+        self._io: Optional[QtCore.QIODevice] = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._feed)
+        self._latency_ms = latency_ms
+
+    @property
+    def latency_ms(self) -> float:
+        buffer_size = self.sink.bufferSize()
+        if not buffer_size:
+            return self._latency_ms
+        return 1000 * buffer_size / self.bytes_per_frame / self.mixer.sample_rate
+
+    def start(self):
+        self._io = self.sink.start()
+        self._feed()
+        self._timer.start(max(1, int(self._latency_ms / 4)))
+
+    def stop(self):
+        self._timer.stop()
+        self.sink.stop()
+        self._io = None
+
+    def _feed(self):
+        if self._io is None:
+            return
+        block = self.mixer.block_frames
+        frames = self.sink.bytesFree() // self.bytes_per_frame
+        frames -= frames % block
+        if frames > 0:
+            self._io.write(float_to_int16(self.mixer.render(frames)))
+
+
+class MixerPlayer(QtCore.QObject):
+    """
+    A `SoundPlayer` replacement that plays through a shared `Mixer` instead of
+    its own `QAudioOutput`.
+
+    Given `open_stream`, the sound is not decoded up front; every play streams
+    it from a fresh reader through a constant-size ring buffer instead. Its
+    length is then `frames` (in mixer frames), e.g. from the probe or the
+    bundle, or read from the stream's header if None.
+
+    Fades are ramps on the mixer's `Automation`, which moves the voice's gain
+    smoothly across each block; a stop with a fade-out keeps playing until the
+    fade has finished. Every play starts `start_ms` into the sound, e.g. past
+    its leading silence; loops wrap to the very start.
+    """
+
+    mediaStatusChanged = QtCore.Signal(QtMultimedia.QMediaPlayer.MediaStatus)
+    playbackStateChanged = QtCore.Signal(QtMultimedia.QMediaPlayer.PlaybackState)
+    positionChanged = QtCore.Signal(int)
+    # loop count, time of the wrap (ms on the mixer clock)
+    looped = QtCore.Signal(int, float)
+
+    def __init__(
+        self,
+        mixer: Mixer,
+        sound_path: pathlib.Path,
+        parent: Optional[QtCore.QObject] = None,
+        fadein: Optional[int] = None,
+        fadeout: Optional[int] = None,
+        volume: float = DEFAULT_VOLUME,
+        decoder: Callable[[pathlib.Path, int, int], np.ndarray] = decode_pcm,
+        open_stream: Optional[Callable[[], PcmReader]] = None,
+        stream_buffer_ms: float = DEFAULT_STREAM_BUFFER_MS,
+        frames: Optional[int] = None,
+    ):
+        super().__init__(parent)
+        self.mixer = mixer
+        self.open_stream = open_stream
+        self.stream_buffer_ms = stream_buffer_ms
+        self._frames = 0
+        self.gain = GainStage(mixer.automation, self._apply_gain, volume)
+        self.start_ms = 0.0
+        # The bus the next play is mixed into; the mixer's main bus if None.
+        self.bus: Optional[MixBus] = None
+        self.fadeinT = fadein
+        self.fadeoutT = fadeout
+        self._loops = 1
+        self._stopping = False
+        self._voice: Optional[Voice] = None
+        self._state = QtMultimedia.QMediaPlayer.PlaybackState.StoppedState
+        try:
+            if open_stream is not None:
+                self.pcm = None
+                if frames is None:
+                    reader = open_stream()
+                    frames = reader.frames * mixer.sample_rate // reader.sample_rate
+                    reader.close()
+                self._frames = frames
+            else:
+                self.pcm = decoder(sound_path, mixer.sample_rate, mixer.channels)
+                self._frames = len(self.pcm)
+            self._status = QtMultimedia.QMediaPlayer.MediaStatus.LoadedMedia
+        except (DecodeError, OSError, ValueError) as e:
+            logger.error("Could not load %s: %s", sound_path, e)
+            self.pcm = np.zeros((0, mixer.channels), dtype=np.float32)
+            self._status = QtMultimedia.QMediaPlayer.MediaStatus.InvalidMedia
+
+    def mediaStatus(self) -> QtMultimedia.QMediaPlayer.MediaStatus:
+        return self._status
+
+    def playbackState(self) -> QtMultimedia.QMediaPlayer.PlaybackState:
+        return self._state
+
+    def setLoops(self, loops: int):
+        self._loops = int(loops)
+
+    def loops(self) -> int:
+        return self._loops
+
+    @property
+    def volume(self) -> float:
+        return self.gain.volume
+
+    def setVolume(self, volume: float):
+        self.gain.set_volume(volume)
+
+    def _apply_gain(self, level: float):
+        voice = self._voice
+        if voice is not None:
+            voice.ramp_to(level, self.mixer.block_frames)
+
+    @property
+    def streaming(self) -> bool:
+        return self.open_stream is not None
+
+    def memory_bytes(self) -> int:
+        """
+        The audio memory held by this player: the decoded sound, or the
+        stream's fixed buffers while it plays.
+        """
+        if not self.streaming:
+            return self.pcm.nbytes
+        if self._voice is None:
+            return 0
+        return self._voice.stream.memory_bytes
+
+    def duration(self) -> int:
+        return 1000 * self._frames // self.mixer.sample_rate
+
+    def position(self) -> int:
+        if self._voice is None:
+            return 0
+        return 1000 * self._voice.position // self.mixer.sample_rate
+
+    def play(self, fade_ms: Optional[int] = None):
+        """
+        Plays the sound from the start, fading in over `fade_ms` (or the
+        player's fade-in).
+        """
+        if self._status == QtMultimedia.QMediaPlayer.MediaStatus.InvalidMedia:
+            return
+        if self._voice is not None:
+            self._release(self._voice)
+        start = min(self.mixer.frames_for_ms(self.start_ms), self._frames)
+        if self.streaming:
+            stream = StreamSource(
+                self.open_stream(),
+                self.mixer.sample_rate,
+                self.mixer.channels,
+                loops=self._loops,
+                buffer_frames=self.mixer.frames_for_ms(self.stream_buffer_ms),
+            )
+            if start:
+                stream.seek(start)
+            stream.start()
+            voice = Voice(None, stream=stream, loops=self._loops, bus=self.bus)
+        else:
+            voice = Voice(self.pcm, loops=self._loops, bus=self.bus)
+            voice.position = start
+        voice.on_loop = self._on_loop
+        voice.on_end = self._on_end
+        fade_ms = self.fadeinT if fade_ms is None else fade_ms
+        self._voice = voice
+        self._stopping = False
+        if fade_ms:
+            self.gain.fade_to(1.0, fade_ms, start=0.0)
+        else:
+            self.gain.fade_to(1.0, 0)
+        # Starts at the level itself rather than ramping to it.
+        voice.ramp_to(self.gain.level, 0)
+        self.mixer.play(voice)
+        self._set_state(QtMultimedia.QMediaPlayer.PlaybackState.PlayingState)
+        self._set_status(QtMultimedia.QMediaPlayer.MediaStatus.BufferedMedia)
+
+    def stop(self, fade_ms: Optional[int] = None):
+        """
+        Stops the sound after fading it out over `fade_ms` (or the player's
+        fade-out). It keeps playing, and counts as active, until then.
+        """
+        voice = self._voice
+        if voice is None:
+            return
+        fade_ms = self.fadeoutT if fade_ms is None else fade_ms
+        if fade_ms and voice.active:
+            if not self._stopping:
+                self._stopping = True
+                # The fade ends with the block it is ticked for; the voice
+                # stops once that block has been mixed.
+                self.gain.fade_to(
+                    0.0,
+                    fade_ms,
+                    lambda: self.mixer.after_block(lambda: self._stop_voice(voice)),
+                )
+        else:
+            self.gain.stop_fade()
+            self._stop_voice(voice)
+
+    def setPosition(self, position: int):
+        voice = self._voice
+        if voice is None:
+            return
+        frame = min(self.mixer.frames_for_ms(position), self._frames)
+        if voice.stream is not None:
+            voice.stream.seek(frame)
+        else:
+            voice.position = frame
+
+    def _release(self, voice: Voice):
+        self.mixer.stop(voice)
+        if voice.stream is not None:
+            voice.stream.close()
+
+    def _stop_voice(self, voice: Voice):
+        self._release(voice)
+        if voice is not self._voice:
+            return
+        self._stopping = False
+        self._voice = None
+        self._set_state(QtMultimedia.QMediaPlayer.PlaybackState.StoppedState)
+        self._set_status(QtMultimedia.QMediaPlayer.MediaStatus.LoadedMedia)
+
+    def dispose(self):
+        self.gain.cancel()
+        if self._voice is not None:
+            self._release(self._voice)
+            self._voice = None
+        self.deleteLater()
+
+    def _on_loop(self, voice: Voice, loop_count: int, frame: int):
+        if voice is not self._voice:
+            return
+        self.looped.emit(loop_count, 1000 * frame / self.mixer.sample_rate)
+        self.positionChanged.emit(0)
+
+    def _on_end(self, voice: Voice, frame: int):
+        # Callbacks run after the block is mixed, so this may be a voice the
+        # player has since stopped or replaced.
+        self._release(voice)
+        if voice is not self._voice:
+            return
+        self.gain.stop_fade()
+        self._stopping = False
+        self._voice = None
+        self._set_state(QtMultimedia.QMediaPlayer.PlaybackState.StoppedState)
+        self._set_status(QtMultimedia.QMediaPlayer.MediaStatus.EndOfMedia)
+
+    def _set_state(self, state: QtMultimedia.QMediaPlayer.PlaybackState):
+        if state != self._state:
+            self._state = state
+            self.playbackStateChanged.emit(state)
+
+    def _set_status(self, status: QtMultimedia.QMediaPlayer.MediaStatus):
+        if status != self._status:
+            self._status = status
+            self.mediaStatusChanged.emit(status)
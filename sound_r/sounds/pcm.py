@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import functools
+import pathlib
+import wave
+from collections import deque
+from typing import TYPE_CHECKING
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the mixing backends
+    np = None
+
+from ..utils import get_default_logger
+from .probe import is_wav
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+logger = get_default_logger(__name__)
+
+DEFAULT_SAMPLE_RATE = 48000
+DEFAULT_CHANNELS = 2
+DECODE_TIMEOUT_MS = 120_000
+
+
+class DecodeError(RuntimeError):
+    pass
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError(
+            "numpy is required for the mixer backend. "
+            "Install it with `poetry install -E mixer`."
+        )
+
+
+def convert_channels(pcm: np.ndarray, channels: int) -> np.ndarray:
+    """
+    Up- or down-mixes `pcm` (frames x channels) to `channels` channels.
+    """
+    have = pcm.shape[1]
+    if have == channels:
+        return pcm
+    if have == 1:
+        return np.repeat(pcm, channels, axis=1)
+    if channels == 1:
+        return pcm.mean(axis=1, keepdims=True, dtype=np.float32)
+    if have > channels:
+        return np.ascontiguousarray(pcm[:, :channels])
+    return np.concatenate(
+        [pcm, np.repeat(pcm[:, -1:], channels - have, axis=1)], axis=1
+    )
+
+
+def resample(pcm: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resamples `pcm` (frames x channels) with linear interpolation.
+    """
+    if rate == target_rate or len(pcm) == 0:
+        return pcm
+    frames = int(round(len(pcm) * target_rate / rate))
+    src = np.arange(len(pcm), dtype=np.float64)
+    dst = np.linspace(0, len(pcm) - 1, frames, dtype=np.float64)
+    out = np.empty((frames, pcm.shape[1]), dtype=np.float32)
+    for channel in range(pcm.shape[1]):
+        out[:, channel] = np.interp(dst, src, pcm[:, channel])
+    return out
+
+
+def normalize(
+    pcm: np.ndarray, rate: int, sample_rate: int, channels: int
+) -> np.ndarray:
+    pcm = resample(convert_channels(pcm, channels), rate, sample_rate)
+    return np.ascontiguousarray(pcm, dtype=np.float32)
+
+
+def int_to_float(raw: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """
+    Converts interleaved little-endian integer PCM to float32 frames.
+    """
+    match sample_width:
+        case 1:
+            data = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) / 128
+        case 2:
+            data = np.frombuffer(raw, "<i2").astype(np.float32) / 32768
+        case 3:
+            bytes_ = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+            ints = bytes_[:, 0] | (bytes_[:, 1] << 8) | (bytes_[:, 2] << 16)
+            ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+            data = ints.astype(np.float32) / 8388608
+        case 4:
+            data = np.frombuffer(raw, "<i4").astype(np.float32) / 2147483648
+        case _:
+            raise DecodeError(f"Unsupported sample width: {sample_width}")
+    return data.reshape(-1, channels)
+
+
+def float_to_int16(pcm: np.ndarray) -> bytes:
+    return (np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+class WavReader:
+    """
+    Sequential, seekable reader of integer PCM WAV files.
+    """
+
+    def __init__(self, path: pathlib.Path | str):
+        self.path = path
+        self._wave = wave.open(str(path), "rb")
+        self.channels = self._wave.getnchannels()
+        self.sample_rate = self._wave.getframerate()
+        self.sample_width = self._wave.getsampwidth()
+        self.frames = self._wave.getnframes()
+
+    def read(self, frames: int) -> np.ndarray:
+        raw = self._wave.readframes(frames)
+        try:
+            return int_to_float(raw, self.sample_width, self.channels)
+        except ValueError as e:
+            # E.g. a file truncated mid-frame.
+            raise DecodeError(f"Malformed PCM data in {self.path}: {e}") from e
+
+    def seek(self, frame: int):
+        self._wave.setpos(frame)
+
+    def tell(self) -> int:
+        return self._wave.tell()
+
+    def close(self):
+        self._wave.close()
+
+
+def _decode_wav(path: pathlib.Path) -> tuple[np.ndarray, int]:
+    reader = WavReader(path)
+    try:
+        return reader.read(reader.frames), reader.sample_rate
+    finally:
+        reader.close()
+
+
+def _buffer_to_array(buffer) -> tuple[np.ndarray, int]:
+    from PySide6 import QtMultimedia
+
+    format_ = buffer.format()
+    channels = format_.channelCount()
+    raw = bytes(buffer.constData())
+    match format_.sampleFormat():
+        case QtMultimedia.QAudioFormat.SampleFormat.Float:
+            data = np.frombuffer(raw, "<f4").reshape(-1, channels)
+        case QtMultimedia.QAudioFormat.SampleFormat.Int16:
+            data = int_to_float(raw, 2, channels)
+        case QtMultimedia.QAudioFormat.SampleFormat.Int32:
+            data = int_to_float(raw, 4, channels)
+        case QtMultimedia.QAudioFormat.SampleFormat.UInt8:
+            data = int_to_float(raw, 1, channels)
+        case sample_format:
+            raise DecodeError(f"Unsupported decoder sample format: {sample_format}")
+    return data, format_.sampleRate()
+
+
+def _new_qt_decoder(path: pathlib.Path, sample_rate: int, channels: int):
+    from PySide6 import QtCore, QtMultimedia
+
+    decoder = QtMultimedia.QAudioDecoder()
+    format_ = QtMultimedia.QAudioFormat()
+    format_.setSampleRate(sample_rate)
+    format_.setChannelCount(channels)
+    format_.setSampleFormat(QtMultimedia.QAudioFormat.SampleFormat.Float)
+    decoder.setAudioFormat(format_)
+    decoder.setSource(QtCore.QUrl.fromLocalFile(str(path)))
+    return decoder
+
+
+def _decoder_failed(decoder) -> bool:
+    from PySide6 import QtMultimedia
+
+    return decoder.error() != QtMultimedia.QAudioDecoder.Error.NoError
+
+
+def _decode_with_qt(
+    path: pathlib.Path, sample_rate: int, channels: int
+) -> tuple[np.ndarray, int]:
+    # Needs a Qt(Core)Application; runs a local event loop so it can be used
+    # from worker threads as well.
+    from PySide6 import QtCore
+
+    decoder = _new_qt_decoder(path, sample_rate, channels)
+    chunks: list[np.ndarray] = []
+    rates: set[int] = set()
+    loop = QtCore.QEventLoop()
+
+    def on_buffer():
+        data, rate = _buffer_to_array(decoder.read())
+        chunks.append(convert_channels(data, channels))
+        rates.add(rate)
+
+    decoder.bufferReady.connect(on_buffer)
+    decoder.finished.connect(loop.quit)
+    decoder.isDecodingChanged.connect(lambda decoding: decoding or loop.quit())
+    QtCore.QTimer.singleShot(DECODE_TIMEOUT_MS, loop.quit)
+    decoder.start()
+    if decoder.isDecoding():
+        loop.exec()
+    decoder.stop()
+    if _decoder_failed(decoder):
+        raise DecodeError(f"Could not decode {path}: {decoder.errorString()}")
+    if not chunks:
+        raise DecodeError(f"Could not decode {path}: no audio produced")
+    rate = rates.pop() if len(rates) == 1 else sample_rate
+    return np.concatenate(chunks), rate
+
+
+@functools.lru_cache(maxsize=256)
+def _qt_duration_ms(path: str, size: int, mtime_ns: int) -> float:
+    # Keyed by size and mtime too, so an edited file is probed again.
+    from PySide6 import QtCore
+
+    decoder = _new_qt_decoder(pathlib.Path(path), DEFAULT_SAMPLE_RATE, DEFAULT_CHANNELS)
+    loop = QtCore.QEventLoop()
+    decoder.durationChanged.connect(lambda duration: duration > 0 and loop.quit())
+    decoder.bufferReady.connect(loop.quit)
+    decoder.isDecodingChanged.connect(lambda decoding: decoding or loop.quit())
+    QtCore.QTimer.singleShot(DECODE_TIMEOUT_MS, loop.quit)
+    decoder.start()
+    if decoder.isDecoding() and decoder.duration() <= 0:
+        loop.exec()
+    duration = decoder.duration()
+    decoder.stop()
+    if _decoder_failed(decoder):
+        raise DecodeError(f"Could not decode {path}: {decoder.errorString()}")
+    if duration <= 0:
+        logger.warning("Could not read the length of %s", path)
+    return max(duration, 0)
+
+
+class QtDecoderReader:
+    """
+    Sequential reader of any file `QAudioDecoder` can decode, so formats other
+    than WAV can be streamed too. It decodes straight to the mixer's rate and
+    channels, a buffer at a time: the decoder only produces its next buffer
+    once the last one was read, so memory stays at about one `read` however
+    long the file is.
+
+    The decoder is created, and driven by a local event loop, on the thread
+    that first reads; every later `read` and `seek` must come from that thread.
+    `seek` restarts decoding and skips up to the frame, so only seeking to the
+    start is cheap.
+    """
+
+    def __init__(
+        self,
+        path: pathlib.Path | str,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        channels: int = DEFAULT_CHANNELS,
+    ):
+        self.path = pathlib.Path(path)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        stat = self.path.stat()
+        duration_ms = _qt_duration_ms(str(self.path), stat.st_size, stat.st_mtime_ns)
+        self.frames = round(duration_ms * sample_rate / 1000)
+        self._decoder = None
+        self._loop = None
+        self._timer = None
+        self._chunks: deque[np.ndarray] = deque()
+        self._buffered = 0
+        self._received = 0  # buffers, including those skipped
+        self._skip = 0
+        self._position = 0
+        self._done = False
+
+    def _start(self):
+        from PySide6 import QtCore
+
+        decoder = _new_qt_decoder(self.path, self.sample_rate, self.channels)
+        decoder.bufferReady.connect(self._on_buffer)
+        decoder.finished.connect(self._on_finished)
+        decoder.isDecodingChanged.connect(
+            lambda decoding: decoding or self._on_finished()
+        )
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(DECODE_TIMEOUT_MS)
+        self._decoder = decoder
+        self._done = False
+        decoder.start()
+
+    def _stop(self):
+        if self._decoder is not None:
+            self._decoder.stop()
+        self._decoder = self._timer = None
+        self._chunks.clear()
+        self._buffered = 0
+
+    def _on_buffer(self):
+        self._received += 1
+        data, _ = _buffer_to_array(self._decoder.read())
+        data = convert_channels(data, self.channels)
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            data = data[skipped:]
+        if len(data):
+            self._chunks.append(data)
+            self._buffered += len(data)
+        if self._loop is not None:
+            self._loop.quit()
+
+    def _on_finished(self):
+        self._done = True
+        if self._loop is not None:
+            self._loop.quit()
+
+    def _wait(self):
+        from PySide6 import QtCore
+
+        received = self._received
+        self._loop = QtCore.QEventLoop()
+        self._timer.timeout.connect(self._loop.quit)
+        self._timer.start()
+        try:
+            self._loop.exec()
+        finally:
+            self._timer.stop()
+            self._timer.timeout.disconnect(self._loop.quit)
+            self._loop = None
+        if self._received == received and not self._done:
+            raise DecodeError(f"Timed out decoding {self.path}")
+
+    def read(self, frames: int) -> np.ndarray:
+        if self._decoder is None:
+            self._start()
+        while self._buffered < frames and not self._done:
+            self._wait()
+        if _decoder_failed(self._decoder):
+            raise DecodeError(
+                f"Could not decode {self.path}: {self._decoder.errorString()}"
+            )
+        parts = []
+        needed = min(frames, self._buffered)
+        while needed:
+            chunk = self._chunks.popleft()
+            if len(chunk) > needed:
+                self._chunks.appendleft(chunk[needed:])
+                chunk = chunk[:needed]
+            parts.append(chunk)
+            needed -= len(chunk)
+        count = sum(len(part) for part in parts)
+        self._buffered -= count
+        self._position += count
+        if not parts:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def seek(self, frame: int):
+        self._stop()
+        self._skip = self._position = frame
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self):
+        self._stop()
+
+
+def decode_pcm(
+    path: pathlib.Path | str,
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    channels: int = DEFAULT_CHANNELS,
+    reader: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Decodes an audio file to float32 PCM.
+
+    PARAMETERS
+    ----------
+    path
+        The file to decode.
+    sample_rate
+        The sample rate to resample the audio to.
+    channels
+        The number of channels to mix the audio to.
+    reader
+        Force "wav" or "qt" decoding. By default integer PCM WAV files are read
+        directly and everything else goes through `QAudioDecoder`.
+
+    RETURNS
+    -------
+    -
+        A C-contiguous float32 array of shape (frames, channels).
+    """
+    require_numpy()
+    path = pathlib.Path(path)
+    if reader is None:
+        reader = "wav" if is_wav(path) else "qt"
+    if reader == "wav":
+        try:
+            pcm, rate = _decode_wav(path)
+        except (wave.Error, EOFError, DecodeError) as e:
+            logger.debug("Falling back to QAudioDecoder for %s: %s", path, e)
+            pcm, rate = _decode_with_qt(path, sample_rate, channels)
+    else:
+        pcm, rate = _decode_with_qt(path, sample_rate, channels)
+    return normalize(pcm, rate, sample_rate, channels)
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from ..utils import cache_dir, get_default_logger, progress_bar
+from .pcm import decode_pcm, np, require_numpy
+
+if TYPE_CHECKING:
+    from typing import Callable, Iterable, Optional
+
+    from .compiled import CompiledMap
+
+logger = get_default_logger(__name__)
+
+# Bump when decoding or resampling changes so stale PCM is not reused.
+DECODER_VERSION = 1
+INDEX_VERSION = 1
+DEFAULT_PCM_CACHE_MB = 2048
+HASH_CHUNK = 1024 * 1024
+
+
+def file_hash(path: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class PcmCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    hashed: int = 0
+    bytes: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class PcmCache:
+    """
+    An on-disk cache of decoded PCM, stored as .npy files next to the map and
+    memory-mapped on load.
+
+    Entries are keyed by the SHA-256 of the source file together with the decode
+    parameters, so renaming a file keeps its cache entry and editing it does
+    not. Content hashes are remembered per (path, size, mtime) so a warm start
+    neither decodes nor re-reads the source files. The cache is kept under
+    `max_bytes` by evicting the least recently used entries. Changes to the
+    index are kept in memory until `flush`, so storing many entries writes it
+    once.
+
+    PARAMETERS
+    ----------
+    root
+        The folder the map was loaded from.
+    max_bytes
+        The maximum total size of cached PCM.
+    """
+
+    def __init__(
+        self,
+        root: pathlib.Path,
+        max_bytes: int = DEFAULT_PCM_CACHE_MB * 1024 * 1024,
+    ):
+        require_numpy()
+        self.dir = cache_dir(root) / "pcm"
+        self.index_path = self.dir / "index.json"
+        self.max_bytes = max_bytes
+        self.stats = PcmCacheStats()
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._entries: dict[str, dict] = {}
+        self._hashes: dict[str, list] = {}
+        self._load_index()
+        # The limit may have been lowered since the cache was written.
+        with self._lock:
+            self._evict()
+
+    def _load_index(self):
+        try:
+            with self.index_path.open() as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable PCM cache index: %s", e)
+            return
+        if index.get("version") != INDEX_VERSION:
+            return
+        self._entries = index.get("entries", {})
+        self._hashes = index.get("hashes", {})
+        self.stats.bytes = sum(entry["bytes"] for entry in self._entries.values())
+
+    def flush(self):
+        """
+        Writes the index to disk if it changed.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self.dir.mkdir(parents=True, exist_ok=True)
+            index = {
+                "version": INDEX_VERSION,
+                "entries": self._entries,
+                "hashes": self._hashes,
+            }
+            fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp, self.index_path)
+            self._dirty = False
+
+    def content_hash(self, path: pathlib.Path) -> str:
+        path = pathlib.Path(path).resolve()
+        stat = path.stat()
+        signature = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            known = self._hashes.get(str(path))
+        if known is not None and known[:2] == signature:
+            return known[2]
+        digest = file_hash(path)
+        with self._lock:
+            self._hashes[str(path)] = signature + [digest]
+            self.stats.hashed += 1
+            self._dirty = True
+        return digest
+
+    def key(self, path: pathlib.Path, sample_rate: int, channels: int) -> str:
+        return (
+            f"{self.content_hash(path)}-{sample_rate}hz-{channels}ch"
+            f"-v{DECODER_VERSION}"
+        )
+
+    def load(
+        self, path: pathlib.Path, sample_rate: int, channels: int
+    ) -> Optional[np.ndarray]:
+        """
+        Returns the cached PCM for `path` as a read-only memory map, or None.
+        """
+        key = self.key(path, sample_rate, channels)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+        try:
+            pcm = np.load(self.dir / entry["file"], mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning("Dropping unreadable PCM cache entry %s: %s", key, e)
+            with self._lock:
+                self._drop(key)
+                self.stats.misses += 1
+            return None
+        with self._lock:
+            entry["last_used"] = time.time()
+            self.stats.hits += 1
+            self._dirty = True
+        return pcm
+
+    def store(
+        self, path: pathlib.Path, sample_rate: int, channels: int, pcm: np.ndarray
+    ) -> np.ndarray:
+        """
+        Writes `pcm` to the cache and returns it memory-mapped from there.
+        """
+        key = self.key(path, sample_rate, channels)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        file = f"{key}.npy"
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".npy.tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(pcm, dtype=np.float32))
+        os.replace(tmp, self.dir / file)
+        size = (self.dir / file).stat().st_size
+        with self._lock:
+            if key in self._entries:
+                self.stats.bytes -= self._entries[key]["bytes"]
+            self._entries[key] = {
+                "file": file,
+                "bytes": size,
+                "last_used": time.time(),
+                "source": str(path),
+            }
+            self.stats.bytes += size
+            self.stats.stores += 1
+            self._dirty = True
+            self._evict(keep=key)
+        return np.load(self.dir / file, mmap_mode="r")
+
+    def get_or_decode(
+        self,
+        path: pathlib.Path,
+        sample_rate: int,
+        channels: int,
+        decode: Callable[..., np.ndarray] = decode_pcm,
+    ) -> np.ndarray:
+        pcm = self.load(path, sample_rate, channels)
+        if pcm is None:
+            pcm = self.store(
+                path, sample_rate, channels, decode(path, sample_rate, channels)
+            )
+        return pcm
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.stats.bytes -= entry["bytes"]
+        self._dirty = True
+        try:
+            (self.dir / entry["file"]).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Windows refuses to delete files that are still memory-mapped.
+            logger.debug("Could not remove %s: %s", entry["file"], e)
+
+    def _evict(self, keep: Optional[str] = None):
+        if self.stats.bytes <= self.max_bytes:
+            return
+        by_age = sorted(self._entries, key=lambda k: self._entries[k]["last_used"])
+        for key in by_age:
+            if self.stats.bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._drop(key)
+            self.stats.evictions += 1
+
+    def prune(self, keep_sources: Iterable[pathlib.Path]):
+        """
+        Forgets remembered hashes of files that are no longer in the map.
+        """
+        keep = {str(pathlib.Path(path).resolve()) for path in keep_sources}
+        with self._lock:
+            for path in [path for path in self._hashes if path not in keep]:
+                del self._hashes[path]
+                self._dirty = True
+
+
+def warm_cache(
+    scene_map: CompiledMap,
+    max_bytes: Optional[int] = None,
+    progress: bool = True,
+) -> PcmCache:
+    """
+    Decodes every sound of `scene_map` into the PCM cache ahead of time.
+    """
+    from .pcm import DEFAULT_CHANNELS, DEFAULT_SAMPLE_RATE
+
+    options = scene_map.options
+    if max_bytes is None:
+        max_bytes = int(options.get("pcmCacheMB", DEFAULT_PCM_CACHE_MB) * 1024 * 1024)
+    sample_rate = options.get("sampleRate", DEFAULT_SAMPLE_RATE)
+    channels = options.get("channels", DEFAULT_CHANNELS)
+    cache = PcmCache(scene_map.root, max_bytes)
+    paths = [scene_map.root / "sounds" / file for file in scene_map.sound_files]
+    if progress:
+        paths = progress_bar(paths, desc="Warming PCM cache", unit="sound")
+    for path in paths:
+        try:
+            cache.get_or_decode(path, sample_rate, channels)
+        except Exception as e:
+            logger.error("Could not cache %s: %s", path, e)
+    cache.prune(scene_map.root / "sounds" / file for file in scene_map.sound_files)
+    cache.flush()
+    logger.info(
+        "PCM cache: %d hits, %d decoded, %.1f MB",
+        cache.stats.hits,
+        cache.stats.stores,
+        cache.stats.bytes / 1024 / 1024,
+    )
+    return cache
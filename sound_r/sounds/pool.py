@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Callable, Generic, Hashable, TypeVar
+
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Iterator, Optional
+
+logger = get_default_logger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+P = TypeVar("P")
+
+DEFAULT_POOL_CAPACITY = 32
+
+
+@dataclass
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    overflows: int = 0  # created while every live player was busy
+    alive: int = 0
+    peak_alive: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class PlayerPool(Generic[K, P]):
+    """
+    A bounded, lazily populated pool of players with LRU eviction.
+
+    Players are created on first use through `factory` and kept in recency
+    order. Once more than `capacity` players are alive, the least recently used
+    idle players are disposed of. A player is never evicted while `is_active`
+    reports it as playing or while its key is pinned (see `pin`). If every
+    live player is busy the pool is allowed to overflow its capacity instead of
+    cutting off a sound; it shrinks back on the next acquire.
+
+    PARAMETERS
+    ----------
+    factory
+        Creates the player for a key.
+    is_active
+        Returns whether a player is currently in use and must not be evicted.
+    dispose
+        Releases the resources held by an evicted player.
+    capacity
+        The soft maximum number of live players.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[K], P],
+        is_active: Callable[[P], bool],
+        dispose: Callable[[P], None],
+        capacity: int = DEFAULT_POOL_CAPACITY,
+    ):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1. {capacity} given.")
+        self.factory = factory
+        self.is_active = is_active
+        self.dispose = dispose
+        self.capacity = capacity
+        self.stats = PoolStats()
+        self._players: OrderedDict[K, P] = OrderedDict()
+        self._pinned: dict[K, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._players
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._players)
+
+    def items(self):
+        return self._players.items()
+
+    def acquire(self, key: K) -> P:
+        """
+        Returns the player for `key`, creating it if needed, and marks it as the
+        most recently used.
+        """
+        player = self._players.get(key)
+        if player is not None:
+            self.stats.hits += 1
+            self._players.move_to_end(key)
+            return player
+        self.stats.misses += 1
+        player = self.factory(key)
+        self._players[key] = player
+        self._update_alive()
+        self._evict()
+        return player
+
+    def touch(self, key: K) -> bool:
+        """
+        Marks the live player for `key` as the most recently used without
+        counting a hit, e.g. when warming it. Returns whether it is alive.
+        """
+        if key not in self._players:
+            return False
+        self._players.move_to_end(key)
+        return True
+
+    def peek(self, key: K) -> Optional[P]:
+        """
+        Returns the live player for `key` without creating it or touching its
+        recency.
+        """
+        return self._players.get(key)
+
+    def pin(self, key: K):
+        """
+        Protects the player for `key` from eviction until a matching `unpin`.
+        """
+        self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, key: K):
+        count = self._pinned.get(key, 0)
+        if count <= 1:
+            self._pinned.pop(key, None)
+        else:
+            self._pinned[key] = count - 1
+
+    def is_pinned(self, key: K) -> bool:
+        return key in self._pinned
+
+    def discard(self, key: K) -> bool:
+        """
+        Disposes of the player for `key` regardless of its state. Returns
+        whether a player was alive.
+        """
+        player = self._players.pop(key, None)
+        self._pinned.pop(key, None)
+        if player is None:
+            return False
+        self.dispose(player)
+        self._update_alive()
+        return True
+
+    def clear(self):
+        for key in list(self._players):
+            self.discard(key)
+
+    def resize(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1. {capacity} given.")
+        self.capacity = capacity
+        self._evict()
+
+    def _evictable(self, key: K, player: P) -> bool:
+        return key not in self._pinned and not self.is_active(player)
+
+    def _evict(self):
+        excess = len(self._players) - self.capacity
+        if excess <= 0:
+            return
+        # Oldest first; the most recently acquired player is never a candidate.
+        candidates = [
+            key
+            for key, player in list(self._players.items())[:-1]
+            if self._evictable(key, player)
+        ][:excess]
+        for key in candidates:
+            player = self._players.pop(key)
+            self.dispose(player)
+            self.stats.evictions += 1
+        if len(self._players) > self.capacity:
+            self.stats.overflows += 1
+            logger.debug(
+                "Player pool over capacity (%d/%d); all other players are busy.",
+                len(self._players),
+                self.capacity,
+            )
+        self._update_alive()
+
+    def _update_alive(self):
+        self.stats.alive = len(self._players)
+        self.stats.peak_alive = max(self.stats.peak_alive, self.stats.alive)
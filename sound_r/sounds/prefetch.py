@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import os
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore, QtMultimedia
+
+from ..utils import get_default_logger
+from .compiled import ObjType, Scene, SceneObj
+
+if TYPE_CHECKING:
+    from typing import Iterator, Optional
+
+    from .sound_engine import SoundEngine
+
+logger = get_default_logger(__name__)
+
+DEFAULT_PREFETCH_DEPTH = 8
+DEFAULT_PREFETCH_BUDGET_MB = 256
+
+READY_STATUSES = (
+    QtMultimedia.QMediaPlayer.MediaStatus.LoadedMedia,
+    QtMultimedia.QMediaPlayer.MediaStatus.BufferingMedia,
+    QtMultimedia.QMediaPlayer.MediaStatus.BufferedMedia,
+    QtMultimedia.QMediaPlayer.MediaStatus.EndOfMedia,
+)
+
+
+@dataclass
+class PrefetchStats:
+    ready: int = 0
+    not_ready: int = 0
+    sounds_warmed: int = 0
+    art_warmed: int = 0
+    budget_stops: int = 0
+    # (scene_id, idx, type, ready) for the most recent arrivals
+    recent: deque = field(default_factory=lambda: deque(maxlen=64))
+
+    @property
+    def ready_ratio(self) -> float:
+        total = self.ready + self.not_ready
+        return self.ready / total if total else 1.0
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["recent"] = list(self.recent)
+        data["ready_ratio"] = self.ready_ratio
+        return data
+
+
+class Prefetcher(QtCore.QObject):
+    """
+    Warms the sounds and art that follow the engine's cursor.
+
+    After every arrival the scene graph is walked ahead of the cursor,
+    following `cue` objects into their target scenes, and the next `depth`
+    sound/art payloads are warmed: sounds by creating their player in the pool
+    (which opens the media asynchronously in the backend, or for the mixer
+    backends, after decoding it on the asset loader's workers) and art by
+    decoding it on the art cache's thread pool. Warming is deferred to the event loop so
+    that it never runs inside `step()`.
+
+    PARAMETERS
+    ----------
+    engine
+        The engine whose cursor is followed.
+    depth
+        How many upcoming sound/art objects to warm.
+    budget_mb
+        The memory the warmed window may take up, estimated from file sizes.
+    """
+
+    def __init__(
+        self,
+        engine: SoundEngine,
+        depth: int = DEFAULT_PREFETCH_DEPTH,
+        budget_mb: float = DEFAULT_PREFETCH_BUDGET_MB,
+    ):
+        super().__init__(engine)
+        self.engine = engine
+        self.depth = depth
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.stats = PrefetchStats()
+        self._cursor: Optional[tuple[Scene, int, bool]] = None
+        self._size_cache: dict[tuple[ObjType, int], int] = {}
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.warm)
+
+    def upcoming(
+        self, scene: Scene, idx: int, loop: Optional[bool] = None
+    ) -> Iterator[tuple[Scene, int]]:
+        """
+        Yields the (scene, idx) positions that follow the given one, in the
+        order the engine would reach them. `loop` is the layer's loop setting,
+        the main layer's by default.
+        """
+        if loop is None:
+            loop = self.engine.loop_scenes
+        scenes = self.engine.scene_map.scenes
+        seen: set[tuple[int, int]] = set()
+        while True:
+            if idx < len(scene) and scene[idx].type is ObjType.CUE:
+                scene, idx = scenes[scene[idx].target], 0
+            else:
+                idx += 1
+                if idx >= len(scene):
+                    if not loop:
+                        return
+                    idx = 0
+            if (scene.index, idx) in seen or idx >= len(scene):
+                return
+            seen.add((scene.index, idx))
+            yield scene, idx
+
+    def is_ready(self, scene_obj: SceneObj) -> bool:
+        match scene_obj.type:
+            case ObjType.SOUND:
+                player = self.engine.pool.peek(scene_obj.payload)
+                return player is not None and player.mediaStatus() in READY_STATUSES
+            case ObjType.ART:
+                return self.engine.art_cache.has(scene_obj.payload, scene_obj.scale)
+            case _:
+                return True
+
+    def on_arrival(self, scene: Scene, idx: int, loop: Optional[bool] = None):
+        """
+        Records whether the object a layer just reached was warm, and schedules
+        warming of the objects after it. Only the latest arrival is followed,
+        so idle layers cost nothing.
+        """
+        scene_obj = scene[idx]
+        if scene_obj.type is not ObjType.CUE:
+            ready = self.is_ready(scene_obj)
+            if ready:
+                self.stats.ready += 1
+            else:
+                self.stats.not_ready += 1
+                logger.debug("Cue %s[%d] was not ready when reached", scene.name, idx)
+            self.stats.recent.append((scene.name, idx, scene_obj.type.name, ready))
+        self._cursor = (scene, idx, loop)
+        self._timer.start()
+
+    def retarget(self, scene: Scene, idx: int, loop: Optional[bool] = None):
+        """
+        Follows the cursor onto a reloaded map without recording an arrival.
+        """
+        self._size_cache.clear()
+        self._cursor = (scene, idx, loop)
+        self._timer.start()
+
+    def warm(self):
+        if self._cursor is None or self.depth <= 0:
+            return
+        # Leave room in the pool for the player at the cursor.
+        max_sounds = self.engine.pool.capacity - 1
+        sounds: list[str] = []
+        art: list[tuple[str, float]] = []
+        used = 0
+        for scene, idx in self.upcoming(*self._cursor):
+            if len(sounds) + len(art) >= self.depth:
+                break
+            scene_obj = scene[idx]
+            if scene_obj.type is ObjType.CUE:
+                continue
+            is_sound = scene_obj.type is ObjType.SOUND
+            if is_sound and len(sounds) >= max_sounds:
+                continue
+            cost = self._asset_size(scene_obj)
+            if used + cost > self.budget:
+                self.stats.budget_stops += 1
+                break
+            used += cost
+            if is_sound:
+                sounds.append(scene_obj.payload)
+            else:
+                art.append((scene_obj.payload, scene_obj.scale))
+        # Acquire the farthest first so the nearest sound is the most recently
+        # used and the last to be evicted.
+        for sound_id in reversed(sounds):
+            self._warm_sound(sound_id)
+        for art_id, scale in art:
+            self._warm_art(art_id, scale)
+
+    def _warm_sound(self, sound_id: str):
+        engine = self.engine
+        # Only creating a player is a pool miss; warming a live one is not a hit.
+        if engine.pool.touch(sound_id):
+            return
+        if engine.is_decoded(sound_id):
+            self._create_player(sound_id)
+        else:
+            # The mixer decodes on creation; do that on the loader's workers.
+            engine.asset_loader().warm_sound(sound_id, self._create_player)
+
+    def _create_player(self, sound_id: str):
+        if sound_id not in self.engine.pool:
+            self.stats.sounds_warmed += 1
+            self.engine.pool.acquire(sound_id)
+
+    def _warm_art(self, art_id: str, scale: float):
+        if self.engine.art_cache.request(art_id, scale):
+            self.stats.art_warmed += 1
+
+    def _asset_size(self, scene_obj: SceneObj) -> int:
+        key = (scene_obj.type, scene_obj.target)
+        size = self._size_cache.get(key)
+        if size is None:
+            scene_map = self.engine.scene_map
+            if scene_obj.type is ObjType.SOUND:
+                path = self.engine.sound_path / scene_map.sound_files[scene_obj.target]
+            else:
+                path = self.engine.art_path / scene_map.art_files[scene_obj.target]
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            if scene_obj.type is ObjType.SOUND and self.engine.is_streamed(path):
+                # Only the stream's read-ahead buffer is held in memory.
+                size = self.engine.mixer.frames_for_ms(self.engine.stream_buffer_ms)
+                size *= self.engine.mixer.channels * 4
+            self._size_cache[key] = size
+        return size
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import pathlib
+import struct
+import wave
+
+# Only reads file headers with the standard library, so assets can be probed
+# (e.g. to compile a bundle) without loading Qt or numpy.
+
+# JPEG start-of-frame markers, which carry the image size.
+_JPEG_SOF = frozenset(
+    (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF)
+)
+# JPEG markers without a length field.
+_JPEG_STANDALONE = frozenset((0x01, *range(0xD0, 0xDA)))
+
+
+def is_wav(path: pathlib.Path | str) -> bool:
+    return pathlib.Path(path).suffix.lower() in (".wav", ".wave")
+
+
+def probe_sound(path: pathlib.Path) -> dict:
+    info: dict = {"format": path.suffix.lower().lstrip(".")}
+    if is_wav(path):
+        try:
+            with wave.open(str(path), "rb") as w:
+                info.update(
+                    sample_rate=w.getframerate(),
+                    channels=w.getnchannels(),
+                    duration_ms=1000 * w.getnframes() / w.getframerate(),
+                )
+        except (wave.Error, EOFError):
+            pass
+    return info
+
+
+def _jpeg_size(f) -> tuple[int, int]:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return -1, -1
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return -1, -1
+        code = marker[0]
+        if code == 0xD9:  # end of image
+            return -1, -1
+        if code in _JPEG_STANDALONE:
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            return -1, -1
+        (length,) = struct.unpack(">H", header)
+        if code in _JPEG_SOF:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return -1, -1
+            height, width = struct.unpack(">xHH", frame)
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def _webp_size(head: bytes) -> tuple[int, int]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30:
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(head) >= 25:
+        (bits,) = struct.unpack("<I", head[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(head) >= 30:
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    return -1, -1
+
+
+def probe_image(path: pathlib.Path) -> dict:
+    """
+    Reads the format and size of a PNG, JPEG, GIF, BMP or WebP image from its
+    header. The size is -1 x -1 for other formats or unreadable headers, as
+    with `QImageReader`.
+    """
+    info = {"format": path.suffix.lower().lstrip("."), "width": -1, "height": -1}
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            size = (-1, -1)
+            if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+                info["format"] = "png"
+                size = struct.unpack(">II", head[16:24])
+            elif head.startswith(b"\xff\xd8"):
+                info["format"] = "jpeg"
+                size = _jpeg_size(f)
+            elif head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+                info["format"] = "gif"
+                size = struct.unpack("<HH", head[6:10])
+            elif head.startswith(b"BM") and len(head) >= 26:
+                info["format"] = "bmp"
+                (header_size,) = struct.unpack("<I", head[14:18])
+                if header_size == 12:
+                    size = struct.unpack("<HH", head[18:22])
+                else:
+                    width, height = struct.unpack("<ii", head[18:26])
+                    size = (width, abs(height))
+            elif head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+                info["format"] = "webp"
+                size = _webp_size(head)
+    except OSError:
+        return info
+    info["width"], info["height"] = size
+    return info
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import pathlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+    from . import types
+    from .compiled import CompiledMap, SceneObj
+
+logger = get_default_logger(__name__)
+
+DEFAULT_RELOAD_DELAY_MS = 200
+# Options that are only read when the engine is created.
+RESTART_OPTIONS = (
+    "audioBackend",
+    "sampleRate",
+    "channels",
+    "blockFrames",
+    "latencyMs",
+    "pcmCache",
+    "pcmCacheMB",
+)
+
+
+def obj_key(obj: SceneObj) -> tuple:
+    # Everything but the interned target, which shifts when ids are added or
+    # removed without the object itself changing.
+    return obj[:3] + obj[4:]
+
+
+@dataclass
+class MapDiff:
+    added_sounds: set[str] = field(default_factory=set)
+    removed_sounds: set[str] = field(default_factory=set)
+    changed_sounds: set[str] = field(default_factory=set)  # new file
+    added_art: set[str] = field(default_factory=set)
+    removed_art: set[str] = field(default_factory=set)
+    changed_art: set[str] = field(default_factory=set)
+    added_scenes: set[str] = field(default_factory=set)
+    removed_scenes: set[str] = field(default_factory=set)
+    changed_scenes: set[str] = field(default_factory=set)
+    changed_options: set[str] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return any(self.__dict__.values())
+
+    def summary(self) -> str:
+        parts = [
+            f"{len(ids)} {kind}"
+            for kind, ids in (
+                ("sounds added", self.added_sounds),
+                ("sounds removed", self.removed_sounds),
+                ("sounds changed", self.changed_sounds),
+                ("art added", self.added_art),
+                ("art removed", self.removed_art),
+                ("art changed", self.changed_art),
+                ("scenes added", self.added_scenes),
+                ("scenes removed", self.removed_scenes),
+                ("scenes changed", self.changed_scenes),
+                ("options changed", self.changed_options),
+            )
+            if ids
+        ]
+        return ", ".join(parts) or "no changes"
+
+
+def _diff_ids(
+    old_ids: tuple[str, ...],
+    old_files: tuple[str, ...],
+    new_ids: tuple[str, ...],
+    new_files: tuple[str, ...],
+) -> tuple[set[str], set[str], set[str]]:
+    old = dict(zip(old_ids, old_files))
+    new = dict(zip(new_ids, new_files))
+    added = new.keys() - old.keys()
+    removed = old.keys() - new.keys()
+    changed = {id_ for id_ in old.keys() & new.keys() if old[id_] != new[id_]}
+    return set(added), set(removed), changed
+
+
+def diff_maps(old: CompiledMap, new: CompiledMap) -> MapDiff:
+    """
+    Compares two compiled maps by id. A scene has changed if any of its
+    objects differs in anything but its interned index; scenes shared by both
+    maps (see `recompile_map`) are skipped without comparing them.
+    """
+    diff = MapDiff()
+    diff.added_sounds, diff.removed_sounds, diff.changed_sounds = _diff_ids(
+        old.sound_ids, old.sound_files, new.sound_ids, new.sound_files
+    )
+    diff.added_art, diff.removed_art, diff.changed_art = _diff_ids(
+        old.art_ids, old.art_files, new.art_ids, new.art_files
+    )
+    old_scenes = old.scene_index.keys()
+    new_scenes = new.scene_index.keys()
+    diff.added_scenes = set(new_scenes - old_scenes)
+    diff.removed_scenes = set(old_scenes - new_scenes)
+    for name in old_scenes & new_scenes:
+        old_objs = old.scene(name).objects
+        new_objs = new.scene(name).objects
+        if old_objs is new_objs:
+            continue
+        if len(old_objs) != len(new_objs) or any(
+            obj_key(a) != obj_key(b) for a, b in zip(old_objs, new_objs)
+        ):
+            diff.changed_scenes.add(name)
+    diff.changed_options = {
+        key
+        for key in old.options.keys() | new.options.keys()
+        if old.options.get(key) != new.options.get(key)
+    }
+    return diff
+
+
+def read_map(map_path: pathlib.Path) -> types.ObjectMap:
+    with map_path.open() as f:
+        data_map: types.ObjectMap = json.load(f)
+    data_map["root"] = map_path.parent
+    return data_map
+
+
+class MapWatcher(QtCore.QObject):
+    """
+    Watches a map.json and emits `changed` once the file has settled after
+    being edited.
+
+    Editors often save by replacing the file, which drops it from the
+    underlying `QFileSystemWatcher`, so the path is re-added after every
+    change.
+
+    PARAMETERS
+    ----------
+    map_path
+        The map.json to watch.
+    delay_ms
+        How long the file must stay unchanged before `changed` is emitted.
+    """
+
+    changed = QtCore.Signal(object)  # pathlib.Path
+
+    def __init__(
+        self,
+        map_path: pathlib.Path,
+        delay_ms: int = DEFAULT_RELOAD_DELAY_MS,
+        parent: Optional[QtCore.QObject] = None,
+    ):
+        super().__init__(parent)
+        self.map_path = pathlib.Path(map_path)
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        # The folder is watched too so a replaced file is noticed even if the
+        # file watch was lost before it could be re-added.
+        self._watcher.directoryChanged.connect(self._on_file_changed)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._emit_changed)
+        self._signature = self._stat()
+        self._watch()
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = self.map_path.stat()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _watch(self):
+        paths = {str(self.map_path), str(self.map_path.parent)}
+        missing = paths - set(self._watcher.files() + self._watcher.directories())
+        existing = [path for path in missing if pathlib.Path(path).exists()]
+        if existing:
+            self._watcher.addPaths(existing)
+
+    def _on_file_changed(self, _path: str):
+        self._watch()
+        self._timer.start()
+
+    def _emit_changed(self):
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return
+        self._signature = signature
+        self.changed.emit(self.map_path)
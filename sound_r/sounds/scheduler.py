@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import datetime
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore
+
+from ..metrics import Histogram, metrics
+from ..utils import get_default_logger
+
+if TYPE_CHECKING:
+    from typing import Callable, Optional
+
+logger = get_default_logger(__name__)
+
+# The timer only has millisecond resolution and tends to wake late, so it is
+# armed this much early and the rest is waited out by spinning.
+SPIN_MS = 1.0
+# Events due this soon after a wakeup are run in it. Covers the spin and the
+# timer's truncation to whole milliseconds.
+_HORIZON_S = (SPIN_MS + 1) / 1000
+# The heap is rebuilt without cancelled events once they make up more than
+# this share of it.
+COMPACT_RATIO = 0.5
+
+
+class TimedEvent:
+    """
+    A callback scheduled on a `CueScheduler`. Keep it to `cancel` it.
+    """
+
+    __slots__ = ("due", "interval", "callback", "args", "cancelled", "scheduler")
+
+    def __init__(
+        self,
+        scheduler: CueScheduler,
+        due: float,
+        interval: Optional[float],
+        callback: Callable,
+        args: tuple,
+    ):
+        self.scheduler = scheduler
+        self.due = due  # time.perf_counter seconds
+        self.interval = interval  # seconds between repeats
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self.scheduler._on_cancelled()
+
+
+@dataclass
+class SchedulerStats:
+    scheduled: int = 0
+    fired: int = 0
+    cancelled: int = 0
+    wakeups: int = 0  # timer timeouts
+    compactions: int = 0
+    lateness_ms: Histogram = field(
+        default_factory=lambda: Histogram("scheduler.lateness_ms")
+    )
+
+    def as_dict(self) -> dict:
+        return {
+            "scheduled": self.scheduled,
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "wakeups": self.wakeups,
+            "compactions": self.compactions,
+            "lateness_ms": self.lateness_ms.summary(),
+        }
+
+
+def seconds_until(at: int, now: Optional[datetime.datetime] = None) -> float:
+    """
+    Returns the seconds until the next time the wall clock shows `at` seconds
+    after midnight; a time already past today is tomorrow's.
+    """
+    now = now or datetime.datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    target = midnight + datetime.timedelta(seconds=at)
+    if target < now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class CueScheduler(QtCore.QObject):
+    """
+    Runs callbacks at given times from one precise single-shot timer.
+
+    Events wait in a heap ordered by due time and the timer is armed for the
+    earliest one only, so scheduling, cancelling and firing cost O(log n)
+    whatever the number of pending events. Cancelled events are dropped
+    lazily and the heap is compacted once they make up most of it. Repeating
+    events are rescheduled from their due time, so they don't drift; repeats
+    missed while the event loop was busy are skipped rather than run in a
+    burst.
+
+    How late each event ran is recorded in `stats.lateness_ms` and, with
+    metrics enabled, in `scheduler.lateness`.
+    """
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None):
+        super().__init__(parent)
+        self._heap: list[tuple[float, int, TimedEvent]] = []
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._armed_due: Optional[float] = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._run_due)
+        self.stats = SchedulerStats()
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._cancelled
+
+    def call_later(
+        self,
+        delay_ms: float,
+        callback: Callable,
+        *args,
+        every_ms: Optional[float] = None,
+    ) -> TimedEvent:
+        """
+        Runs `callback(*args)` in `delay_ms`, and then every `every_ms` if given.
+        """
+        return self.call_at(
+            time.perf_counter() + delay_ms / 1000, callback, *args, every_ms=every_ms
+        )
+
+    def call_at_time(
+        self, at: int, callback: Callable, *args, every_ms: Optional[float] = None
+    ) -> TimedEvent:
+        """
+        Runs `callback(*args)` the next time the wall clock shows `at` seconds
+        after midnight, and then every `every_ms` if given.
+        """
+        return self.call_at(
+            time.perf_counter() + seconds_until(at), callback, *args, every_ms=every_ms
+        )
+
+    def call_at(
+        self, due: float, callback: Callable, *args, every_ms: Optional[float] = None
+    ) -> TimedEvent:
+        """
+        Runs `callback(*args)` at `due`, a `time.perf_counter` time.
+        """
+        interval = every_ms / 1000 if every_ms else None
+        event = TimedEvent(self, due, interval, callback, args)
+        self._push(event)
+        self.stats.scheduled += 1
+        return event
+
+    def clear(self):
+        for _, _, event in self._heap:
+            event.cancelled = True
+        self._heap.clear()
+        self._cancelled = 0
+        self._timer.stop()
+        self._armed_due = None
+
+    def _push(self, event: TimedEvent):
+        heapq.heappush(self._heap, (event.due, next(self._seq), event))
+        if self._armed_due is None or event.due < self._armed_due:
+            self._arm()
+
+    def _arm(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+        if not self._heap:
+            self._timer.stop()
+            self._armed_due = None
+            return
+        due = self._heap[0][0]
+        self._armed_due = due
+        self._timer.start(max(0, int((due - time.perf_counter()) * 1000 - SPIN_MS)))
+
+    def _on_cancelled(self):
+        self._cancelled += 1
+        self.stats.cancelled += 1
+        if self._cancelled > len(self._heap) * COMPACT_RATIO:
+            # In place, as this may run from a callback inside `_run_due`.
+            self._heap[:] = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+            self.stats.compactions += 1
+            self._arm()
+
+    def _run_due(self):
+        stats = self.stats
+        stats.wakeups += 1
+        heap = self._heap
+        horizon = time.perf_counter() + _HORIZON_S
+        while heap and heap[0][0] <= horizon:
+            _, _, event = heapq.heappop(heap)
+            if event.cancelled:
+                self._cancelled -= 1
+                continue
+            now = time.perf_counter()
+            while now < event.due:
+                now = time.perf_counter()
+            lateness = (now - event.due) * 1000
+            stats.lateness_ms.record(lateness)
+            metrics.record("scheduler.lateness", lateness)
+            stats.fired += 1
+            if not event.interval:
+                # Done; cancelling it from now on does nothing.
+                event.cancelled = True
+            else:
+                # Next repeat after now, keeping the original phase.
+                event.due += (int((now - event.due) // event.interval) + 1) * (
+                    event.interval
+                )
+                heapq.heappush(heap, (event.due, next(self._seq), event))
+            try:
+                event.callback(*event.args)
+            except Exception:
+                logger.exception("Scheduled callback %r failed", event.callback)
+            horizon = time.perf_counter() + _HORIZON_S
+        self._arm()
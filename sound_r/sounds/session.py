@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from PySide6 import QtCore, QtMultimedia
+
+from ..metrics import metrics
+from ..trace import TraceKind
+from ..utils import get_default_logger, log_deferred
+
+if TYPE_CHECKING:
+    from typing import Optional
+
+    from .buses import Bus
+    from .compiled import Scene
+    from .layers import Layer
+    from .mixer import MixerPlayer
+    from .sound_engine import SoundEngine, SoundPlayer
+
+logger = get_default_logger(__name__)
+# Cue events get their own logger so they can be silenced or routed apart.
+cue_logger = get_default_logger("sound_r.cues")
+
+MediaStatus = QtMultimedia.QMediaPlayer.MediaStatus
+PlaybackState = QtMultimedia.QMediaPlayer.PlaybackState
+
+NOT_PLAYING = (
+    MediaStatus.NoMedia,
+    MediaStatus.EndOfMedia,
+    MediaStatus.InvalidMedia,
+    MediaStatus.StalledMedia,
+)
+
+
+def log_cue(event: str, scene: Scene, idx: int):
+    """
+    Logs a cue event at debug level, off the calling thread while the log
+    queue runs. Besides the message, the record carries `event`, `scene`,
+    `idx` and `obj` attributes for handlers to filter on.
+    """
+    if cue_logger.isEnabledFor(logging.DEBUG):
+        obj_id = scene[idx].id
+        log_deferred(
+            cue_logger,
+            logging.DEBUG,
+            "%s %s[%d] %s",
+            event,
+            scene.name,
+            idx,
+            obj_id,
+            extra={"event": event, "scene": scene.name, "idx": idx, "obj": obj_id},
+        )
+
+
+@dataclass
+class SessionStats:
+    started: int = 0
+    ended: int = 0  # played to the end
+    stopped: int = 0  # stopped by stepping past them
+    replaced: int = 0  # closed because the sound was played again
+    stolen: int = 0  # stopped to free a voice of their bus
+    active: int = 0
+    peak_active: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class PlaybackSession:
+    """
+    A single play of a sound object.
+
+    The session owns every connection to its player, and the pool pin of a
+    retained sound, and releases them in `close`. A player that is replayed
+    many times therefore never collects stale handlers and each status change
+    runs exactly one handler. Reaching the end steps the engine only if the
+    engine is still on this object.
+
+    PARAMETERS
+    ----------
+    engine
+        The engine that started the play.
+    scene
+        The scene holding the sound object.
+    idx
+        The position of the sound object in `scene`.
+    player
+        The player the sound is played on.
+    cue_started
+        The `time.perf_counter` time of the cue that caused this play, used to
+        record cue latency.
+    layer
+        The layer that played the sound; the engine's main layer by default.
+    bus
+        The bus the sound plays on, which counts it as one of its voices until
+        the session closes.
+    """
+
+    __slots__ = (
+        "engine",
+        "scene",
+        "idx",
+        "layer",
+        "bus",
+        "obj",
+        "player",
+        "closed",
+        "_cue_started",
+        "_connections",
+        "__weakref__",  # Qt holds bound-method receivers weakly
+    )
+
+    def __init__(
+        self,
+        engine: SoundEngine,
+        scene: Scene,
+        idx: int,
+        player: SoundPlayer | MixerPlayer,
+        cue_started: Optional[float] = None,
+        layer: Optional[Layer] = None,
+        bus: Optional[Bus] = None,
+    ):
+        self.engine = engine
+        self.scene = scene
+        self.idx = idx
+        self.layer = layer or engine.main
+        self.bus = bus
+        self.obj = scene[idx]
+        self.player = player
+        self.closed = False
+        self._cue_started = cue_started
+        self._connections = [player.mediaStatusChanged.connect(self._on_status)]
+        if self.obj.loop:
+            self._connections.append(player.looped.connect(self._on_looped))
+        if self.obj.retain:
+            # Keep retained sounds alive in the pool for as long as they play.
+            engine.pool.pin(self.obj.payload)
+
+    @property
+    def is_current(self) -> bool:
+        return self.layer.scene is self.scene and self.layer.idx == self.idx
+
+    def play(self, fade_ms: Optional[int] = None):
+        """
+        Plays the sound, fading it in if the object asks for it or else over
+        `fade_ms`.
+        """
+        loops = QtMultimedia.QMediaPlayer.Loops
+        self.player.setLoops(loops.Infinite if self.obj.loop else loops.Once)
+        if self.obj.fadein is not None:
+            fade_ms = self.obj.fadein
+        with metrics.span("player.play"):
+            self.player.play(fade_ms)
+        cue = self._cue_started
+        if cue is None:
+            return
+        metrics.since("cue", "cue.play_called", cue)
+        if self.player.playbackState() == PlaybackState.PlayingState:
+            metrics.since("cue", "cue.playing", cue)
+        if self.player.mediaStatus() == MediaStatus.BufferedMedia:
+            metrics.since("cue", "cue.buffered", cue)
+            self._cue_started = None
+
+    def rebind(self, scene: Scene, idx: int):
+        """
+        Moves the session onto the equal object at `idx` in `scene`, after the
+        map was reloaded.
+        """
+        self.scene = scene
+        self.idx = idx
+        self.obj = scene[idx]
+
+    def stop(self, fade_ms: Optional[int] = None):
+        """
+        Stops the sound, fading it out if the object asks for it or else over
+        `fade_ms`, and closes the session. A fading sound keeps playing until
+        the fade ends.
+        """
+        if self.obj.fadeout is not None:
+            fade_ms = self.obj.fadeout
+        self.close()
+        self.engine.session_stats.stopped += 1
+        if self.player.mediaStatus() not in NOT_PLAYING:
+            self.player.stop(fade_ms)
+
+    def steal(self, fade_ms: Optional[int] = None):
+        """
+        Stops the sound over `fade_ms`, whatever its own fade-out, to give its
+        voice to another sound.
+        """
+        self.close()
+        self.engine.session_stats.stolen += 1
+        if self.player.mediaStatus() not in NOT_PLAYING:
+            self.player.stop(fade_ms)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for connection in self._connections:
+            QtCore.QObject.disconnect(connection)
+        self._connections.clear()
+        if self.obj.retain:
+            self.engine.pool.unpin(self.obj.payload)
+        self.engine._session_closed(self)
+
+    def _on_status(self, status: QtMultimedia.QMediaPlayer.MediaStatus):
+        trace = self.engine.trace
+        if trace is not None:
+            trace.record(TraceKind.MEDIA_STATUS, self.obj.payload, status.value)
+        if self._cue_started is not None and status == MediaStatus.BufferedMedia:
+            metrics.since("cue", "cue.buffered", self._cue_started)
+            self._cue_started = None
+        if status == MediaStatus.EndOfMedia:
+            self._on_end()
+
+    def _on_end(self):
+        log_cue("end", self.scene, self.idx)
+        self.close()
+        self.engine.session_stats.ended += 1
+        if self.obj.loop:
+            self.engine.scene_looped.emit(self.obj.id)
+        elif self.is_current and not self.obj.timed:
+            self.engine._step(self.layer)
+
+    def _on_looped(self, loop_count: int, timestamp_ms: float):
+        self.engine.sound_looped.emit(
+            (self.scene.name, self.obj.id, loop_count, timestamp_ms)
+        )
+
+    def __repr__(self):
+        state = "closed" if self.closed else "active"
+        return f"<PlaybackSession {self.scene.name}[{self.idx}] {self.obj.id} {state}>"
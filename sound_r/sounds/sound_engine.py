@@ -1,66 +1,103 @@
 from __future__ import annotations
 
-from copy import deepcopy
-from pprint import pformat
+import time
 from typing import TYPE_CHECKING
 
-# from pygame import mixer
 from PySide6 import QtCore, QtMultimedia
-from tqdm import tqdm
 
+from ..metrics import metrics
+from ..trace import NULL_SPAN, TraceKind
 from ..utils import get_default_logger
 from . import types
+from .analysis import (
+    DEFAULT_LOUDNESS_TARGET,
+    DEFAULT_SILENCE_DB,
+    AnalysisIndex,
+    AnalysisStats,
+    Analyzer,
+    SoundAnalysis,
+)
+from .art import ArtCache, art_source
+from .automation import (
+    DEFAULT_DUCK_MS,
+    DEFAULT_TICK_MS,
+    Automation,
+    GainStage,
+    db_to_gain,
+)
+from .bundle import Bundle
+from .buses import DEFAULT_STEAL_FADE_MS, MAIN_BUS, Bus, BusStats, bus_options
+from .compiled import (
+    CompiledMap,
+    ObjType,
+    Scene,
+    SceneObj,
+    compile_map,
+    log_issues,
+    recompile_map,
+    validate_mapping,
+)
+from .layers import MAIN_LAYER, Layer, layer_options
+from .loader import AssetLoader, AssetTiming
+from .mixer import (
+    DEFAULT_BLOCK_FRAMES,
+    DEFAULT_LATENCY_MS,
+    DEFAULT_VOLUME,
+    Mixer,
+    MixerPlayer,
+    NullSink,
+    QtAudioSink,
+)
+from .pcm import DEFAULT_CHANNELS, DEFAULT_SAMPLE_RATE, decode_pcm, np
+from .pcm_cache import DEFAULT_PCM_CACHE_MB, PcmCache
+from .pool import DEFAULT_POOL_CAPACITY, PlayerPool
+from .prefetch import DEFAULT_PREFETCH_BUDGET_MB, DEFAULT_PREFETCH_DEPTH, Prefetcher
+from .probe import probe_sound
+from .reload import (
+    DEFAULT_RELOAD_DELAY_MS,
+    RESTART_OPTIONS,
+    MapDiff,
+    MapWatcher,
+    diff_maps,
+    obj_key,
+    read_map,
+)
+from .scheduler import CueScheduler
+from .session import NOT_PLAYING, PlaybackSession, SessionStats, log_cue
+from .stream import (
+    DEFAULT_STREAM_BUFFER_MS,
+    DEFAULT_STREAM_THRESHOLD_MB,
+    open_reader,
+    should_stream,
+)
 
 if TYPE_CHECKING:
+    import pathlib
     from typing import Optional
 
-logger = get_default_logger(__name__)
+    from PySide6 import QtGui
 
+    from ..trace import TraceRecorder
 
-def validate_mapping(data_map: types.ObjectMap, update_map: bool = True):
-    # Check for scenes key
-    errors: dict[str, str] = {}
-    data_map_copy = deepcopy(data_map)
-    if "scenes" not in data_map:
-        errors["scenes_missing"] = "Sound Mapping is missing a `scenes` mapping."
-    else:
-        # Check if all scenes propery formatted
-        scenes_data = data_map["scenes"]
-        for scene, scene_data in scenes_data.items():
-            for i, obj in enumerate(scene_data):
-                remove_key = False
-                if "type" not in obj:
-                    errors[f"scenes_{scene}_{i}_notype"] = (
-                        f"Scene `{scene}` obj `{i}` is missing a type."
-                    )
-                    remove_key = True
-                if "id" not in obj:
-                    errors[f"scenes_{scene}_{i}_noid"] = (
-                        f"Scene `{scene}` obj {i} is missing an id."
-                    )
-                    remove_key = True
-                if "payload" not in obj:
-                    errors[f"scenes_{scene}_{i}_nopayload"] = (
-                        f"Scene `{scene}` obj {i} is missing a payload."
-                    )
-                    remove_key = True
-                if "loop" in obj and not isinstance(obj.get("loop"), bool):
-                    errors[f"scenes_{scene}_{i}_loop_badtype"] = (
-                        f"Scene `{scene}` obj {i} has an unexpected type for `loop`."
-                    )
-                    remove_key = True
-                # remove invalid scene obj
-                if remove_key and update_map:
-                    # hur hur deleted scene
-                    del data_map_copy["scenes"][scene][i]
-    if errors:
-        logger.warning(
-            f"Encountered the following errors in data_map: \n{pformat(errors)}\nobject_map: {pformat(data_map)}"
-        )
-    return data_map_copy if update_map else data_map
+logger = get_default_logger(__name__)
 
 
 class SoundPlayer(QtMultimedia.QMediaPlayer):
+    """
+    A `QMediaPlayer` with its own output, fades and loop boundary events.
+
+    Looping is left to the backend, which wraps without reopening the media.
+    `looped` is emitted once per wrap from a single-shot timer armed for the
+    time left in the current pass, so nothing runs between boundaries.
+
+    Fades are ramps on the engine's shared `Automation`; a stop with a fade-out
+    keeps playing until the fade has finished. A play from the stopped state
+    starts `start_ms` into the sound, e.g. past its leading silence; loops wrap
+    to the very start.
+    """
+
+    # loop count, time of the wrap (ms, `time.perf_counter` clock)
+    looped = QtCore.Signal(int, float)
 
     def __init__(
         self,
@@ -68,224 +105,1024 @@ class SoundPlayer(QtMultimedia.QMediaPlayer):
         parent: Optional[QtCore.QObject] = None,
         fadein: Optional[int] = None,
         fadeout: Optional[int] = None,
+        volume: float = DEFAULT_VOLUME,
+        automation: Optional[Automation] = None,
     ):
         super().__init__(parent)
-        self.audio_out = QtMultimedia.QAudioOutput()
+        self.audio_out = QtMultimedia.QAudioOutput(self)
         self.setAudioOutput(self.audio_out)
-        self.audio_out.setVolume(0.5)
-        self.audio_out.volume()
+        self.automation = Automation(parent=self) if automation is None else automation
+        self.gain = GainStage(self.automation, self.audio_out.setVolume, volume)
+        self.start_ms = 0.0
+        self.audio_out.setVolume(volume)
         self.setSource(sound_url)
         self.fadeinT = fadein
         self.fadeoutT = fadeout
-        self.fadeoutProp = QtCore.QPropertyAnimation(self.audio_out, b"volume")
-        self.fadeinProp = QtCore.QPropertyAnimation(self.audio_out, b"volume")
-        self.fadeoutProp.setEasingCurve(QtCore.QEasingCurve.Type.Linear)
-        self.fadeinProp.setEasingCurve(QtCore.QEasingCurve.Type.Linear)
+        self._stopping = False
+        self.loop_count = 0
+        self._loop_timer = QtCore.QTimer(self)
+        self._loop_timer.setSingleShot(True)
+        self._loop_timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._loop_timer.timeout.connect(self._on_loop_timer)
+        self.playbackStateChanged.connect(self._arm_loop_timer)
+        self.durationChanged.connect(self._arm_loop_timer)
 
-    def fadeout_pre(self):
-        if self.fadeoutT is None:
-            return
-        self.fadeoutProp.setDuration(self.fadeoutT)
-        self.fadeoutProp.setStartValue(self.audioOutput().volume())
-        self.fadeoutProp.setEndValue(0)
+    @property
+    def volume(self) -> float:
+        return self.gain.volume
 
-    def fadeout_post(self):
-        self.fadeoutProp.start()
+    def setVolume(self, volume: float):
+        self.gain.set_volume(volume)
 
-    def fadein_pre(self):
-        if self.fadeinT is None:
+    def _arm_loop_timer(self, *_):
+        playing = self.playbackState() == self.PlaybackState.PlayingState
+        duration = self.duration()
+        if not playing or duration <= 0 or self.loops() == 1:
+            self._loop_timer.stop()
             return
-        self.fadeinProp.setDuration(self.fadeinT)
-        self.fadeinProp.setStartValue(0.01)
-        self.fadeinProp.setEndValue(self.audioOutput().volume())
+        self._loop_timer.start(max(1, duration - self.position()))
 
-    def fadein_post(self):
-        self.fadeinProp.start()
+    def _on_loop_timer(self):
+        position = self.position()
+        duration = self.duration()
+        if self.playbackState() != self.PlaybackState.PlayingState or duration <= 0:
+            return
+        if position > duration // 2:
+            # The backend has not wrapped yet; wait for the rest of the pass.
+            self._loop_timer.start(max(1, duration - position))
+            return
+        self.loop_count += 1
+        self.looped.emit(self.loop_count, time.perf_counter() * 1000 - position)
+        if self.loops() < 0 or self.loop_count + 1 < self.loops():
+            self._loop_timer.start(max(1, duration - position))
+
+    def dispose(self):
+        self._loop_timer.stop()
+        self.gain.cancel()
+        super().stop()
+        self.setSource(QtCore.QUrl())
+        self.deleteLater()
 
-    def play(self):
-        if self.fadeinT is not None:
-            self.fadein_pre()
+    def play(self, fade_ms: Optional[int] = None):
+        """
+        Plays the sound, fading in over `fade_ms` (or the player's fade-in).
+        Playing during a fade-out starts the sound over.
+        """
+        if self._stopping:
+            self._stopping = False
+            super().stop()
+        if self.playbackState() != self.PlaybackState.PlayingState:
+            self.loop_count = 0
+            if self.start_ms:
+                self.setPosition(int(self.start_ms))
+        fade_ms = self.fadeinT if fade_ms is None else fade_ms
+        with metrics.span("player.fade_setup"):
+            if fade_ms:
+                self.gain.fade_to(1.0, fade_ms, start=0.0)
+            else:
+                self.gain.fade_to(1.0, 0)
         super().play()
-        if self.fadeinT is not None:
-            self.fadein_post()
 
-    def stop(self):
-        if self.fadeoutT is not None:
-            self.fadeout_pre()
+    def stop(self, fade_ms: Optional[int] = None):
+        """
+        Stops the sound after fading it out over `fade_ms` (or the player's
+        fade-out). It keeps playing, and counts as active, until then.
+        """
+        fade_ms = self.fadeoutT if fade_ms is None else fade_ms
+        playing = self.playbackState() == self.PlaybackState.PlayingState
+        if fade_ms and playing:
+            if not self._stopping:
+                self._stopping = True
+                with metrics.span("player.fade_setup"):
+                    self.gain.fade_to(0.0, fade_ms, self._stop_now)
+            return
+        self.gain.stop_fade()
+        self._stop_now()
+
+    def _stop_now(self):
+        self._stopping = False
         super().stop()
-        if self.fadeoutT is not None:
-            self.fadeout_post()
 
 
 class SoundEngine(QtCore.QObject):
-    sound_looped = QtCore.Signal(tuple)  # (scene_id, sound_id)
+    # (scene_id, sound_id, loop count, time of the wrap in ms)
+    sound_looped = QtCore.Signal(tuple)
     clear_loop = QtCore.Signal()
     select_image = QtCore.Signal(str, float)
     scene_looped = QtCore.Signal(str)
+    map_reloaded = QtCore.Signal(object)  # MapDiff
+    # path, SoundAnalysis; emitted from the analysis thread
+    _sound_analyzed = QtCore.Signal(str, object)
 
-    NOT_PLAYING = (
-        QtMultimedia.QMediaPlayer.MediaStatus.NoMedia,
-        QtMultimedia.QMediaPlayer.MediaStatus.EndOfMedia,
-        QtMultimedia.QMediaPlayer.MediaStatus.InvalidMedia,
-        QtMultimedia.QMediaPlayer.MediaStatus.StalledMedia,
-    )
+    NOT_PLAYING = NOT_PLAYING
 
     @property
     def art_path(self):
-        return self.data_map["root"] / "art"
+        return self.scene_map.root / "art"
 
     @property
     def sound_path(self):
-        return self.data_map["root"] / "sounds"
+        return self.scene_map.root / "sounds"
 
     def attach_scene_loop_handler(self, handler):
         self.scene_loop_handlers.append(handler)
 
     def __init__(
         self,
-        data_map: types.ObjectMap,
+        data_map: types.ObjectMap | CompiledMap | Bundle,
         starting_id: str,
         parent: Optional[QtCore.QObject] = None,
         load: bool = True,
         validate: bool = True,
+        backend: Optional[str] = None,
     ):
         super().__init__(parent)
-        self.data_map = (
-            validate_mapping(data_map)
-            if validate
-            else validate_mapping(data_map, update_map=False)
+        # Asset info, and possibly decoded audio and art, from a compiled bundle.
+        self.bundle: Optional[Bundle] = None
+        # The raw map, kept so a reload only recompiles the scenes that changed.
+        self._map_data: Optional[types.ObjectMap] = None
+        if isinstance(data_map, Bundle):
+            self.bundle = data_map
+            self.scene_map = data_map.scene_map
+        elif isinstance(data_map, CompiledMap):
+            self.scene_map = data_map
+        else:
+            self.scene_map = compile_map(data_map)
+            self._map_data = data_map
+        if validate:
+            log_issues(self.scene_map.issues)
+        self.mixer: Optional[Mixer] = None
+        self.sink: Optional[NullSink | QtAudioSink] = None
+        self.pcm_cache: Optional[PcmCache] = None
+        self.stream_threshold_mb: Optional[float] = None
+        self.stream_buffer_ms = DEFAULT_STREAM_BUFFER_MS
+        # Decoded ahead of time, until the player for the sound takes it.
+        self._preloaded_pcm: dict[str, object] = {}
+        # The latest asset loader, whose workers also decode prefetched sounds.
+        self.loader: Optional[AssetLoader] = None
+        # Loudness and trim points by content hash; see `analyze_sounds`.
+        self.analysis: Optional[AnalysisIndex] = None
+        self.analyzer: Optional[Analyzer] = None
+        self.normalize_loudness = True
+        self.loudness_target = DEFAULT_LOUDNESS_TARGET
+        self.trim_silence = True
+        self._sound_analyzed.connect(self._on_sound_analyzed)
+        self.backend = backend or self.scene_map.options.get("audioBackend", "qt")
+        if self.backend in ("mixer", "null"):
+            self._setup_mixer()
+        elif self.backend != "qt":
+            raise ValueError(f"Unknown audio backend: {self.backend}")
+        # One set of ramps for every player's fades and ducking, ticked per
+        # block by the mixer or else by its own timer.
+        if self.mixer is not None:
+            self.automation = self.mixer.automation
+        else:
+            self.automation = Automation(
+                tick_ms=self.scene_map.options.get("automationTickMs", DEFAULT_TICK_MS),
+                parent=self,
+            )
+        self.crossfade_ms: Optional[int] = None
+        self.duck_ms = DEFAULT_DUCK_MS
+        # The dB each playing ducking sound asks for, by sound id.
+        self._duckers: dict[str, float] = {}
+        self._duck_gain = 1.0
+        # Groups of sounds with their own gain and voice limit; see `bus`.
+        self.buses: dict[str, Bus] = {}
+        self.steal_fade_ms = DEFAULT_STEAL_FADE_MS
+        self.pool: PlayerPool[str, SoundPlayer | MixerPlayer] = PlayerPool(
+            self._create_player,
+            self._player_active,
+            self._dispose_player,
         )
-        self.sounds: dict[str, SoundPlayer] = {}
-        self.audioDevice = QtMultimedia.QAudioOutput()
+        self.art_cache = ArtCache(self.art_source, parent=self)
+        self.prefetcher = Prefetcher(self)
         # self.channels: dict[tuple[str, int], mixer.Channel] = {}
         self.starting_id = starting_id
-        self.loop_scenes = False
+        # Independent cursors; `scene`, `idx` and `loop_scenes` are the main
+        # layer's.
+        self.main = Layer(MAIN_LAYER)
+        self.layers: dict[str, Layer] = {MAIN_LAYER: self.main}
         self.scene_loop_handler = []
+        # The current play of each sound, keyed by sound id. A sound has one
+        # player, so it plays on one layer at a time: `session.layer`.
+        self.sessions: dict[str, PlaybackSession] = {}
+        self.session_stats = SessionStats()
+        self.map_watcher: Optional[MapWatcher] = None
+        # Records inputs and events while set; see `TraceRecorder.attach`.
+        self.trace: Optional[TraceRecorder] = None
+        # Runs the timed objects of every layer.
+        self.scheduler = CueScheduler(self)
         if load:
             self.load()
 
     def load(self):
         logger.info("Loading sound engine...")
-        print("Loading sounds...")
-        for id_, sound_path in tqdm(self.data_map["soundIDs"].items()):
-            self.sounds[id_] = SoundPlayer(
-                QtCore.QUrl.fromLocalFile(self.sound_path / sound_path),
-                self.audioDevice,
+        # Players are created lazily by the pool on first use.
+        options = self.scene_map.options
+        self.loop_scenes = self.scene_map.loop_scenes
+        for name, layer_options_ in layer_options(self.scene_map).items():
+            self.layer(name).loop = bool(layer_options_.get("loop", False))
+        if options.get("metrics"):
+            metrics.enable()
+        self.normalize_loudness = options.get("normalizeLoudness", True)
+        self.loudness_target = options.get("loudnessTarget", DEFAULT_LOUDNESS_TARGET)
+        self.trim_silence = options.get("trimSilence", True)
+        self.crossfade_ms = options.get("crossfadeMs")
+        self.duck_ms = options.get("duckMs", DEFAULT_DUCK_MS)
+        self.steal_fade_ms = options.get("stealFadeMs", DEFAULT_STEAL_FADE_MS)
+        self._configure_buses()
+        if self.normalize_loudness or self.trim_silence:
+            self.analysis = AnalysisIndex(
+                self.scene_map.root,
+                options.get("channels", DEFAULT_CHANNELS),
+                options.get("silenceThresholdDb", DEFAULT_SILENCE_DB),
             )
-            # time.sleep(3)
-        if "globalOptions" in self.data_map:
-            self.loop_scenes = self.data_map["globalOptions"].get("loopScenes", False)
+        else:
+            self.analysis = None
+        for sound_id, sound_player in self.pool.items():
+            self._apply_analysis(sound_id, sound_player)
+        self.pool.resize(options.get("maxPlayers", DEFAULT_POOL_CAPACITY))
+        self.prefetcher.depth = options.get("prefetchDepth", DEFAULT_PREFETCH_DEPTH)
+        self.prefetcher.budget = int(
+            options.get("prefetchBudgetMB", DEFAULT_PREFETCH_BUDGET_MB) * 1024 * 1024
+        )
         logger.debug("Loop scenes: %s", self.loop_scenes)
+        logger.debug("Player pool capacity: %d", self.pool.capacity)
         logger.info("Sound engine loaded")
 
+    def _setup_mixer(self):
+        options = self.scene_map.options
+        self.mixer = Mixer(
+            sample_rate=options.get("sampleRate", DEFAULT_SAMPLE_RATE),
+            channels=options.get("channels", DEFAULT_CHANNELS),
+            block_frames=options.get("blockFrames", DEFAULT_BLOCK_FRAMES),
+        )
+        self.stream_threshold_mb = options.get(
+            "streamThresholdMB", DEFAULT_STREAM_THRESHOLD_MB
+        )
+        self.stream_buffer_ms = options.get("streamBufferMs", DEFAULT_STREAM_BUFFER_MS)
+        if options.get("pcmCache", True):
+            self.pcm_cache = PcmCache(
+                self.scene_map.root,
+                int(options.get("pcmCacheMB", DEFAULT_PCM_CACHE_MB) * 1024 * 1024),
+            )
+            app = QtCore.QCoreApplication.instance()
+            if app is not None:
+                app.aboutToQuit.connect(self.pcm_cache.flush)
+        if self.backend == "null":
+            self.sink = NullSink(self.mixer, parent=self)
+        else:
+            self.sink = QtAudioSink(
+                self.mixer,
+                latency_ms=options.get("latencyMs", DEFAULT_LATENCY_MS),
+                parent=self,
+            )
+        logger.info(
+            "Mixing at %d Hz, %d frame blocks (%s sink, %.1f ms latency)",
+            self.mixer.sample_rate,
+            self.mixer.block_frames,
+            self.backend,
+            self.sink.latency_ms,
+        )
+
+    @property
+    def clock_ms(self) -> Optional[float]:
+        """
+        The shared playback clock of the mixer, or None with the qt backend.
+        """
+        if self.mixer is None:
+            return None
+        return 1000 * self.mixer.time
+
+    def decode(self, path, sample_rate: int, channels: int):
+        preloaded = self._preloaded_pcm.pop(str(path), None)
+        if preloaded is not None:
+            return preloaded
+        if self.bundle is not None:
+            bundled = self.bundle.pcm(path, sample_rate, channels)
+            if bundled is not None:
+                return bundled
+        if self.pcm_cache is None:
+            return decode_pcm(path, sample_rate, channels)
+        return self.pcm_cache.get_or_decode(path, sample_rate, channels)
+
+    def preload_decoder(self):
+        """
+        Returns the function the asset loader decodes sounds with, or None if
+        the backend decodes media itself.
+        """
+        if self.mixer is None:
+            return None
+        return lambda path: self.decode(
+            path, self.mixer.sample_rate, self.mixer.channels
+        )
+
+    def accept_preloaded(self, timing: AssetTiming, result):
+        if timing.kind == "sound":
+            self._preloaded_pcm[timing.path] = result
+        elif not result.isNull():
+            art_id, scale = timing.asset_id, timing.info["scale"]
+            key = (art_id, scale, *timing.info["target"])
+            self.art_cache.put(art_id, scale, result, key)
+
+    def asset_loader(self) -> AssetLoader:
+        """
+        The loader whose workers decode assets off the GUI thread.
+        """
+        if self.loader is None:
+            self.loader = AssetLoader(self, parent=self)
+        return self.loader
+
+    def is_decoded(self, sound_id: str) -> bool:
+        """
+        Whether the player for `sound_id` can be created without decoding the
+        sound: the qt backend and streams never decode it, and the mixer may
+        already have it in memory or in the bundle.
+        """
+        if self.mixer is None:
+            return True
+        path = self.sound_path / self.scene_map.sound_file(sound_id)
+        if str(path) in self._preloaded_pcm or self.is_streamed(path):
+            return True
+        return (
+            self.bundle is not None
+            and self.bundle.pcm(path, self.mixer.sample_rate, self.mixer.channels)
+            is not None
+        )
+
+    def load_assets(self, starting_id: Optional[str] = None) -> AssetLoader:
+        """
+        Starts loading every asset on a worker pool. The returned loader emits
+        `scene_ready` once the starting scene can be played.
+        """
+        loader = self.loader = AssetLoader(self, parent=self)
+        if self.pcm_cache is not None:
+            # Index everything decoded while loading in one write.
+            loader.finished.connect(lambda _report, cache=self.pcm_cache: cache.flush())
+        loader.load(starting_id or self.starting_id)
+        self.analyze_sounds()
+        return loader
+
+    def analyze_sounds(self) -> Optional[Analyzer]:
+        """
+        Starts analysing the sounds missing from the analysis index on worker
+        processes. Live players pick up each result as it arrives; sounds
+        already analysed are normalized and trimmed from their first play.
+        """
+        if self.analysis is None:
+            return None
+        if np is None:
+            logger.debug("Not analysing sounds: numpy is not installed")
+            return None
+        if self.analyzer is not None and self.analyzer.running:
+            return self.analyzer
+        options = self.scene_map.options
+        self.analyzer = Analyzer(
+            self.analysis,
+            options.get("sampleRate", DEFAULT_SAMPLE_RATE),
+            options.get("analysisWorkers"),
+        )
+        self.analyzer.start(
+            [self.sound_path / file for file in self.scene_map.sound_files],
+            self._emit_analyzed,
+            self._analysis_done,
+        )
+        return self.analyzer
+
+    @staticmethod
+    def _analysis_done(stats: AnalysisStats):
+        if stats.analyzed or stats.failed:
+            logger.info(
+                "Analysed %d sounds on %d workers in %.0f ms (%d failed)",
+                stats.analyzed,
+                stats.workers,
+                stats.wall_ms,
+                stats.failed,
+            )
+
+    def _emit_analyzed(self, path: pathlib.Path, analysis: Optional[SoundAnalysis]):
+        if analysis is not None:
+            self._sound_analyzed.emit(str(path), analysis)
+
+    def _on_sound_analyzed(self, path: str, analysis: SoundAnalysis):
+        for sound_id, sound_player in self.pool.items():
+            if str(self.sound_path / self.scene_map.sound_file(sound_id)) == path:
+                self._apply_analysis(sound_id, sound_player)
+
+    def _apply_analysis(self, sound_id: str, sound_player: SoundPlayer | MixerPlayer):
+        """
+        Sets the player's normalization gain and skips its leading silence,
+        if the sound has been analysed.
+        """
+        analysis = None
+        if self.analysis is not None:
+            analysis = self.analysis.get(
+                self.sound_path / self.scene_map.sound_file(sound_id)
+            )
+        volume, start_ms = DEFAULT_VOLUME, 0.0
+        if analysis is not None:
+            if self.normalize_loudness:
+                volume *= 10 ** (analysis.gain_db(self.loudness_target) / 20)
+            if self.trim_silence:
+                start_ms = analysis.start_ms
+        sound_player.setVolume(volume)
+        sound_player.start_ms = start_ms
+
+    def is_streamed(self, path: pathlib.Path) -> bool:
+        """
+        Whether the sound at `path` is streamed rather than decoded whole.
+        Only the mixer backends decode; `QMediaPlayer` always streams.
+        """
+        return self.mixer is not None and should_stream(path, self.stream_threshold_mb)
+
+    def audio_memory(self) -> dict[str, int]:
+        """
+        The bytes of audio held by each live mixer player, by sound id.
+        """
+        return {
+            sound_id: player.memory_bytes()
+            for sound_id, player in self.pool.items()
+            if isinstance(player, MixerPlayer)
+        }
+
+    def _create_player(self, sound_id: str) -> SoundPlayer | MixerPlayer:
+        sound_player = self._new_player(sound_id)
+        self._apply_analysis(sound_id, sound_player)
+        return sound_player
+
+    def _new_player(self, sound_id: str) -> SoundPlayer | MixerPlayer:
+        sound_file = self.sound_path / self.scene_map.sound_file(sound_id)
+        if self.mixer is not None and self.is_streamed(sound_file):
+            duration_ms = self.sound_info(sound_id).get("duration_ms")
+            return MixerPlayer(
+                self.mixer,
+                sound_file,
+                self,
+                open_stream=lambda: open_reader(
+                    sound_file, self.mixer.sample_rate, self.mixer.channels
+                ),
+                stream_buffer_ms=self.stream_buffer_ms,
+                frames=(
+                    None
+                    if duration_ms is None
+                    else self.mixer.frames_for_ms(duration_ms)
+                ),
+            )
+        if self.mixer is not None:
+            return MixerPlayer(self.mixer, sound_file, self, decoder=self.decode)
+        return SoundPlayer(
+            QtCore.QUrl.fromLocalFile(sound_file),
+            self,
+            automation=self.automation,
+        )
+
+    def sound_info(self, sound_id: str) -> dict:
+        """
+        The format, and for WAV files the rate, channels and duration, of a
+        sound: from the bundle if it is current, else from the file's header.
+        """
+        sound_file = self.scene_map.sound_file(sound_id)
+        entry = self.bundle.sounds.get(sound_id) if self.bundle is not None else None
+        if entry is not None and entry.file == sound_file and entry.mtime_ns:
+            return entry.info()
+        return probe_sound(self.sound_path / sound_file)
+
+    def resolve_art(self, art_id: str):
+        return self.art_path / self.scene_map.art_file(art_id)
+
+    def art_source(self, art_id: str) -> pathlib.Path | QtGui.QImage:
+        """
+        The image embedded in the bundle for `art_id`, or else its file.
+        """
+        return art_source(self.scene_map, self.bundle, art_id)
+
+    @staticmethod
+    def _player_active(sound_player: SoundPlayer | MixerPlayer) -> bool:
+        return (
+            sound_player.playbackState()
+            != QtMultimedia.QMediaPlayer.PlaybackState.StoppedState
+        )
+
+    @staticmethod
+    def _dispose_player(sound_player: SoundPlayer | MixerPlayer):
+        sound_player.dispose()
+
+    @property
+    def pool_stats(self):
+        return self.pool.stats
+
     def __str__(self):
-        return pformat(self.data_map)
+        return str(self.scene_map)
+
+    @property
+    def scene(self) -> Optional[Scene]:
+        return self.main.scene
+
+    @scene.setter
+    def scene(self, scene: Optional[Scene]):
+        self.main.scene = scene
+
+    @property
+    def idx(self) -> int:
+        return self.main.idx
+
+    @idx.setter
+    def idx(self, idx: int):
+        self.main.idx = idx
+
+    @property
+    def loop_scenes(self) -> bool:
+        return self.main.loop
+
+    @loop_scenes.setter
+    def loop_scenes(self, loop: bool):
+        self.main.loop = loop
+
+    @property
+    def scene_id(self) -> Optional[str]:
+        return None if self.scene is None else self.scene.name
 
     def get_cue_id(self, scene_id: str, idx: int):
-        return self.data_map["scenes"][scene_id][idx]["id"]
+        return self.scene_map.scene(scene_id)[idx].id
 
     def get_payload(self, scene_id: str, idx: int):
-        return self.data_map["scenes"][scene_id][idx]["payload"]
-
-    def get_scene_and_sound(self):
-        scene_id = self.scene_id
-        return scene_id, self.get_cue_id(scene_id, self.idx)
-
-    def play_obj(self, scene_id: str, idx: int):
-        scene_data = self.data_map["scenes"][scene_id]
-        scene_obj = scene_data[idx]
-        match scene_obj["type"]:
-            case "sound":
-                self.play_sound(scene_id, idx)
-                if scene_obj.get("step", False):
-                    self.step()
-            case "cue":
-                self.play_scene(scene_obj["payload"])
-            case "art":
-                scale = scene_obj.get("scale", 1.0)
-                self.select_image.emit(scene_obj["payload"], scale)
-                if scene_obj.get("step", True):
-                    self.step()
-            case scene_obj_type:
-                logger.warning(f"Unknown scene object type: {scene_obj_type}")
-
-    def play_scene(self, scene_id: str):
-        self.idx = 0
-        self.scene_id = scene_id
-        self.play_obj(scene_id, self.idx)
-
-    def check_stop(self):
-        obj_data = self.data_map["scenes"][self.scene_id][self.idx]
-        if obj_data["type"] == "sound" and not obj_data.get("retain", False):
-            sound_player = self.sounds[obj_data["payload"]]
-            if "fadeout" in obj_data.keys():
-                sound_player.fadeoutT = obj_data["fadeout"]
+        return self.scene_map.scene(scene_id)[idx].payload
+
+    def layer(self, name: str = MAIN_LAYER) -> Layer:
+        """
+        Returns the layer `name`, creating an idle one if needed.
+        """
+        layer = self.layers.get(name)
+        if layer is None:
+            layer = self.layers[name] = Layer(name)
+        return layer
+
+    def bus(self, name: str = MAIN_BUS) -> Bus:
+        """
+        Returns the bus `name`, creating one without a voice limit if needed.
+        """
+        bus = self.buses.get(name)
+        if bus is None:
+            mix = None if self.mixer is None else self.mixer.bus(name)
+            bus = self.buses[name] = Bus(name, self.automation, mix)
+        return bus
+
+    def _configure_buses(self):
+        """
+        Applies `globalOptions.buses`; buses no longer listed there go back to
+        no voice limit and unity gain.
+        """
+        configured = bus_options(self.scene_map)
+        for name in configured:
+            self.bus(name)
+        for name, bus in self.buses.items():
+            options = configured.get(name, {})
+            bus.max_voices = options.get("maxVoices")
+            bus.fade_to(db_to_gain(options.get("gainDb", 0.0)))
+
+    def set_bus_gain(self, name: str, gain_db: float, fade_ms: float = 0):
+        """
+        Fades the bus `name` to `gain_db` over `fade_ms`, for every sound on it
+        at once.
+        """
+        with self._input(TraceKind.BUS_GAIN, name, int(fade_ms), value=gain_db):
+            self.bus(name).fade_to(db_to_gain(gain_db), fade_ms)
+
+    @property
+    def bus_stats(self) -> dict[str, BusStats]:
+        return {name: bus.stats for name, bus in self.buses.items()}
+
+    def _layer_arg(self, layer: str) -> Layer:
+        try:
+            return self.layers[layer]
+        except KeyError:
+            raise KeyError(f"Unknown layer: {layer}") from None
+
+    def get_scene_and_sound(self, layer: str = MAIN_LAYER):
+        cursor = self._layer_arg(layer)
+        return cursor.scene.name, cursor.obj.id
+
+    def _input(self, kind: TraceKind, *args: str | int, value: float = 0.0):
+        """
+        Records a public entry point while tracing; use in a `with` block.
+        """
+        if self.trace is None:
+            return NULL_SPAN
+        return self.trace.input(kind, *args, value=value)
+
+    def play_obj(self, scene_id: str, idx: int, layer: str = MAIN_LAYER):
+        with self._input(TraceKind.PLAY_OBJ, scene_id, idx, layer):
+            self._play_obj(self.scene_map.scene(scene_id), idx, self.layer(layer))
+
+    def _play_obj(
+        self, scene: Scene, idx: int, layer: Layer, fade_ms: Optional[int] = None
+    ):
+        with metrics.span("engine.play_obj"):
+            self.prefetcher.on_arrival(scene, idx, layer.loop)
+            self._dispatch_obj(scene, idx, layer, fade_ms)
+
+    def _play_timed(self, scene: Scene, idx: int, layer: Layer):
+        with metrics.span("engine.play_timed"):
+            self._dispatch_obj(scene, idx, layer)
+
+    def _dispatch_obj(
+        self, scene: Scene, idx: int, layer: Layer, fade_ms: Optional[int] = None
+    ):
+        scene_obj = scene[idx]
+        if self.trace is not None:
+            self.trace.record(TraceKind.DISPATCH, scene.name, idx, layer.name)
+        match scene_obj.type:
+            case ObjType.SOUND:
+                self._play_sound(scene, idx, layer, fade_ms)
+                if scene_obj.step:
+                    self._step(layer)
+            case ObjType.CUE:
+                if scene_obj.layer is not None:
+                    layer = self.layer(scene_obj.layer)
+                self._play_scene(self.scene_map.scenes[scene_obj.target], layer)
+            case ObjType.ART:
+                self.select_image.emit(scene_obj.payload, scene_obj.scale)
+                if scene_obj.step:
+                    self._step(layer)
+
+    def play_scene(self, scene_id: str, layer: str = MAIN_LAYER):
+        with self._input(TraceKind.PLAY_SCENE, scene_id, layer):
+            self._play_scene(self.scene_map.scene(scene_id), self.layer(layer))
+
+    def _play_scene(self, scene: Scene, layer: Layer):
+        layer.idx = 0
+        layer.scene = scene
+        self._start_timeline(scene, layer)
+        if not scene.objects:
+            logger.warning("Scene `%s` has no playable objects", scene.name)
+            return
+        idx = self._stepped_from(scene, 0)
+        if idx is None:
+            # Only timed objects; the cursor waits on the first one.
+            return
+        layer.idx = idx
+        self._play_obj(scene, idx, layer)
+
+    def stop_layer(self, layer: str):
+        """
+        Stops the layer's timed objects and the sound at its cursor, and leaves
+        it idle until a scene is played on it again.
+        """
+        with self._input(TraceKind.STOP_LAYER, layer):
+            cursor = self._layer_arg(layer)
+            if cursor.scene is None:
+                return
+            if cursor.scene.objects:
+                self._check_stop(cursor)
+            self._stop_timeline(cursor)
+            cursor.scene = None
+            cursor.idx = 0
+
+    @staticmethod
+    def _stepped_from(scene: Scene, start: int) -> Optional[int]:
+        """
+        Returns the first object at or after `start` that is played by stepping
+        rather than by the scheduler.
+        """
+        for idx in range(start, len(scene.objects)):
+            if not scene.objects[idx].timed:
+                return idx
+        return None
+
+    def _schedule_timed(self, scene: Scene, idx: int, layer: Layer):
+        obj = scene[idx]
+        if obj.at is not None:
+            event = self.scheduler.call_at_time(
+                obj.at, self._play_timed, scene, idx, layer, every_ms=obj.every
+            )
+        else:
+            event = self.scheduler.call_later(
+                obj.every if obj.delay is None else obj.delay,
+                self._play_timed,
+                scene,
+                idx,
+                layer,
+                every_ms=obj.every,
+            )
+        layer.timeline.append(event)
+
+    def _start_timeline(self, scene: Scene, layer: Layer):
+        """
+        Schedules the timed objects of `scene` on `layer`, replacing those of
+        the scene before it.
+        """
+        self._stop_timeline(layer)
+        layer.timeline_scene = scene.name
+        for idx, obj in enumerate(scene.objects):
+            if obj.timed:
+                self._schedule_timed(scene, idx, layer)
+
+    def _stop_timeline(self, layer: Layer):
+        if layer.timeline:
+            for event in layer.timeline:
+                event.cancel()
+            layer.timeline.clear()
+            # Timed sounds play while their scene is current, unless retained.
+            for session in list(self.sessions.values()):
+                obj = session.obj
+                if (
+                    obj.timed
+                    and not obj.retain
+                    and session.layer is layer
+                    and session.scene.name == layer.timeline_scene
+                ):
+                    session.stop()
+        layer.timeline_scene = None
+
+    def _rebind_timeline(self, layer: Layer, changed: set[str]):
+        """
+        Moves the layer's pending timed objects onto the reloaded map, keeping
+        their timing, and schedules its scene's new or edited ones.
+        """
+        kept = []
+        for event in layer.timeline:
+            # Fired one-shot events are kept so they aren't scheduled again.
+            found = self._find_equal(*event.args[:2], changed)
+            if found is None or found[0].name != layer.scene.name:
+                event.cancel()
+            else:
+                event.args = (*found, layer)
+                kept.append(event)
+        layer.timeline = kept
+        layer.timeline_scene = layer.scene.name
+        bound = {event.args[1] for event in kept}
+        for idx, obj in enumerate(layer.scene.objects):
+            if obj.timed and idx not in bound:
+                self._schedule_timed(layer.scene, idx, layer)
+
+    def check_stop(self, layer: str = MAIN_LAYER):
+        self._check_stop(self._layer_arg(layer))
+
+    def _check_stop(self, layer: Layer, fade_ms: Optional[int] = None) -> bool:
+        """
+        Stops the sound at the layer's cursor unless it is retained, fading it
+        out over its own fade-out or else `fade_ms`. A sound another layer has
+        played since is left alone. Returns whether a sound was stopped.
+        """
+        with metrics.span("engine.check_stop"):
+            obj_data = layer.obj
+            if obj_data.type is not ObjType.SOUND or obj_data.retain or obj_data.timed:
+                return False
+            session = self.sessions.get(obj_data.payload)
+            if session is None or session.layer is not layer:
+                return False
+            session.stop(fade_ms)
+            log_cue("stop", layer.scene, layer.idx)
             self.clear_loop.emit()
-            print("clear loop emitted")
-            if sound_player.mediaStatus() not in SoundEngine.NOT_PLAYING:
-                sound_player.stop()
+            return True
+
+    def step(self, layer: str = MAIN_LAYER):
+        with self._input(TraceKind.STEP, layer):
+            self._step(self._layer_arg(layer))
 
-    def step(self):
+    def _step(self, layer: Layer):
+        with metrics.span("engine.step"):
+            self._advance(layer)
+
+    def _advance(self, layer: Layer):
+        scene = layer.scene
+        if not scene.objects:
+            return
         # clear previous if should be cleared
-        self.check_stop()
-        self.idx += 1
-        if self.idx >= len(self.data_map["scenes"][self.scene_id]):
-            if self.loop_scenes:
-                self.idx = 0
-                self.scene_looped.emit(self.scene_id)
-            else:
-                return
-        self.play_obj(self.scene_id, self.idx)
+        crossfade = self._check_stop(layer, self.crossfade_ms) and self.crossfade_ms
+        idx = self._stepped_from(scene, layer.idx + 1)
+        if idx is not None:
+            layer.idx = idx
+        elif layer.loop and (first := self._stepped_from(scene, 0)) is not None:
+            layer.idx = first
+            self.scene_looped.emit(scene.name)
+        else:
+            # Stay on the last object so the cursor remains valid.
+            logger.info("Reached the end of scene `%s`", scene.name)
+            return
+        # The sound stepped to fades in while the one stepped from fades out.
+        self._play_obj(scene, layer.idx, layer, crossfade or None)
 
     @property
-    def active_scene_obj(self):
-        return self.data_map["scenes"][self.scene_id][self.idx]
-
-    def handle_end(self):
-        sound_player = self.sounds[self.active_scene_obj["payload"]]
-        scene_obj = self.active_scene_obj
-
-        def _handle_end(media_status: QtMultimedia.QMediaPlayer.MediaStatus):
-            match media_status:
-                case QtMultimedia.QMediaPlayer.MediaStatus.EndOfMedia:
-                    print("end of media")
-                    # detach loop handler
-                    if scene_obj["type"] == "sound":
-                        print("end of sound")
-                        if scene_obj.get("loop", False):
-                            sound_player.positionChanged.disconnect()
-                            self.scene_looped.emit(scene_obj["id"])
-                            return
-                        self.step()
-                case _:
-                    pass
-
-        return _handle_end
-
-    def notify_on_loop(self, scene_id: str, idx: int):
-        sound_payload = self.get_payload(scene_id, idx)
-        sound_id = self.get_cue_id(scene_id, idx)
-
-        def emit_on_loop(pos: int):
-            if pos == 0:
-                self.sound_looped.emit((scene_id, sound_id))
-
-        self.sounds[sound_payload].positionChanged.connect(emit_on_loop)
-
-    def play_sound(self, scene_id: str, idx: int):
-        scene_obj = self.data_map["scenes"][scene_id][idx]
-        sound_player = self.sounds[scene_obj["payload"]]
-        if scene_obj.get("loop", False):
-            sound_player.setLoops(QtMultimedia.QMediaPlayer.Loops.Infinite)
-            self.notify_on_loop(scene_id, idx)
+    def active_scene_obj(self) -> SceneObj:
+        return self.main.obj
+
+    def play_sound(self, scene_id: str, idx: int, layer: str = MAIN_LAYER):
+        self._play_sound(self.scene_map.scene(scene_id), idx, self.layer(layer))
+
+    def _play_sound(
+        self, scene: Scene, idx: int, layer: Layer, fade_ms: Optional[int] = None
+    ):
+        scene_obj = scene[idx]
+        previous = self.sessions.get(scene_obj.payload)
+        if previous is not None:
+            previous.close()
+            self.session_stats.replaced += 1
+        bus = self.bus(scene_obj.bus or MAIN_BUS)
+        admitted, victim = bus.claim(scene_obj.priority)
+        if not admitted:
+            bus.stats.rejected += 1
+            logger.debug(
+                "Not playing `%s`: every voice of bus `%s` has a higher priority",
+                scene_obj.id,
+                bus.name,
+            )
+            return
+        if victim is not None:
+            bus.stats.steals += 1
+            victim.steal(self.steal_fade_ms)
+            log_cue("steal", victim.scene, victim.idx)
+        sound_player = self.pool.acquire(scene_obj.payload)
+        cue = metrics.take_mark("cue") if metrics.enabled else None
+        session = PlaybackSession(self, scene, idx, sound_player, cue, layer, bus)
+        bus.add(session)
+        self.sessions[scene_obj.payload] = session
+        stats = self.session_stats
+        stats.started += 1
+        stats.active = len(self.sessions)
+        stats.peak_active = max(stats.peak_active, stats.active)
+        if scene_obj.duck:
+            sound_player.gain.duck_to(1.0, 0)
+            self._duckers[scene_obj.payload] = scene_obj.duck
+            self._update_ducking()
         else:
-            sound_player.setLoops(QtMultimedia.QMediaPlayer.Loops.Once)
-        sound_player.mediaStatusChanged.connect(self.handle_end())
-        sound_player.play()
-        print(f"Playing {scene_id}: [{idx}]")
-        # time.sleep(10)
+            sound_player.gain.duck_to(self._duck_gain, 0)
+        session.play(fade_ms)
+        log_cue("play", scene, idx)
+
+    def _session_closed(self, session: PlaybackSession):
+        if session.bus is not None:
+            session.bus.remove(session)
+        payload = session.obj.payload
+        if self.sessions.get(payload) is session:
+            del self.sessions[payload]
+            if self._duckers.pop(payload, None) is not None:
+                self._update_ducking()
+        self.session_stats.active = len(self.sessions)
+
+    def _update_ducking(self):
+        """
+        Ramps every playing sound but the ducking ones to the gain the most
+        ducking sound asks for, or back up once none plays.
+        """
+        gain = db_to_gain(-max(self._duckers.values(), default=0.0))
+        if gain == self._duck_gain:
+            return
+        self._duck_gain = gain
+        for sound_id, session in self.sessions.items():
+            if sound_id not in self._duckers:
+                session.player.gain.duck_to(gain, self.duck_ms)
+
+    @property
+    def map_path(self) -> pathlib.Path:
+        name = self.bundle.map_file if self.bundle is not None else "map.json"
+        return self.scene_map.root / name
+
+    def watch_map(self, delay_ms: int = DEFAULT_RELOAD_DELAY_MS):
+        """
+        Reloads the map whenever its map.json is saved.
+        """
+        if self.map_watcher is None:
+            self.map_watcher = MapWatcher(self.map_path, delay_ms, parent=self)
+            self.map_watcher.changed.connect(self.reload_file)
+
+    def reload_file(self, map_path: Optional[pathlib.Path] = None) -> Optional[MapDiff]:
+        """
+        Re-reads map.json and reloads it. A file that cannot be read or parsed
+        is reported and the current map is kept.
+        """
+        map_path = map_path or self.map_path
+        try:
+            data_map = read_map(map_path)
+            return self.reload(data_map)
+        except (OSError, ValueError) as e:
+            logger.error("Not reloading %s: %s", map_path, e)
+            return None
+
+    def reload(self, data_map: types.ObjectMap | CompiledMap) -> MapDiff:
+        """
+        Switches to a new version of the map, touching only what changed.
+
+        Players of removed or re-pointed sounds are disposed (stopping them if
+        they play) and their cached images dropped; everything else stays
+        loaded. Playing sounds and the cursor are moved onto the equal objects
+        of the new map. A session whose object is gone keeps playing to its end
+        unless it loops.
+
+        RETURNS
+        -------
+        -
+            What changed.
+        """
+        with metrics.span("engine.reload"):
+            if isinstance(data_map, CompiledMap):
+                new_map = data_map
+                self._map_data = None
+            elif self._map_data is not None:
+                new_map = recompile_map(data_map, self._map_data, self.scene_map)
+                self._map_data = data_map
+            else:
+                new_map = compile_map(data_map, root=self.scene_map.root)
+                self._map_data = data_map
+            log_issues(new_map.issues)
+            old_map, self.scene_map = self.scene_map, new_map
+            diff = diff_maps(old_map, new_map)
+            if not diff:
+                return diff
+            restart = diff.changed_options.intersection(RESTART_OPTIONS)
+            if restart:
+                logger.warning(
+                    "Restart to apply changed options: %s", ", ".join(sorted(restart))
+                )
+
+            for sound_id in diff.removed_sounds | diff.changed_sounds:
+                session = self.sessions.get(sound_id)
+                if session is not None:
+                    session.stop()
+                path = self.sound_path / old_map.sound_file(sound_id)
+                self._preloaded_pcm.pop(str(path), None)
+                self.pool.discard(sound_id)
+            for art_id in diff.removed_art | diff.changed_art:
+                self.art_cache.discard(art_id)
+
+            changed = diff.changed_scenes | diff.removed_scenes
+            for session in list(self.sessions.values()):
+                found = self._find_equal(session.scene, session.idx, changed)
+                if found is not None:
+                    session.rebind(*found)
+                elif session.obj.loop:
+                    session.stop()
+            for layer in list(self.layers.values()):
+                self._move_cursor(layer, changed)
+                if layer.timeline_scene is not None:
+                    self._rebind_timeline(layer, changed)
+            if diff.changed_options:
+                self.load()
+            if diff.added_sounds or diff.changed_sounds:
+                self.analyze_sounds()
+        logger.info("Reloaded map: %s", diff.summary())
+        self.map_reloaded.emit(diff)
+        return diff
+
+    def _find_equal(
+        self, scene: Scene, idx: int, changed: set[str]
+    ) -> Optional[tuple[Scene, int]]:
+        """
+        Finds the object equal to `scene[idx]` in the current map, preferring
+        the one closest to `idx`.
+        """
+        scene_i = self.scene_map.scene_index.get(scene.name)
+        if scene_i is None:
+            return None
+        new_scene = self.scene_map.scenes[scene_i]
+        if scene.name not in changed:
+            return new_scene, idx
+        key = obj_key(scene[idx])
+        matches = [i for i, obj in enumerate(new_scene) if obj_key(obj) == key]
+        if not matches:
+            return None
+        return new_scene, min(matches, key=lambda i: abs(i - idx))
+
+    def _move_cursor(self, layer: Layer, changed: set[str]):
+        if layer.scene is None:
+            return
+        found = self._find_equal(layer.scene, layer.idx, changed)
+        if found is None and layer.scene.name in self.scene_map.scene_index:
+            # The object changed; stay on the same id, or else the same place.
+            scene = self.scene_map.scene(layer.scene.name)
+            obj_id = layer.obj.id
+            ids = [i for i, obj in enumerate(scene) if obj.id == obj_id]
+            idx = ids[0] if ids else min(layer.idx, max(len(scene) - 1, 0))
+            found = scene, idx
+        if found is None and layer is not self.main:
+            logger.warning(
+                "Scene `%s` was removed; stopping layer `%s`",
+                layer.scene.name,
+                layer.name,
+            )
+            self._stop_timeline(layer)
+            layer.scene, layer.idx = None, 0
+            return
+        if found is None:
+            name = self.starting_id
+            if name not in self.scene_map.scene_index:
+                name = self.scene_map.scenes[0].name
+            logger.warning(
+                "Scene `%s` was removed; moving to `%s`", layer.scene.name, name
+            )
+            found = self.scene_map.scene(name), 0
+        layer.scene, layer.idx = found
+        if layer is self.main and layer.scene.objects:
+            self.prefetcher.retarget(layer.scene, layer.idx, layer.loop)
 
     def start(self):
         logger.debug("Starting sound engine...")
-        self.play_scene(self.starting_id)
+        with self._input(TraceKind.START, self.starting_id):
+            if self.sink is not None:
+                self.sink.start()
+                metrics.gauge("audio.output_latency_ms", self.sink.latency_ms)
+            self.play_scene(self.starting_id)
+            for name, options in layer_options(self.scene_map).items():
+                if options.get("scene") is not None:
+                    self.play_scene(options["scene"], name)
         logger.info("Sound engine started")
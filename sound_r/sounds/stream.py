@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import wave
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from ..utils import get_default_logger
+from .pcm import (
+    DEFAULT_CHANNELS,
+    DEFAULT_SAMPLE_RATE,
+    QtDecoderReader,
+    WavReader,
+    convert_channels,
+    np,
+)
+from .probe import is_wav
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import Optional, Protocol
+
+    class PcmReader(Protocol):
+        path: pathlib.Path | str
+        channels: int
+        sample_rate: int
+        frames: int
+
+        def read(self, frames: int) -> np.ndarray: ...
+
+        def seek(self, frame: int): ...
+
+        def close(self): ...
+
+
+logger = get_default_logger(__name__)
+
+DEFAULT_STREAM_THRESHOLD_MB = 64
+DEFAULT_STREAM_BUFFER_MS = 2000
+DEFAULT_CHUNK_FRAMES = 8192
+# Compressed audio decodes to roughly this many times its size on disk.
+COMPRESSION_RATIO = 10
+# How long a blocking `StreamSource.read` waits for the decoder (seconds).
+READ_TIMEOUT = 5.0
+
+LOOP = "loop"
+END = "end"
+
+
+def should_stream(path: pathlib.Path, threshold_mb: Optional[float]) -> bool:
+    """
+    Whether `path` is large enough to be streamed instead of decoded whole.
+    WAV files are compared by their size, other formats by an estimate of
+    their decoded size, `COMPRESSION_RATIO` times their size on disk.
+    """
+    if threshold_mb is None or threshold_mb < 0:
+        return False
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    if not is_wav(path):
+        size *= COMPRESSION_RATIO
+    return size > threshold_mb * 1024 * 1024
+
+
+class LinearResampler:
+    """
+    Resamples consecutive chunks of one signal with linear interpolation,
+    carrying the last frame and the fractional read position across chunk
+    boundaries so the output has no seams.
+    """
+
+    def __init__(self, rate: int, target_rate: int):
+        self.step = rate / target_rate
+        self.passthrough = rate == target_rate
+        self.reset()
+
+    def reset(self):
+        self._tail: Optional[np.ndarray] = None
+        self._offset = 0.0
+
+    def max_output(self, frames: int) -> int:
+        return math.ceil((frames + 1) / self.step) + 1
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        if self.passthrough or len(chunk) == 0:
+            return chunk
+        data = chunk if self._tail is None else np.concatenate([self._tail, chunk])
+        last = len(data) - 1
+        positions = np.arange(self._offset, last, self.step)
+        self._offset = (
+            (positions[-1] + self.step - last)
+            if len(positions)
+            else (self._offset - last)
+        )
+        self._tail = data[-1:]
+        src = np.arange(len(data), dtype=np.float64)
+        out = np.empty((len(positions), data.shape[1]), dtype=np.float32)
+        for channel in range(data.shape[1]):
+            out[:, channel] = np.interp(positions, src, data[:, channel])
+        return out
+
+
+class RingBuffer:
+    """
+    A fixed-size FIFO of float32 frames. Not thread safe on its own.
+    """
+
+    def __init__(self, frames: int, channels: int):
+        self._data = np.zeros((frames, channels), dtype=np.float32)
+        self._read = 0
+        self.available = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    @property
+    def space(self) -> int:
+        return self.capacity - self.available
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def write(self, data: np.ndarray) -> int:
+        count = min(len(data), self.space)
+        start = (self._read + self.available) % self.capacity
+        first = min(count, self.capacity - start)
+        self._data[start : start + first] = data[:first]
+        self._data[: count - first] = data[first:count]
+        self.available += count
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        count = min(len(out), self.available)
+        first = min(count, self.capacity - self._read)
+        out[:first] = self._data[self._read : self._read + first]
+        out[first:count] = self._data[: count - first]
+        self._read = (self._read + count) % self.capacity
+        self.available -= count
+        return count
+
+    def clear(self):
+        self._read = 0
+        self.available = 0
+
+
+@dataclass
+class StreamStats:
+    chunks: int = 0
+    underruns: int = 0
+    seeks: int = 0
+    buffer_bytes: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class StreamSource:
+    """
+    Plays a long file with constant memory: a background thread decodes it in
+    fixed-size chunks into a ring buffer that the mixer drains.
+
+    Loop and end boundaries are tracked as positions in the decoded stream, so
+    `read` reports them at the exact frame even though decoding runs ahead.
+
+    PARAMETERS
+    ----------
+    reader
+        A chunked reader of the source, e.g. `WavReader` or `QtDecoderReader`.
+    sample_rate
+        The mixer's sample rate.
+    channels
+        The mixer's channel count.
+    loops
+        How many times to play the file; -1 loops forever.
+    buffer_frames
+        The size of the read-ahead ring buffer.
+    chunk_frames
+        How many source frames to decode at a time.
+    """
+
+    def __init__(
+        self,
+        reader: PcmReader,
+        sample_rate: int,
+        channels: int,
+        loops: int = 1,
+        buffer_frames: Optional[int] = None,
+        chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+    ):
+        self.reader = reader
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.loops = loops
+        self.chunk_frames = chunk_frames
+        self.resampler = LinearResampler(reader.sample_rate, sample_rate)
+        self.frames = int(reader.frames * sample_rate / reader.sample_rate)
+        if buffer_frames is None:
+            buffer_frames = sample_rate * DEFAULT_STREAM_BUFFER_MS // 1000
+        buffer_frames = max(buffer_frames, 2 * self.resampler.max_output(chunk_frames))
+        self.ring = RingBuffer(buffer_frames, channels)
+        self.stats = StreamStats(buffer_bytes=self.memory_bytes)
+        # Consumer side: frames handed to the mixer and position in the file.
+        self.position = 0
+        self._read_total = 0
+        # Producer side, guarded by _cond.
+        self._written_total = 0
+        self._markers: deque[tuple[int, str]] = deque()
+        self._passes = 1
+        self._finished = False
+        self._closed = False
+        self._seek_to: Optional[int] = None
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="sound_r-stream", daemon=True
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        """
+        The memory held by this stream, independent of the file's length.
+        """
+        chunk = self.chunk_frames * self.reader.channels * 4
+        return (
+            self.ring.nbytes
+            + 2 * chunk
+            + self.resampler.max_output(self.chunk_frames) * self.channels * 4
+        )
+
+    def start(self, timeout: float = 1.0):
+        """
+        Starts decoding and waits (up to `timeout` seconds) for the first
+        chunk, so playback does not begin with an underrun.
+        """
+        self._thread.start()
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.ring.available or self._finished, timeout=timeout
+            )
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.reader.close()
+
+    def seek(self, frame: int):
+        """
+        Restarts playback at `frame` (in mixer frames); buffered audio is
+        dropped and decoding resumes from there.
+        """
+        frame = max(0, min(frame, self.frames))
+        with self._cond:
+            self._seek_to = frame
+            self._generation += 1
+            self.ring.clear()
+            self._markers.clear()
+            self._written_total = self._read_total
+            self._finished = False
+            self.position = frame
+            self.stats.seeks += 1
+            self._cond.notify_all()
+
+    def read(
+        self, frames: int, wait: bool = False
+    ) -> tuple[np.ndarray, list[tuple[int, str]]]:
+        """
+        Returns the next `frames` frames, zero-padded on underrun or after the
+        end, and the (offset, LOOP | END) boundaries that fall inside them.
+        With `wait`, blocks until the frames are decoded instead of underrunning
+        (for rendering faster than real time), but for no more than
+        `READ_TIMEOUT` at a time.
+        """
+        out = np.zeros((frames, self.channels), dtype=np.float32)
+        events = []
+        count = 0
+        with self._cond:
+            start = self._read_total
+            while True:
+                count += self.ring.read_into(out[count:])
+                self._cond.notify_all()
+                if count == frames or not wait:
+                    break
+                # The request may be larger than the ring, so drain it in turns.
+                self._cond.wait_for(
+                    lambda: self.ring.available or self._finished or self._closed,
+                    timeout=READ_TIMEOUT,
+                )
+                if not self.ring.available:
+                    break
+            self._read_total += count
+            self.position += count
+            while self._markers and self._markers[0][0] <= self._read_total:
+                at, kind = self._markers.popleft()
+                events.append((at - start, kind))
+                if kind == LOOP:
+                    self.position = self._read_total - at
+            if count < frames and not (events and events[-1][1] == END):
+                self.stats.underruns += 1
+        return out, events
+
+    def _run(self):
+        try:
+            self._decode()
+        finally:
+            # A `QtDecoderReader` must be closed on the thread that read it.
+            self.reader.close()
+
+    def _decode(self):
+        max_out = self.resampler.max_output(self.chunk_frames)
+        while True:
+            generation = None
+            try:
+                with self._cond:
+                    while (
+                        not self._closed
+                        and self._seek_to is None
+                        and (self._finished or self.ring.space < max_out)
+                    ):
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    if self._seek_to is not None:
+                        self.reader.seek(
+                            int(
+                                self._seek_to
+                                * self.reader.sample_rate
+                                / self.sample_rate
+                            )
+                        )
+                        self.resampler.reset()
+                        self._seek_to = None
+                    generation = self._generation
+                chunk = self.reader.read(self.chunk_frames)
+                at_end = len(chunk) < self.chunk_frames
+                data = self.resampler.process(convert_channels(chunk, self.channels))
+                with self._cond:
+                    if generation != self._generation:
+                        continue
+                    self._written_total += self.ring.write(data)
+                    self.stats.chunks += 1
+                    self._cond.notify_all()
+                    if not at_end:
+                        continue
+                    if self.loops < 0 or self._passes < self.loops:
+                        self._passes += 1
+                        self._markers.append((self._written_total, LOOP))
+                        self.reader.seek(0)
+                    else:
+                        self._markers.append((self._written_total, END))
+                        self._finished = True
+            except Exception as e:
+                # E.g. the file was truncated or removed while playing: end the
+                # stream where it got to, so the sound ends instead of hanging.
+                with self._cond:
+                    if self._closed:
+                        return
+                    if generation is not None and generation != self._generation:
+                        continue
+                    logger.error("Stopped streaming %s: %s", self.reader.path, e)
+                    self._seek_to = None
+                    self._markers.append((self._written_total, END))
+                    self._finished = True
+                    self._cond.notify_all()
+
+
+def open_reader(
+    path: pathlib.Path,
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    channels: int = DEFAULT_CHANNELS,
+) -> PcmReader:
+    """
+    Opens a chunked reader for `path`: integer PCM WAV files are read directly
+    and everything else goes through `QAudioDecoder`, decoding to
+    `sample_rate` and `channels`.
+    """
+    if is_wav(path):
+        try:
+            return WavReader(path)
+        except (wave.Error, EOFError) as e:
+            logger.debug("Streaming %s through QAudioDecoder: %s", path, e)
+    return QtDecoderReader(path, sample_rate, channels)
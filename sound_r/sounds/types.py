@@ -17,14 +17,66 @@ class SceneObject(TypedDict):
     loop: Optional[bool]
     step: Optional[bool]  # default False for sound, True for art
     scale: Optional[float]  # only for art
+    retain: Optional[bool]  # keep playing after stepping past, only for sound
+    fadein: Optional[int]  # ms, only for sound
+    fadeout: Optional[int]  # ms, only for sound
+    duck: Optional[float]  # dB to lower other sounds by while it plays
+    bus: Optional[str]  # only for sound; the main bus by default
+    priority: Optional[int]  # higher keeps its voice when the bus is full
+    # Timed objects are played by the scheduler once their scene starts, and
+    # skipped when stepping.
+    delay: Optional[int]  # ms after the scene starts
+    at: Optional[str]  # time of day, utils.TIME_FORMAT
+    every: Optional[int]  # ms between repeats while the scene is current
+    layer: Optional[str]  # only for cue: the layer that plays the scene
 
 
 ScenesData: TypeAlias = MutableMapping[str, list[SceneObject]]
 
 
+# TODO: Change Optional for NotRequired (PEP 655)
+class LayerOptions(TypedDict):
+    scene: Optional[str]  # started with the engine
+    loop: Optional[bool]
+
+
+# TODO: Change Optional for NotRequired (PEP 655)
+class BusOptions(TypedDict):
+    maxVoices: Optional[int]  # sounds playing at once; unlimited by default
+    gainDb: Optional[float]
+
+
 # TODO: Change Optional for NotRequired (PEP 655)
 class GlobalOptions(TypedDict):
     loopScenes: Optional[bool]
+    maxPlayers: Optional[int]  # soft cap on live SoundPlayers
+    prefetchDepth: Optional[int]  # upcoming sound/art objects to warm
+    prefetchBudgetMB: Optional[float]
+    audioBackend: Optional[Literal["qt", "mixer", "null"]]
+    sampleRate: Optional[int]  # mixer backends only
+    channels: Optional[int]
+    blockFrames: Optional[int]
+    latencyMs: Optional[float]
+    pcmCache: Optional[bool]  # decoded PCM cache under <root>/.sound_r_cache
+    pcmCacheMB: Optional[float]
+    streamThresholdMB: Optional[float]  # stream larger sounds; < 0 disables
+    streamBufferMs: Optional[float]  # read-ahead per streaming sound
+    metrics: Optional[bool]  # collect cue latency histograms
+    hotReload: Optional[bool]  # reload map.json when it is saved (GUI only)
+    statusLogLines: Optional[int]  # status lines kept in the GUI
+    controlPort: Optional[int]  # serve the local control API on this port
+    layers: Optional[Mapping[str, LayerOptions]]  # besides the main layer
+    # Sounds are analysed once into <root>/.sound_r_cache/analysis.json.
+    normalizeLoudness: Optional[bool]  # play every sound at loudnessTarget
+    loudnessTarget: Optional[float]  # LUFS
+    trimSilence: Optional[bool]  # start sounds past their leading silence
+    silenceThresholdDb: Optional[float]  # dBFS
+    analysisWorkers: Optional[int]  # processes; one per core by default
+    crossfadeMs: Optional[int]  # fade between sounds when stepping
+    duckMs: Optional[int]  # how long ducking takes to apply and release
+    automationTickMs: Optional[int]  # qt backend; the mixer ticks per block
+    buses: Optional[Mapping[str, BusOptions]]  # including the main bus
+    stealFadeMs: Optional[int]  # fade-out of a sound that loses its voice
 
 
 # TODO: Change Optional for NotRequired (PEP 655)
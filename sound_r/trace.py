@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import struct
+import time
+from dataclasses import asdict, dataclass, field
+from enum import IntEnum
+from typing import TYPE_CHECKING, NamedTuple
+
+from .utils import get_default_logger
+
+if TYPE_CHECKING:
+    import pathlib
+    from typing import BinaryIO, Callable, Iterable, Optional
+
+    from .sounds.sound_engine import SoundEngine
+
+# Kept free of Qt imports so a trace can be read anywhere; the recorder only
+# connects to the engine's signals.
+
+logger = get_default_logger(__name__)
+
+MAGIC = b"SOUNDRTR"
+# Bump when the layout changes; older traces can't be read.
+TRACE_VERSION = 1
+
+# magic, version
+_HEADER = struct.Struct("<8sI")
+# kind, time in ns since the recording started, three arguments (string
+# indices or integers, -1 for none), value, duration in ms
+_RECORD = struct.Struct("<Bqiiiff")
+# The length of a string record's text, which follows it.
+_STRING = struct.Struct("<H")
+
+
+class TraceKind(IntEnum):
+    STRING = 0  # adds the next entry of the string table
+    # Inputs, fed to the engine again by a replay.
+    START = 1
+    STEP = 2
+    PLAY_OBJ = 3
+    PLAY_SCENE = 4
+    STOP_LAYER = 5
+    BUS_GAIN = 6
+    # Events, compared with those of the replay.
+    DISPATCH = 16
+    MEDIA_STATUS = 17
+    SOUND_LOOPED = 18
+    SCENE_LOOPED = 19
+    SELECT_IMAGE = 20
+
+
+INPUTS = frozenset(
+    (
+        TraceKind.START,
+        TraceKind.STEP,
+        TraceKind.PLAY_OBJ,
+        TraceKind.PLAY_SCENE,
+        TraceKind.STOP_LAYER,
+        TraceKind.BUS_GAIN,
+    )
+)
+# The arguments of each kind: `s` for a string, `i` for an integer.
+_ARGS = {
+    TraceKind.START: "s",  # starting scene
+    TraceKind.STEP: "s",  # layer
+    TraceKind.PLAY_OBJ: "sis",  # scene, index, layer
+    TraceKind.PLAY_SCENE: "ss",  # scene, layer
+    TraceKind.STOP_LAYER: "s",  # layer
+    TraceKind.BUS_GAIN: "si",  # bus, fade ms; the value is the gain in dB
+    TraceKind.DISPATCH: "sis",  # scene, index, layer
+    TraceKind.MEDIA_STATUS: "si",  # payload, status
+    TraceKind.SOUND_LOOPED: "ssi",  # scene, object, loop count
+    TraceKind.SCENE_LOOPED: "s",  # scene or object
+    TraceKind.SELECT_IMAGE: "s",  # art; the value is the scale
+}
+
+
+class TraceError(ValueError):
+    pass
+
+
+class TraceEvent(NamedTuple):
+    kind: TraceKind
+    t_ms: float
+    args: tuple
+    value: float = 0.0
+    duration_ms: float = 0.0  # inputs: how long the engine took to handle it
+
+    @property
+    def key(self) -> tuple:
+        return (self.kind, *self.args)
+
+
+@dataclass
+class TraceStats:
+    records: int = 0
+    strings: int = 0
+    bytes: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class _InputSpan:
+    __slots__ = ("recorder", "kind", "args", "value", "start", "wall_start")
+
+    def __init__(self, recorder: TraceRecorder, kind: TraceKind, args: tuple, value):
+        self.recorder = recorder
+        self.kind = kind
+        self.args = args
+        self.value = value
+
+    def __enter__(self):
+        self.recorder._depth += 1
+        self.start = self.recorder.now_ms()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        recorder = self.recorder
+        recorder._depth -= 1
+        # Inputs made while handling another one are part of it, e.g. the
+        # scenes played by `start`; replaying the outer one repeats them.
+        if recorder._depth == 0:
+            recorder.record(
+                self.kind,
+                *self.args,
+                value=self.value,
+                duration_ms=(time.perf_counter() - self.wall_start) * 1000,
+                t_ms=self.start,
+            )
+            # Inputs come at human pace; flushing after each keeps the trace of
+            # a show that crashed.
+            recorder.stream.flush()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return None
+
+
+NULL_SPAN = _NullSpan()
+
+
+class TraceRecorder:
+    """
+    Writes every input of an engine and the events that follow to a compact
+    binary trace, to be replayed by `python -m sound_r.bench --replay`.
+
+    Records are written as they happen, in the order they finish: an input
+    is written once handled, after the events it caused, so readers sort by
+    time.
+
+    PARAMETERS
+    ----------
+    stream
+        Where the trace is written.
+    clock
+        Returns the time in seconds that records are stamped with; the wall
+        clock by default. How long inputs take is always measured on the wall
+        clock.
+    """
+
+    def __init__(
+        self, stream: BinaryIO, clock: Callable[[], float] = time.perf_counter
+    ):
+        self.stream = stream
+        self.clock = clock
+        self.stats = TraceStats()
+        self._start = clock()
+        self._strings: dict[str, int] = {}
+        self._depth = 0
+        self._engine: Optional[SoundEngine] = None
+        self._write(_HEADER.pack(MAGIC, TRACE_VERSION))
+
+    @classmethod
+    def open(cls, path: pathlib.Path | str, **kwargs) -> TraceRecorder:
+        return cls(open(path, "wb"), **kwargs)
+
+    def now_ms(self) -> float:
+        return (self.clock() - self._start) * 1000
+
+    def _write(self, data: bytes):
+        self.stream.write(data)
+        self.stats.bytes += len(data)
+
+    def _string(self, text: str) -> int:
+        index = self._strings.get(text)
+        if index is None:
+            index = self._strings[text] = len(self._strings)
+            encoded = text.encode()
+            self._write(
+                _RECORD.pack(TraceKind.STRING, 0, -1, -1, -1, 0.0, 0.0)
+                + _STRING.pack(len(encoded))
+                + encoded
+            )
+            self.stats.strings += 1
+        return index
+
+    def record(
+        self,
+        kind: TraceKind,
+        *args: str | int | None,
+        value: float = 0.0,
+        duration_ms: float = 0.0,
+        t_ms: Optional[float] = None,
+    ):
+        fields = [-1, -1, -1]
+        for i, (arg, arg_type) in enumerate(zip(args, _ARGS[kind])):
+            if arg is None:
+                continue
+            fields[i] = self._string(arg) if arg_type == "s" else arg
+        if t_ms is None:
+            t_ms = self.now_ms()
+        self._write(_RECORD.pack(kind, int(t_ms * 1e6), *fields, value, duration_ms))
+        self.stats.records += 1
+
+    def input(self, kind: TraceKind, *args: str | int | None, value: float = 0.0):
+        """
+        Times the handling of an input in a `with` block and records it.
+        """
+        return _InputSpan(self, kind, args, value)
+
+    def attach(self, engine: SoundEngine):
+        """
+        Records the inputs and events of `engine` from now on.
+        """
+        self._engine = engine
+        engine.trace = self
+        engine.sound_looped.connect(self._on_sound_looped)
+        engine.scene_looped.connect(self._on_scene_looped)
+        engine.select_image.connect(self._on_select_image)
+
+    def _on_sound_looped(self, looped: tuple):
+        scene_id, obj_id, loop_count, _ = looped
+        self.record(TraceKind.SOUND_LOOPED, scene_id, obj_id, loop_count)
+
+    def _on_scene_looped(self, name: str):
+        self.record(TraceKind.SCENE_LOOPED, name)
+
+    def _on_select_image(self, art_id: str, scale: float):
+        self.record(TraceKind.SELECT_IMAGE, art_id, value=scale)
+
+    def detach(self):
+        """
+        Stops recording the engine, leaving the stream open.
+        """
+        engine = self._engine
+        if engine is None:
+            return
+        engine.trace = None
+        engine.sound_looped.disconnect(self._on_sound_looped)
+        engine.scene_looped.disconnect(self._on_scene_looped)
+        engine.select_image.disconnect(self._on_select_image)
+        self._engine = None
+
+    def close(self):
+        self.detach()
+        self.stream.close()
+        logger.info(
+            "Trace closed: %d records, %.1f KiB",
+            self.stats.records,
+            self.stats.bytes / 1024,
+        )
+
+
+@dataclass
+class Trace:
+    events: list[TraceEvent] = field(default_factory=list)
+
+    @property
+    def inputs(self) -> list[TraceEvent]:
+        return [event for event in self.events if event.kind in INPUTS]
+
+    @property
+    def outputs(self) -> list[TraceEvent]:
+        return [event for event in self.events if event.kind not in INPUTS]
+
+    @property
+    def duration_ms(self) -> float:
+        return max(
+            (event.t_ms + event.duration_ms for event in self.events), default=0.0
+        )
+
+    @classmethod
+    def read(cls, stream: BinaryIO) -> Trace:
+        header = stream.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise TraceError("Not a trace: too short")
+        magic, version = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise TraceError("Not a trace")
+        if version != TRACE_VERSION:
+            raise TraceError(f"Trace version {version}, expected {TRACE_VERSION}")
+        strings: list[str] = []
+        events = []
+        while record := stream.read(_RECORD.size):
+            if len(record) < _RECORD.size:
+                logger.warning("Trace ends with a partial record")
+                break
+            kind, t_ns, *fields, value, duration_ms = _RECORD.unpack(record)
+            if kind == TraceKind.STRING:
+                (length,) = _STRING.unpack(stream.read(_STRING.size))
+                strings.append(stream.read(length).decode())
+                continue
+            try:
+                kind = TraceKind(kind)
+            except ValueError:
+                raise TraceError(f"Unknown record kind {kind}") from None
+            args = tuple(
+                None if arg == -1 else strings[arg] if arg_type == "s" else arg
+                for arg, arg_type in zip(fields, _ARGS[kind])
+            )
+            events.append(TraceEvent(kind, t_ns / 1e6, args, value, duration_ms))
+        events.sort(key=lambda event: event.t_ms)
+        return cls(events)
+
+
+def read_trace(path: pathlib.Path | str) -> Trace:
+    with open(path, "rb") as f:
+        return Trace.read(f)
+
+
+def match_events(
+    recorded: Iterable[TraceEvent], replayed: Iterable[TraceEvent]
+) -> tuple[list[tuple[TraceEvent, TraceEvent]], list[TraceEvent], list[TraceEvent]]:
+    """
+    Pairs the n-th recorded event of each kind and arguments with the n-th
+    replayed one.
+
+    RETURNS
+    -------
+    -
+        The pairs, the recorded events that were not replayed, and the
+        replayed events that were not recorded.
+    """
+    pending: dict[tuple, list[TraceEvent]] = {}
+    for event in recorded:
+        pending.setdefault(event.key, []).append(event)
+    cursors = dict.fromkeys(pending, 0)
+    pairs = []
+    extra = []
+    for event in replayed:
+        queue = pending.get(event.key)
+        n = cursors.get(event.key, 0)
+        if queue is None or n >= len(queue):
+            extra.append(event)
+            continue
+        pairs.append((queue[n], event))
+        cursors[event.key] = n + 1
+    missing = [
+        event for key, queue in pending.items() for event in queue[cursors[key] :]
+    ]
+    missing.sort(key=lambda event: event.t_ms)
+    return pairs, missing, extra
@@ -1,26 +1,54 @@
 from __future__ import annotations
 
 import argparse
+import atexit
 import json
 import logging
+import os
 import pathlib
+import queue
+import time
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Optional
+    from typing import Callable, Iterable, Optional, TypeVar
+
+    T = TypeVar("T")
 
 from .sounds import types
 
 TIME_FORMAT = "%H:%M:%S"
+# Where derived data (PCM, analysis, bundles) is kept, inside the map's folder.
+CACHE_DIRNAME = ".sound_r_cache"
+# Setting this (to anything but 0) starts the background log writer on import.
+LOG_QUEUE_ENV = "SOUND_R_LOG_QUEUE"
 
 logger = None
 
 
-def load_map(map_path: pathlib.Path):
+def load_map(map_path: pathlib.Path) -> types.ObjectMap:
     with map_path.open() as f:
         OBJECT_MAP: types.ObjectMap = json.load(f)
         OBJECT_MAP["root"] = map_path.parent
+    return OBJECT_MAP
+
+
+def cache_dir(root: pathlib.Path) -> pathlib.Path:
+    return pathlib.Path(root) / CACHE_DIRNAME
+
+
+def progress_bar(iterable: Iterable[T], **kwargs) -> Iterable[T]:
+    """
+    Wraps `iterable` in a tqdm progress bar if tqdm (the `progress` extra) is
+    installed; `kwargs` go to `tqdm`.
+    """
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        return iterable
+    return tqdm(iterable, **kwargs)
 
 
 def parse_time_field(time_str: str):
@@ -70,6 +98,56 @@ def read_level_from_args() -> int:
     return numeric_level
 
 
+# Handlers are shared by every logger set up through `get_default_logger`:
+# one per stream or file and format, created on first use.
+_sinks: dict[tuple, logging.Handler] = {}
+# logger name -> (logger, the sinks it writes to)
+_configured: dict[str, tuple[logging.Logger, tuple[logging.Handler, ...]]] = {}
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Queues records without formatting them; the listener thread formats them
+    when writing. Log arguments must therefore not be mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _LogListener(QueueListener):
+    """
+    Writes each queued record to the sinks of the logger it came from, and
+    builds the records of `log_deferred` calls.
+    """
+
+    def prepare(self, record: logging.LogRecord | tuple) -> logging.LogRecord:
+        if type(record) is tuple:
+            logger_, level, msg, args, extra, created = record
+            record = logger_.makeRecord(
+                logger_.name, level, "", 0, msg, args, None, extra=extra
+            )
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+        return record
+
+    def handle(self, record: logging.LogRecord | tuple):
+        record = self.prepare(record)
+        configured = _configured.get(record.name)
+        for handler in configured[1] if configured else ():
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def _sink(key: tuple, create: Callable[[], logging.Handler]) -> logging.Handler:
+    handler = _sinks.get(key)
+    if handler is None:
+        handler = _sinks[key] = create()
+    return handler
+
+
 def get_default_logger(
     name: str,
     format_: str = "[%(asctime)s] [%(name)s]: " "[%(levelname)s] %(message)s",
@@ -79,7 +157,8 @@ def get_default_logger(
 ) -> logging.Logger:
     """
     Using the provided arguments, gets an instance of a logger of the given
-    name and sets it up.
+    name and sets it up. Setting up the same logger again returns it as is;
+    loggers with equal arguments share their handlers.
 
     PARAMETERS
     ----------
@@ -101,28 +180,99 @@ def get_default_logger(
     -
         Returns the logger.
     """
+    logger_ = logging.getLogger(name.split(".")[-1] if truncate_name else name)
+    if logger_.name in _configured:
+        return logger_
     if logger:
         logger.info("Creating a logger for %s.", name)
-    formatter = logging.Formatter(format_, datefmt=date_format)
 
-    logger_ = logging.getLogger(name.split(".")[-1] if truncate_name else name)
-    logger_.setLevel(default_log_level)
+    def stream_handler() -> logging.Handler:
+        ch = logging.StreamHandler()
+        ch.setLevel(default_log_level)
+        ch.setFormatter(logging.Formatter(format_, datefmt=date_format))
+        return ch
 
-    ch = logging.StreamHandler()
-    ch.setLevel(default_log_level)
-    ch.setFormatter(formatter)
-    logger_.addHandler(ch)
+    def file_handler() -> logging.Handler:
+        # Opened on the first record, so importing a module creates no file.
+        fh = logging.FileHandler(filepath, delay=True)
+        fh.setLevel(logging.INFO)
+        fh.setFormatter(logging.Formatter(format_, datefmt=date_format))
+        return fh
 
+    sinks = [_sink(("stream", format_, date_format), stream_handler)]
     if filepath is not None:
-        fh = logging.FileHandler(filepath)
-        fh.setLevel(logging.INFO)
-        fh.setFormatter(formatter)
-        logger_.addHandler(fh)
+        sinks.append(_sink(("file", filepath, format_, date_format), file_handler))
+    logger_.setLevel(default_log_level)
+    _configured[logger_.name] = (logger_, tuple(sinks))
+    if _queue_handler is not None:
+        logger_.addHandler(_queue_handler)
+    else:
+        for handler in sinks:
+            logger_.addHandler(handler)
     if logger:
         logger.info("Logger created for %s.", name)
 
     return logger_
 
 
+def start_log_queue() -> QueueListener:
+    """
+    Moves all logging I/O to a background thread: loggers put records on a
+    queue and a `QueueListener` formats and writes them. Loggers set up later
+    join in. Idempotent; stopped by `stop_log_queue` or at exit.
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        return _listener
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    for logger_, sinks in _configured.values():
+        for handler in sinks:
+            logger_.removeHandler(handler)
+        logger_.addHandler(_queue_handler)
+    _listener = _LogListener(log_queue)
+    _listener.start()
+    atexit.register(stop_log_queue)
+    return _listener
+
+
+def log_deferred(
+    logger_: logging.Logger,
+    level: int,
+    msg: str,
+    *args,
+    extra: Optional[dict] = None,
+):
+    """
+    Logs like `logger_.log`. While the log queue runs, the record is built
+    on the listener thread as well, so the caller pays only for the level
+    check and a queue put; use it on latency sensitive paths.
+    """
+    if not logger_.isEnabledFor(level):
+        return
+    if _queue_handler is None:
+        logger_.log(level, msg, *args, extra=extra, stacklevel=2)
+        return
+    _queue_handler.queue.put_nowait((logger_, level, msg, args, extra, time.time()))
+
+
+def stop_log_queue():
+    """
+    Writes out the queued records and returns to logging synchronously.
+    """
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for logger_, sinks in _configured.values():
+        logger_.removeHandler(_queue_handler)
+        for handler in sinks:
+            logger_.addHandler(handler)
+    _queue_handler = None
+    _listener = None
+
+
 logger = get_default_logger(__name__, filepath=None)
 logger.setLevel(logging.ERROR)
+if os.environ.get(LOG_QUEUE_ENV, "0") not in ("", "0"):
+    start_log_queue()